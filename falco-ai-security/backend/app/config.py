@@ -57,6 +57,7 @@ class Settings(BaseSettings):
     AUTO_EXECUTION_ENABLED: bool = Field(default=False, env="AUTO_EXECUTION_ENABLED")
     RISK_THRESHOLD: float = Field(default=0.7, env="RISK_THRESHOLD")
     BATCH_SIZE: int = Field(default=10, env="BATCH_SIZE")
+    AI_MAX_CONCURRENCY: int = Field(default=8, env="AI_MAX_CONCURRENCY")  # 同时进行的OpenAI请求上限
     
     # 监控配置
     MONITOR_INTERVAL: int = Field(default=5, env="MONITOR_INTERVAL")  # 秒
@@ -22,6 +22,7 @@ from app.routers import auth, monitor, status, dashboard, websocket_test, intell
 from app.services.websocket_service import websocket_service
 from app.routes import websocket_routes
 from app.services.simple_websocket import simple_websocket_service
+from app.metrics_broker import metrics_broker
 
 # 配置日志
 logging.basicConfig(
@@ -133,6 +134,9 @@ async def startup_event():
     # 启动简化WebSocket服务后台任务
     await simple_websocket_service.start_background_tasks()
     
+    # 启动系统指标采样任务
+    await metrics_broker.start()
+    
     # 初始化各个服务连接
     # TODO: 初始化Neo4j连接
     # TODO: 初始化Pinecone连接
@@ -150,6 +154,9 @@ async def shutdown_event():
     # 停止WebSocket后台任务
     await simple_websocket_service.stop_background_tasks()
     
+    # 停止系统指标采样任务
+    await metrics_broker.stop()
+    
     # 清理资源
     # TODO: 关闭数据库连接
     # TODO: 停止监控服务
@@ -163,5 +170,6 @@ if __name__ == "__main__":
         host=settings.HOST,
         port=settings.PORT,
         reload=settings.DEBUG,
-        log_level="info"
+        log_level="info",
+        ws_per_message_deflate=False  # 推送帧小且在内网传输，关闭压缩
     )
\ No newline at end of file
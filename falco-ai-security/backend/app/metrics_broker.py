@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - Metrics Broker
+系统指标采样器
+
+后台任务每秒采样一次CPU、内存、磁盘和网络计数器，监控与状态路由直接读取最新快照，
+无论请求频率多高，psutil系统调用次数都保持在每秒一次。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsBroker:
+    """系统指标采样器"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # 预热CPU采样基线，cpu_percent(interval=None)返回自上次调用以来的使用率
+        psutil.cpu_percent(interval=None)
+
+    def sample(self) -> Dict[str, Any]:
+        """采样一次系统指标并替换当前快照"""
+        previous = self._snapshot
+        sampled_at = time.monotonic()
+        network = psutil.net_io_counters()
+
+        # 计算网络速率 (MB/s)
+        network_in_speed = 0
+        network_out_speed = 0
+        if previous is not None:
+            time_delta = sampled_at - previous["sampled_at"]
+            if time_delta > 0:
+                bytes_in_delta = network.bytes_recv - previous["network"].bytes_recv
+                bytes_out_delta = network.bytes_sent - previous["network"].bytes_sent
+                network_in_speed = round((bytes_in_delta / time_delta) / (1024 * 1024), 2)
+                network_out_speed = round((bytes_out_delta / time_delta) / (1024 * 1024), 2)
+
+        snapshot = {
+            "timestamp": datetime.now(),
+            "sampled_at": sampled_at,
+            "cpu": psutil.cpu_percent(interval=None),
+            "memory": psutil.virtual_memory(),
+            "disk": psutil.disk_usage('/'),
+            "network": network,
+            "network_in_speed": network_in_speed,
+            "network_out_speed": network_out_speed
+        }
+        # 整体替换字典，单线程事件循环中读取方无需加锁
+        self._snapshot = snapshot
+        return snapshot
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """获取最新的指标快照，后台任务未运行或快照过期时同步采样"""
+        snapshot = self._snapshot
+        # 留出一个采样周期的余量，避免与后台任务重复采样
+        if snapshot is None or time.monotonic() - snapshot["sampled_at"] >= self.interval * 2:
+            snapshot = self.sample()
+        return snapshot
+
+    async def start(self):
+        """启动后台采样任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._sample_loop())
+            logger.info("系统指标采样任务已启动")
+
+    async def stop(self):
+        """停止后台采样任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            logger.info("系统指标采样任务已停止")
+
+    async def _sample_loop(self):
+        """后台采样循环"""
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"系统指标采样失败: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# 全局指标采样器实例
+metrics_broker = MetricsBroker()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - Mock Data
+各路由共享的模拟数据集
+
+数据集使用固定种子惰性构建，超过TTL后重建，所有路由共用同一份数据，
+既避免每个请求重复生成，也保证前端各页面看到的数据一致。
+"""
+
+from typing import Optional, List, Dict, Any, Tuple
+from datetime import datetime
+from functools import lru_cache
+import time
+
+import numpy as np
+
+# 威胁类型配置
+THREAT_TYPES = {
+    "malware": {"label": "恶意软件", "color": "#f44336"},
+    "phishing": {"label": "钓鱼攻击", "color": "#ff9800"},
+    "ransomware": {"label": "勒索软件", "color": "#e91e63"},
+    "apt": {"label": "APT攻击", "color": "#9c27b0"},
+    "botnet": {"label": "僵尸网络", "color": "#3f51b5"},
+    "ddos": {"label": "DDoS攻击", "color": "#2196f3"},
+    "vulnerability": {"label": "漏洞利用", "color": "#ff5722"},
+    "insider": {"label": "内部威胁", "color": "#795548"},
+    "social": {"label": "社会工程", "color": "#607d8b"},
+    "data_breach": {"label": "数据泄露", "color": "#009688"}
+}
+
+# 威胁严重程度配置
+THREAT_SEVERITY = {
+    "critical": {"label": "严重", "score": 4},
+    "high": {"label": "高", "score": 3},
+    "medium": {"label": "中", "score": 2},
+    "low": {"label": "低", "score": 1}
+}
+
+# 威胁来源配置
+THREAT_SOURCES = {
+    "internal": {"label": "内部情报"},
+    "external": {"label": "外部情报"},
+    "osint": {"label": "开源情报"},
+    "commercial": {"label": "商业情报"},
+    "government": {"label": "政府情报"}
+}
+
+# 威胁状态配置
+THREAT_STATUS = {
+    "active": {"label": "活跃"},
+    "monitoring": {"label": "监控中"},
+    "mitigated": {"label": "已缓解"},
+    "resolved": {"label": "已解决"}
+}
+
+# 可信度等级
+CONFIDENCE_LEVELS = {
+    "high": {"label": "高", "score": 3},
+    "medium": {"label": "中", "score": 2},
+    "low": {"label": "低", "score": 1}
+}
+
+# 各配置项的取值元组，供模拟数据生成时直接索引
+_THREAT_TYPE_KEYS = tuple(THREAT_TYPES)
+_SEVERITY_KEYS = tuple(THREAT_SEVERITY)
+_SOURCE_KEYS = tuple(THREAT_SOURCES)
+_STATUS_KEYS = tuple(THREAT_STATUS)
+_CONFIDENCE_KEYS = tuple(CONFIDENCE_LEVELS)
+_IOC_TYPE_KEYS = ("ip", "domain", "hash", "url", "email")
+
+# 模拟安全事件的取值元组
+EVENT_SEVERITIES = ("critical", "high", "medium", "low")
+_EVENT_TYPES = (
+    "Suspicious file access",
+    "Unauthorized network connection",
+    "Privilege escalation attempt",
+    "Malware detection",
+    "Brute force attack",
+    "SQL injection attempt"
+)
+_EVENT_STATUSES = ("new", "investigating", "resolved")
+
+# 模拟数据缓存刷新间隔（秒）
+MOCK_DATA_TTL = 60
+# 模拟数据随机种子，保证每次重建的数据集一致
+MOCK_DATA_SEED = 42
+# 各数据集的记录数
+MOCK_THREAT_COUNT = 100
+MOCK_IOC_COUNT = 50
+MOCK_EVENT_COUNT = 200
+
+# 0-255的十进制字符串查找表，用于拼接IP地址
+_OCTET_STRS = tuple(str(n) for n in range(256))
+
+def _build_ips(octets: np.ndarray) -> List[str]:
+    """将 (N, 4) 的八位组数组批量拼接为IP地址字符串"""
+    o = _OCTET_STRS
+    return ['.'.join((o[a], o[b], o[c], o[d])) for a, b, c, d in octets.tolist()]
+
+def generate_mock_threat_data(count: int = 50, rng: Optional[np.random.Generator] = None):
+    """生成模拟威胁情报数据"""
+    rng = rng or np.random.default_rng()
+    
+    # 批量生成所有随机字段，避免逐条调用随机数函数
+    now = np.datetime64(datetime.now(), 'us')
+    hours_ago = rng.integers(1, 169, size=count)  # 最近一周
+    update_minutes = rng.integers(1, 61, size=count)
+    threat_types = np.take(_THREAT_TYPE_KEYS, rng.integers(0, len(_THREAT_TYPE_KEYS), size=count)).tolist()
+    threat_severities = np.take(_SEVERITY_KEYS, rng.integers(0, len(_SEVERITY_KEYS), size=count)).tolist()
+    threat_sources = np.take(_SOURCE_KEYS, rng.integers(0, len(_SOURCE_KEYS), size=count)).tolist()
+    threat_statuses = np.take(_STATUS_KEYS, rng.integers(0, len(_STATUS_KEYS), size=count)).tolist()
+    threat_confidences = np.take(_CONFIDENCE_KEYS, rng.integers(0, len(_CONFIDENCE_KEYS), size=count)).tolist()
+    ips = _build_ips(rng.integers(1, 256, size=(count * 2, 4)))
+    hashes = rng.bytes(count * 2 * 16).hex()
+    tag_ids = rng.integers(1, 11, size=count).tolist()
+    category_ids = rng.integers(1, 6, size=count).tolist()
+    author_ids = rng.integers(1, 6, size=count).tolist()
+    org_ids = rng.integers(1, 4, size=count).tolist()
+    favorites = (rng.random(count) > 0.8).tolist()
+    bookmarks = (rng.random(count) > 0.7).tolist()
+    view_counts = rng.integers(1, 101, size=count).tolist()
+    share_counts = rng.integers(0, 21, size=count).tolist()
+    
+    # 时间戳在datetime64数组上批量计算并格式化为ISO字符串
+    timestamps = now - hours_ago.astype('timedelta64[h]')
+    timestamp_strs = timestamps.astype(str).tolist()
+    updated_strs = (timestamps + update_minutes.astype('timedelta64[m]')).astype(str).tolist()
+    
+    threats = [
+        {
+            "id": f"threat_{i + 1}",
+            "title": f"威胁情报 {i + 1}",
+            "description": f"这是一个关于{THREAT_TYPES[threat_types[i]]['label']}的威胁情报描述",
+            "type": threat_types[i],
+            "severity": threat_severities[i],
+            "source": threat_sources[i],
+            "status": threat_statuses[i],
+            "confidence": threat_confidences[i],
+            "timestamp": timestamp_strs[i],
+            "lastUpdated": updated_strs[i],
+            "indicators": {
+                "ips": ips[i * 2:i * 2 + 2],
+                "domains": [
+                    f"malicious-domain-{i + 1}.com",
+                    f"suspicious-site-{i + 1}.net"
+                ],
+                "hashes": [
+                    hashes[i * 64:i * 64 + 32],
+                    hashes[i * 64 + 32:i * 64 + 64]
+                ],
+                "urls": [
+                    f"https://malicious-url-{i + 1}.com/path",
+                    f"http://suspicious-url-{i + 1}.org/endpoint"
+                ]
+            },
+            "tags": [f"tag-{tag_ids[i]}", f"category-{category_ids[i]}"],
+            "author": f"analyst-{author_ids[i]}",
+            "organization": f"org-{org_ids[i]}",
+            "references": [
+                f"https://reference-{i + 1}.com",
+                f"https://source-{i + 1}.org"
+            ],
+            "isFavorite": favorites[i],
+            "isBookmarked": bookmarks[i],
+            "viewCount": view_counts[i],
+            "shareCount": share_counts[i]
+        }
+        for i in range(count)
+    ]
+    
+    return sorted(threats, key=lambda x: x['timestamp'], reverse=True)
+
+def _build_ioc_value(ioc_type: str, i: int, ip: str, hash_value: str) -> str:
+    """根据IOC类型构建指标值"""
+    if ioc_type == "ip":
+        return ip
+    elif ioc_type == "domain":
+        return f"malicious-{i + 1}.com"
+    elif ioc_type == "hash":
+        return hash_value
+    elif ioc_type == "url":
+        return f"https://malicious-{i + 1}.com/path"
+    else:  # email
+        return f"attacker{i + 1}@malicious.com"
+
+def generate_mock_ioc_data(count: int = 30, rng: Optional[np.random.Generator] = None):
+    """生成模拟IOC指标数据"""
+    rng = rng or np.random.default_rng()
+    
+    # 批量生成所有随机字段
+    now = np.datetime64(datetime.now(), 'us')
+    types = np.take(_IOC_TYPE_KEYS, rng.integers(0, len(_IOC_TYPE_KEYS), size=count)).tolist()
+    ips = _build_ips(rng.integers(1, 256, size=(count, 4)))
+    hashes = rng.bytes(count * 16).hex()
+    ioc_severities = np.take(_SEVERITY_KEYS, rng.integers(0, len(_SEVERITY_KEYS), size=count)).tolist()
+    ioc_confidences = np.take(_CONFIDENCE_KEYS, rng.integers(0, len(_CONFIDENCE_KEYS), size=count)).tolist()
+    ioc_sources = np.take(_SOURCE_KEYS, rng.integers(0, len(_SOURCE_KEYS), size=count)).tolist()
+    tag_ids = rng.integers(1, 6, size=count).tolist()
+    first_seen = (now - rng.integers(1, 31, size=count).astype('timedelta64[D]')).astype(str).tolist()
+    last_seen = (now - rng.integers(1, 25, size=count).astype('timedelta64[h]')).astype(str).tolist()
+    active_flags = (rng.random(count) > 0.3).tolist()
+    hit_counts = rng.integers(0, 51, size=count).tolist()
+    
+    iocs = [
+        {
+            "id": f"ioc_{i + 1}",
+            "type": types[i],
+            "value": _build_ioc_value(types[i], i, ips[i], hashes[i * 32:i * 32 + 32]),
+            "description": f"恶意{types[i]}指标",
+            "severity": ioc_severities[i],
+            "confidence": ioc_confidences[i],
+            "source": ioc_sources[i],
+            "tags": [f"tag-{tag_ids[i]}"],
+            "firstSeen": first_seen[i],
+            "lastSeen": last_seen[i],
+            "isActive": active_flags[i],
+            "hitCount": hit_counts[i]
+        }
+        for i in range(count)
+    ]
+    
+    return iocs
+
+def generate_mock_events(count: int = 100, rng: Optional[np.random.Generator] = None):
+    """生成模拟安全事件数据"""
+    rng = rng or np.random.default_rng()
+    
+    now = np.datetime64(datetime.now(), 'us')
+    titles = np.take(_EVENT_TYPES, rng.integers(0, len(_EVENT_TYPES), size=count)).tolist()
+    severities = np.take(EVENT_SEVERITIES, rng.integers(0, len(EVENT_SEVERITIES), size=count)).tolist()
+    timestamps = (now - rng.integers(1, 1441, size=count).astype('timedelta64[m]')).astype(str).tolist()
+    host_ids = rng.integers(1, 11, size=count).tolist()
+    detected = np.take(_EVENT_TYPES, rng.integers(0, len(_EVENT_TYPES), size=count)).tolist()
+    statuses = np.take(_EVENT_STATUSES, rng.integers(0, len(_EVENT_STATUSES), size=count)).tolist()
+    
+    events = [
+        {
+            "id": f"evt_{i+1:04d}",
+            "title": titles[i],
+            "severity": severities[i],
+            "timestamp": timestamps[i],
+            "source": f"host-{host_ids[i]}",
+            "description": f"Detected {detected[i].lower()} on system",
+            "status": statuses[i]
+        }
+        for i in range(count)
+    ]
+    
+    return sorted(events, key=lambda x: x['timestamp'], reverse=True)
+
+# 模拟数据缓存: 名称 -> (构建时间, 版本号, 数据)
+_mock_data_cache: Dict[str, Tuple[float, int, List[Dict[str, Any]]]] = {}
+_mock_data_generation = 0
+
+def _get_cached(name: str, builder, count: int) -> Tuple[int, List[Dict[str, Any]]]:
+    """获取缓存的模拟数据及其版本号，超过TTL后使用固定种子重建"""
+    global _mock_data_generation
+    now = time.monotonic()
+    cached = _mock_data_cache.get(name)
+    if cached is None or now - cached[0] >= MOCK_DATA_TTL:
+        _mock_data_generation += 1
+        cached = (now, _mock_data_generation, builder(count, np.random.default_rng(MOCK_DATA_SEED)))
+        _mock_data_cache[name] = cached
+    return cached[1], cached[2]
+
+def get_threats() -> List[Dict[str, Any]]:
+    """获取共享的威胁情报数据集（按时间倒序）"""
+    return _get_cached("threats", generate_mock_threat_data, MOCK_THREAT_COUNT)[1]
+
+def get_iocs() -> List[Dict[str, Any]]:
+    """获取共享的IOC指标数据集"""
+    return _get_cached("iocs", generate_mock_ioc_data, MOCK_IOC_COUNT)[1]
+
+def get_events() -> List[Dict[str, Any]]:
+    """获取共享的安全事件数据集（按时间倒序）"""
+    return _get_cached("events", generate_mock_events, MOCK_EVENT_COUNT)[1]
+
+# 威胁情报精确匹配过滤字段
+THREAT_INDEX_FIELDS = ("type", "severity", "source", "status", "confidence")
+
+# 威胁情报索引缓存:
+#   generation: 索引对应的数据集版本号
+#   indexes: 倒排索引，字段 -> 取值 -> 数据下标集合
+#   search_text: 与数据下标对齐的小写 "标题\0描述" 文本
+#   search_text_with_tags: 与数据下标对齐的小写 "标题\0描述\0标签..." 文本
+_threat_indexes: Dict[str, Any] = {"generation": None, "indexes": {}, "search_text": [], "search_text_with_tags": []}
+
+def _refresh_threat_indexes() -> int:
+    """数据集重建后同步重建索引与搜索文本，返回当前数据集版本号"""
+    generation, threats = _get_cached("threats", generate_mock_threat_data, MOCK_THREAT_COUNT)
+    if _threat_indexes["generation"] == generation:
+        return generation
+    indexes = {field: {} for field in THREAT_INDEX_FIELDS}
+    search_text = []
+    search_text_with_tags = []
+    for i, threat in enumerate(threats):
+        for field in THREAT_INDEX_FIELDS:
+            indexes[field].setdefault(threat[field], set()).add(i)
+        text = (threat['title'] + '\0' + threat['description']).lower()
+        search_text.append(text)
+        search_text_with_tags.append('\0'.join([text, *threat['tags']]).lower())
+    _threat_indexes["indexes"] = indexes
+    _threat_indexes["search_text"] = search_text
+    _threat_indexes["search_text_with_tags"] = search_text_with_tags
+    _threat_indexes["generation"] = generation
+    return generation
+
+def get_threat_search_text(include_tags: bool = False) -> List[str]:
+    """获取与威胁情报数据集下标对齐、预先转为小写的搜索文本"""
+    _refresh_threat_indexes()
+    return _threat_indexes["search_text_with_tags" if include_tags else "search_text"]
+
+@lru_cache(maxsize=256)
+def _filter_threat_positions(generation: int, filters: Tuple[Optional[str], ...]) -> Tuple[int, ...]:
+    """通过倒排索引求交集，返回排序后的数据下标（按版本号缓存）"""
+    indexes = _threat_indexes["indexes"]
+    candidates = None
+    for field, value in zip(THREAT_INDEX_FIELDS, filters):
+        if value:
+            matched = indexes[field].get(value, set())
+            candidates = matched if candidates is None else candidates & matched
+    if candidates is None:
+        return tuple(range(len(_threat_indexes["search_text"])))
+    # 按下标排序以保持原有的时间倒序
+    return tuple(sorted(candidates))
+
+def filter_threat_positions(type: Optional[str] = None, severity: Optional[str] = None,
+                            source: Optional[str] = None, status: Optional[str] = None,
+                            confidence: Optional[str] = None) -> Tuple[int, ...]:
+    """按精确匹配条件过滤威胁情报，返回命中记录在数据集中的下标
+
+    前端轮询同一组过滤条件时直接命中缓存；数据集重建后版本号变化，旧缓存自然失效。
+    """
+    generation = _refresh_threat_indexes()
+    return _filter_threat_positions(generation, (type, severity, source, status, confidence))
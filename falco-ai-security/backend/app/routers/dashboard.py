@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 import logging
 import random
 
+from app.utils.time_utils import iso_now
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
@@ -27,22 +29,28 @@ def generate_security_overview():
     }
 
 def generate_threat_statistics():
-    """生成威胁统计数据"""
+    """生成威胁统计数据，同时返回威胁总数与拦截总数"""
     threat_types = [
         "Malware", "Phishing", "Brute Force", "SQL Injection", 
         "XSS", "DDoS", "Privilege Escalation", "Data Exfiltration"
     ]
     
     stats = []
+    total_count = 0
+    total_blocked = 0
     for threat_type in threat_types:
+        count = random.randint(0, 20)
+        blocked = random.randint(0, 15)
+        total_count += count
+        total_blocked += blocked
         stats.append({
             "type": threat_type,
-            "count": random.randint(0, 20),
-            "blocked": random.randint(0, 15),
+            "count": count,
+            "blocked": blocked,
             "severity": random.choice(["low", "medium", "high", "critical"])
         })
     
-    return stats
+    return stats, total_count, total_blocked
 
 def generate_system_performance():
     """生成系统性能数据"""
@@ -90,7 +98,7 @@ async def get_dashboard_overview():
         overview_data = {
             "security": generate_security_overview(),
             "performance": generate_system_performance(),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
         logger.info("Dashboard overview data retrieved successfully")
@@ -100,25 +108,25 @@ async def get_dashboard_overview():
         }
         
     except Exception as e:
-        logger.error(f"Error getting dashboard overview: {str(e)}")
+        logger.error("Error getting dashboard overview: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get dashboard overview")
 
 @router.get("/threats")
 async def get_threat_statistics():
     """获取威胁统计数据"""
     try:
-        threat_stats = generate_threat_statistics()
+        threat_stats, total_threats, total_blocked = generate_threat_statistics()
         
         logger.info("Threat statistics retrieved successfully")
         return {
             "success": True,
             "data": threat_stats,
-            "total_threats": sum(stat["count"] for stat in threat_stats),
-            "total_blocked": sum(stat["blocked"] for stat in threat_stats)
+            "total_threats": total_threats,
+            "total_blocked": total_blocked
         }
         
     except Exception as e:
-        logger.error(f"Error getting threat statistics: {str(e)}")
+        logger.error("Error getting threat statistics: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get threat statistics")
 
 @router.get("/activities")
@@ -129,7 +137,7 @@ async def get_recent_activities(
     try:
         activities = generate_recent_activities()[:limit]
         
-        logger.info(f"Retrieved {len(activities)} recent activities")
+        logger.info("Retrieved %d recent activities", len(activities))
         return {
             "success": True,
             "data": activities,
@@ -137,7 +145,7 @@ async def get_recent_activities(
         }
         
     except Exception as e:
-        logger.error(f"Error getting recent activities: {str(e)}")
+        logger.error("Error getting recent activities: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get recent activities")
 
 @router.get("/charts")
@@ -184,7 +192,7 @@ async def get_chart_data(
         else:
             data = []
         
-        logger.info(f"Chart data retrieved for type: {chart_type}")
+        logger.info("Chart data retrieved for type: %s", chart_type)
         return {
             "success": True,
             "data": data,
@@ -192,7 +200,7 @@ async def get_chart_data(
         }
         
     except Exception as e:
-        logger.error(f"Error getting chart data: {str(e)}")
+        logger.error("Error getting chart data: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get chart data")
 
 @router.get("/summary")
@@ -202,9 +210,9 @@ async def get_dashboard_summary():
         summary_data = {
             "overview": generate_security_overview(),
             "performance": generate_system_performance(),
-            "threats": generate_threat_statistics()[:5],  # 前5种威胁
+            "threats": generate_threat_statistics()[0][:5],  # 前5种威胁
             "activities": generate_recent_activities()[:5],  # 最近5个活动
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
         logger.info("Dashboard summary data retrieved successfully")
@@ -214,5 +222,5 @@ async def get_dashboard_summary():
         }
         
     except Exception as e:
-        logger.error(f"Error getting dashboard summary: {str(e)}")
+        logger.error("Error getting dashboard summary: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get dashboard summary")
\ No newline at end of file
@@ -13,6 +13,7 @@ import logging
 from app.services.neo4j_service import Neo4jService
 from app.services.graph_operations import GraphOperations
 from app.config import settings
+from app.utils.time_utils import iso_now
 
 logger = logging.getLogger(__name__)
 
@@ -38,7 +39,8 @@ async def get_graph_data(
     edge_type: Optional[str] = Query(None, description="关系类型过滤"),
     search: Optional[str] = Query(None, description="搜索关键词"),
     limit: Optional[int] = Query(100, description="返回数量限制"),
-    time_range: Optional[str] = Query(None, description="时间范围: 1h, 6h, 24h, 7d")
+    time_range: Optional[str] = Query(None, description="时间范围: 1h, 6h, 24h, 7d"),
+    cursor: Optional[int] = Query(None, description="分页游标，取上一页返回的next_cursor")
 ):
     """获取图谱数据"""
     try:
@@ -51,7 +53,7 @@ async def get_graph_data(
                 "success": True,
                 "data": generate_fallback_graph_data(),
                 "source": "fallback",
-                "timestamp": datetime.now().isoformat()
+                "timestamp": iso_now()
             }
         
         # 构建查询参数
@@ -66,28 +68,37 @@ async def get_graph_data(
         if time_range is not None:
             query_params["time_range"] = time_range
         
+        if cursor is not None:
+            query_params["cursor"] = cursor
+        
         # 从Neo4j获取图谱数据
         graph_data = await get_graph_from_neo4j(neo4j_service, query_params)
         
-        logger.info(f"图谱数据获取成功，节点数: {len(graph_data.get('nodes', []))}, 边数: {len(graph_data.get('edges', []))}")
+        node_count = len(graph_data.get('nodes', []))
+        edge_count = len(graph_data.get('edges', []))
+        logger.info("图谱数据获取成功，节点数: %d, 边数: %d", node_count, edge_count)
         
         return {
             "success": True,
             "data": graph_data,
             "source": "neo4j",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": iso_now(),
             "query_params": query_params
         }
         
     except Exception as e:
-        logger.error(f"获取图谱数据失败: {str(e)}", exc_info=True)
+        # 已有降级数据兜底，仅在DEBUG级别下记录完整堆栈，避免Neo4j故障期间每次请求都格式化traceback
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.exception("获取图谱数据失败: %s", e)
+        else:
+            logger.warning("Neo4j不可用，获取图谱数据失败: %s", e)
         # 返回模拟数据作为降级方案
         return {
             "success": True,
             "data": generate_fallback_graph_data(),
             "source": "fallback",
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
 
 @router.get("/nodes/{node_id}")
@@ -108,13 +119,13 @@ async def get_node_details(node_id: str):
         return {
             "success": True,
             "data": node_details,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"获取节点详情失败: {str(e)}", exc_info=True)
+        logger.error("获取节点详情失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="获取节点详情失败")
 
 @router.get("/relationships/{relationship_id}")
@@ -135,13 +146,13 @@ async def get_relationship_details(relationship_id: str):
         return {
             "success": True,
             "data": rel_details,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"获取关系详情失败: {str(e)}", exc_info=True)
+        logger.error("获取关系详情失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="获取关系详情失败")
 
 @router.post("/search")
@@ -165,13 +176,13 @@ async def search_graph(
             "data": search_results,
             "query": query,
             "search_type": search_type,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"图谱搜索失败: {str(e)}", exc_info=True)
+        logger.error("图谱搜索失败: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail="图谱搜索失败")
 
 @router.get("/statistics")
@@ -186,7 +197,7 @@ async def get_graph_statistics():
                 "success": True,
                 "data": generate_fallback_statistics(),
                 "source": "fallback",
-                "timestamp": datetime.now().isoformat()
+                "timestamp": iso_now()
             }
         
         # 从Neo4j获取统计信息
@@ -196,17 +207,20 @@ async def get_graph_statistics():
             "success": True,
             "data": stats,
             "source": "neo4j",
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
         
     except Exception as e:
-        logger.error(f"获取图谱统计失败: {str(e)}", exc_info=True)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.exception("获取图谱统计失败: %s", e)
+        else:
+            logger.warning("Neo4j不可用，获取图谱统计失败: %s", e)
         return {
             "success": True,
             "data": generate_fallback_statistics(),
             "source": "fallback",
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": iso_now()
         }
 
 # 辅助函数
@@ -225,6 +239,11 @@ async def get_graph_from_neo4j(neo4j_service: Neo4jService, params: Dict[str, An
                 where_conditions.append("(n.name CONTAINS $search OR n.label CONTAINS $search)")
                 query_params['search'] = params['search']
             
+            # 键集分页：从上一页最后一个节点ID之后继续
+            if params.get('cursor') is not None:
+                where_conditions.append("id(n) > $cursor")
+                query_params['cursor'] = params['cursor']
+            
             # 时间范围过滤
             if params.get('time_range'):
                 time_filter = get_time_filter(params['time_range'])
@@ -239,6 +258,7 @@ async def get_graph_from_neo4j(neo4j_service: Neo4jService, params: Dict[str, An
             MATCH (n)
             {where_clause}
             RETURN n
+            ORDER BY id(n)
             LIMIT $limit
             """
             query_params['limit'] = params.get('limit', 100)
@@ -282,13 +302,17 @@ async def get_graph_from_neo4j(neo4j_service: Neo4jService, params: Dict[str, An
             else:
                 edges = []
             
+            # 本页已满时返回下一页游标，否则说明已到末尾
+            next_cursor = int(nodes[-1]['id']) if nodes and len(nodes) == query_params['limit'] else None
+            
             return {
                 'nodes': nodes,
-                'edges': edges
+                'edges': edges,
+                'next_cursor': next_cursor
             }
             
     except Exception as e:
-        logger.error(f"Neo4j查询失败: {str(e)}")
+        logger.error("Neo4j查询失败: %s", e)
         raise
 
 async def get_node_from_neo4j(neo4j_service: Neo4jService, node_id: str) -> Dict[str, Any]:
@@ -317,7 +341,7 @@ async def get_node_from_neo4j(neo4j_service: Neo4jService, node_id: str) -> Dict
             }
             
     except Exception as e:
-        logger.error(f"获取节点详情失败: {str(e)}")
+        logger.error("获取节点详情失败: %s", e)
         raise
 
 async def get_relationship_from_neo4j(neo4j_service: Neo4jService, rel_id: str) -> Dict[str, Any]:
@@ -356,7 +380,7 @@ async def get_relationship_from_neo4j(neo4j_service: Neo4jService, rel_id: str)
             }
             
     except Exception as e:
-        logger.error(f"获取关系详情失败: {str(e)}")
+        logger.error("获取关系详情失败: %s", e)
         raise
 
 async def search_graph_in_neo4j(neo4j_service: Neo4jService, query: str, search_type: str, limit: int) -> Dict[str, Any]:
@@ -417,7 +441,7 @@ async def search_graph_in_neo4j(neo4j_service: Neo4jService, query: str, search_
             }
             
     except Exception as e:
-        logger.error(f"图谱搜索失败: {str(e)}")
+        logger.error("图谱搜索失败: %s", e)
         raise
 
 def get_time_filter(time_range: str) -> Optional[datetime]:
@@ -443,7 +467,7 @@ def generate_fallback_graph_data() -> Dict[str, Any]:
             {'id': 'host2', 'type': 'host', 'label': 'DB-Server-01', 'properties': {'ip': '192.168.1.20', 'os': 'CentOS 8'}},
             {'id': 'user1', 'type': 'user', 'label': 'admin', 'properties': {'uid': 1000, 'groups': ['sudo', 'admin']}},
             {'id': 'proc1', 'type': 'process', 'label': 'nginx', 'properties': {'pid': 1234, 'cmd': '/usr/sbin/nginx'}},
-            {'id': 'event1', 'type': 'event', 'label': '异常登录', 'properties': {'severity': 'high', 'timestamp': datetime.now().isoformat()}}
+            {'id': 'event1', 'type': 'event', 'label': '异常登录', 'properties': {'severity': 'high', 'timestamp': iso_now()}}
         ],
         'edges': [
             {'id': 'e1', 'source': 'user1', 'target': 'host1', 'type': 'access', 'label': 'SSH登录'},
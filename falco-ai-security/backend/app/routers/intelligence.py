@@ -6,159 +6,64 @@ Falco AI Security System - Intelligence Router
 """
 
 from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import Optional, List, Dict, Any
-from datetime import datetime, timedelta
+from fastapi.responses import ORJSONResponse
+from typing import Optional, List, Dict, Any, Callable
+from datetime import datetime
+from bisect import bisect_left
+from functools import lru_cache
+from itertools import islice
 import logging
-import random
+import re
 import uuid
 
-logger = logging.getLogger(__name__)
-
-router = APIRouter(prefix="/intelligence", tags=["intelligence"])
+from app import mocks
 
-# 威胁类型配置
-THREAT_TYPES = {
-    "malware": {"label": "恶意软件", "color": "#f44336"},
-    "phishing": {"label": "钓鱼攻击", "color": "#ff9800"},
-    "ransomware": {"label": "勒索软件", "color": "#e91e63"},
-    "apt": {"label": "APT攻击", "color": "#9c27b0"},
-    "botnet": {"label": "僵尸网络", "color": "#3f51b5"},
-    "ddos": {"label": "DDoS攻击", "color": "#2196f3"},
-    "vulnerability": {"label": "漏洞利用", "color": "#ff5722"},
-    "insider": {"label": "内部威胁", "color": "#795548"},
-    "social": {"label": "社会工程", "color": "#607d8b"},
-    "data_breach": {"label": "数据泄露", "color": "#009688"}
-}
+logger = logging.getLogger(__name__)
 
-# 威胁严重程度配置
-THREAT_SEVERITY = {
-    "critical": {"label": "严重", "score": 4},
-    "high": {"label": "高", "score": 3},
-    "medium": {"label": "中", "score": 2},
-    "low": {"label": "低", "score": 1}
-}
+router = APIRouter(prefix="/intelligence", tags=["intelligence"], default_response_class=ORJSONResponse)
 
-# 威胁来源配置
-THREAT_SOURCES = {
-    "internal": {"label": "内部情报"},
-    "external": {"label": "外部情报"},
-    "osint": {"label": "开源情报"},
-    "commercial": {"label": "商业情报"},
-    "government": {"label": "政府情报"}
-}
+def _encode_cursor(index: int) -> str:
+    """将数据集下标编码为分页游标"""
+    return str(index)
 
-# 威胁状态配置
-THREAT_STATUS = {
-    "active": {"label": "活跃"},
-    "monitoring": {"label": "监控中"},
-    "mitigated": {"label": "已缓解"},
-    "resolved": {"label": "已解决"}
-}
+def _decode_cursor(cursor: str) -> int:
+    """将分页游标解码为数据集下标"""
+    try:
+        index = int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if index < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return index
 
-# 可信度等级
-CONFIDENCE_LEVELS = {
-    "high": {"label": "高", "score": 3},
-    "medium": {"label": "中", "score": 2},
-    "low": {"label": "低", "score": 1}
-}
+@lru_cache(maxsize=128)
+def _compile_search_matcher(query: str) -> Callable[[str], bool]:
+    """将搜索关键词编译为匹配函数
 
-def generate_mock_threat_data(count: int = 50):
-    """生成模拟威胁情报数据"""
-    threats = []
-    types = list(THREAT_TYPES.keys())
-    severities = list(THREAT_SEVERITY.keys())
-    sources = list(THREAT_SOURCES.keys())
-    statuses = list(THREAT_STATUS.keys())
-    confidences = list(CONFIDENCE_LEVELS.keys())
+    单个关键词直接做子串匹配；多个空白分隔的关键词编译为一个正则，
+    一次扫描文本即可判断是否包含全部关键词（AND语义）。
+    """
+    tokens = list(dict.fromkeys(query.lower().split()))
+    # 被其他关键词包含的关键词已隐含匹配，去掉以免前缀相同时被遮蔽
+    tokens = [t for t in tokens if not any(t != other and t in other for other in tokens)]
     
-    for i in range(count):
-        timestamp = datetime.now() - timedelta(hours=random.randint(1, 168))  # 最近一周
-        threat_type = random.choice(types)
-        severity = random.choice(severities)
-        
-        threat = {
-            "id": f"threat_{i + 1}",
-            "title": f"威胁情报 {i + 1}",
-            "description": f"这是一个关于{THREAT_TYPES[threat_type]['label']}的威胁情报描述",
-            "type": threat_type,
-            "severity": severity,
-            "source": random.choice(sources),
-            "status": random.choice(statuses),
-            "confidence": random.choice(confidences),
-            "timestamp": timestamp.isoformat(),
-            "lastUpdated": (timestamp + timedelta(minutes=random.randint(1, 60))).isoformat(),
-            "indicators": {
-                "ips": [
-                    f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}",
-                    f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}"
-                ],
-                "domains": [
-                    f"malicious-domain-{i + 1}.com",
-                    f"suspicious-site-{i + 1}.net"
-                ],
-                "hashes": [
-                    f"{uuid.uuid4().hex}",
-                    f"{uuid.uuid4().hex}"
-                ],
-                "urls": [
-                    f"https://malicious-url-{i + 1}.com/path",
-                    f"http://suspicious-url-{i + 1}.org/endpoint"
-                ]
-            },
-            "tags": [f"tag-{random.randint(1, 10)}", f"category-{random.randint(1, 5)}"],
-            "author": f"analyst-{random.randint(1, 5)}",
-            "organization": f"org-{random.randint(1, 3)}",
-            "references": [
-                f"https://reference-{i + 1}.com",
-                f"https://source-{i + 1}.org"
-            ],
-            "isFavorite": random.random() > 0.8,
-            "isBookmarked": random.random() > 0.7,
-            "viewCount": random.randint(1, 100),
-            "shareCount": random.randint(0, 20)
-        }
-        
-        threats.append(threat)
+    if len(tokens) <= 1:
+        token = tokens[0] if tokens else query.lower()
+        return lambda text: token in text
     
-    return sorted(threats, key=lambda x: x['timestamp'], reverse=True)
-
-def generate_mock_ioc_data(count: int = 30):
-    """生成模拟IOC指标数据"""
-    iocs = []
-    ioc_types = ["ip", "domain", "hash", "url", "email"]
+    # 零宽前瞻使得每个位置都会被检查，关键词之间重叠也能匹配到
+    pattern = re.compile("(?=(" + "|".join(map(re.escape, tokens)) + "))")
+    token_count = len(tokens)
     
-    for i in range(count):
-        ioc_type = random.choice(ioc_types)
-        
-        if ioc_type == "ip":
-            value = f"{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}.{random.randint(1, 255)}"
-        elif ioc_type == "domain":
-            value = f"malicious-{i + 1}.com"
-        elif ioc_type == "hash":
-            value = uuid.uuid4().hex
-        elif ioc_type == "url":
-            value = f"https://malicious-{i + 1}.com/path"
-        else:  # email
-            value = f"attacker{i + 1}@malicious.com"
-        
-        ioc = {
-            "id": f"ioc_{i + 1}",
-            "type": ioc_type,
-            "value": value,
-            "description": f"恶意{ioc_type}指标",
-            "severity": random.choice(list(THREAT_SEVERITY.keys())),
-            "confidence": random.choice(list(CONFIDENCE_LEVELS.keys())),
-            "source": random.choice(list(THREAT_SOURCES.keys())),
-            "tags": [f"tag-{random.randint(1, 5)}"],
-            "firstSeen": (datetime.now() - timedelta(days=random.randint(1, 30))).isoformat(),
-            "lastSeen": (datetime.now() - timedelta(hours=random.randint(1, 24))).isoformat(),
-            "isActive": random.random() > 0.3,
-            "hitCount": random.randint(0, 50)
-        }
-        
-        iocs.append(ioc)
+    def match_all(text: str) -> bool:
+        found = set()
+        for m in pattern.finditer(text):
+            found.add(m.group(1))
+            if len(found) == token_count:
+                return True
+        return False
     
-    return iocs
+    return match_all
 
 @router.get("/threats")
 async def get_threat_intelligence(
@@ -169,36 +74,43 @@ async def get_threat_intelligence(
     confidence: Optional[str] = Query(None, description="可信度过滤"),
     search: Optional[str] = Query(None, description="搜索关键词"),
     limit: Optional[int] = Query(50, description="返回数量限制"),
-    offset: Optional[int] = Query(0, description="偏移量")
+    offset: Optional[int] = Query(0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="分页游标，取上一页返回的page_info.next_cursor，指定后忽略offset")
 ):
     """获取威胁情报列表"""
     try:
-        # 生成模拟数据
-        all_threats = generate_mock_threat_data(100)
+        start_index = _decode_cursor(cursor) if cursor is not None else None
         
-        # 应用过滤器
-        filtered_threats = all_threats
+        # 获取共享的模拟数据，并通过倒排索引完成精确匹配过滤
+        all_threats = mocks.get_threats()
+        positions = mocks.filter_threat_positions(type, severity, source, status, confidence)
         
-        if type:
-            filtered_threats = [t for t in filtered_threats if t['type'] == type]
-        if severity:
-            filtered_threats = [t for t in filtered_threats if t['severity'] == severity]
-        if source:
-            filtered_threats = [t for t in filtered_threats if t['source'] == source]
-        if status:
-            filtered_threats = [t for t in filtered_threats if t['status'] == status]
-        if confidence:
-            filtered_threats = [t for t in filtered_threats if t['confidence'] == confidence]
-        if search:
-            search_lower = search.lower()
-            filtered_threats = [
-                t for t in filtered_threats 
-                if search_lower in t['title'].lower() or search_lower in t['description'].lower()
-            ]
+        if not search:
+            # 无关键词搜索时总数已知，游标通过二分定位起点，直接按页取数据
+            total = len(positions)
+            start = bisect_left(positions, start_index) if start_index is not None else offset
+            page_positions = positions[start:start + limit]
+            has_more = start + len(page_positions) < total
+        else:
+            # 关键词过滤与分页合并为一次遍历，只保留当前页数据，同时统计总数
+            matches = _compile_search_matcher(search)
+            search_text = mocks.get_threat_search_text()
+            page_positions = []
+            has_more = False
+            total = 0
+            for i in positions:
+                if not matches(search_text[i]):
+                    continue
+                in_window = i >= start_index if start_index is not None else total >= offset
+                if in_window:
+                    if len(page_positions) < limit:
+                        page_positions.append(i)
+                    else:
+                        has_more = True
+                total += 1
         
-        # 分页
-        total = len(filtered_threats)
-        paginated_threats = filtered_threats[offset:offset + limit]
+        paginated_threats = [all_threats[i] for i in page_positions]
+        next_cursor = _encode_cursor(page_positions[-1] + 1) if has_more else None
         
         logger.info(f"Retrieved {len(paginated_threats)} threat intelligence items")
         return {
@@ -206,8 +118,14 @@ async def get_threat_intelligence(
             "data": paginated_threats,
             "total": total,
             "limit": limit,
-            "offset": offset
+            "offset": offset,
+            "page_info": {
+                "next_cursor": next_cursor,
+                "has_more": has_more
+            }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting threat intelligence: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get threat intelligence")
@@ -219,16 +137,15 @@ async def search_threat_intel(
 ):
     """搜索威胁情报"""
     try:
-        # 生成模拟数据
-        all_threats = generate_mock_threat_data(100)
+        # 获取缓存的模拟数据
+        all_threats = mocks.get_threats()
+        search_text = mocks.get_threat_search_text(include_tags=True)
         
-        # 执行搜索
-        query_lower = query.lower()
+        # 执行搜索（在预先转为小写的文本上匹配全部关键词）
+        matches = _compile_search_matcher(query)
         search_results = [
-            t for t in all_threats
-            if (query_lower in t['title'].lower() or 
-                query_lower in t['description'].lower() or
-                any(query_lower in tag.lower() for tag in t['tags']))
+            all_threats[i] for i, text in enumerate(search_text)
+            if matches(text)
         ]
         
         logger.info(f"Search for '{query}' returned {len(search_results)} results")
@@ -251,21 +168,22 @@ async def get_ioc_indicators(
 ):
     """获取IOC指标列表"""
     try:
-        # 生成模拟数据
-        all_iocs = generate_mock_ioc_data(50)
-        
-        # 应用过滤器
-        filtered_iocs = all_iocs
+        # 获取共享的模拟数据
+        all_iocs = mocks.get_iocs()
         
+        # 组合过滤条件，单次遍历并在达到数量限制后停止
+        predicates = []
         if type:
-            filtered_iocs = [ioc for ioc in filtered_iocs if ioc['type'] == type]
+            predicates.append(lambda ioc: ioc['type'] == type)
         if severity:
-            filtered_iocs = [ioc for ioc in filtered_iocs if ioc['severity'] == severity]
+            predicates.append(lambda ioc: ioc['severity'] == severity)
         if active_only:
-            filtered_iocs = [ioc for ioc in filtered_iocs if ioc['isActive']]
+            predicates.append(lambda ioc: ioc['isActive'])
         
-        # 限制数量
-        limited_iocs = filtered_iocs[:limit]
+        limited_iocs = list(islice(
+            (ioc for ioc in all_iocs if all(p(ioc) for p in predicates)),
+            limit
+        ))
         
         logger.info(f"Retrieved {len(limited_iocs)} IOC indicators")
         return {
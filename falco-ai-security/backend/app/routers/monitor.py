@@ -6,65 +6,55 @@ Falco AI Security System - Monitor Router
 """
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
+from collections import deque
+from itertools import islice
 import logging
+import time
 import psutil
 
+from app import mocks
+from app.metrics_broker import metrics_broker
+
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/monitor", tags=["monitor"])
+router = APIRouter(prefix="/monitor", tags=["monitor"], default_response_class=ORJSONResponse)
 
 # 模拟数据生成函数
-# 全局变量用于存储上次网络统计数据
-_last_network_stats = None
-_last_network_time = None
+# 活跃连接数缓存 (连接数, 采样时间)，net_connections需要遍历/proc/net，开销较大
+CONNECTIONS_CACHE_TTL = 2.0
+_connections_cache = (0, 0.0)
 
 def get_real_system_metrics():
     """获取真实的系统指标数据"""
-    global _last_network_stats, _last_network_time
+    global _connections_cache
     
     try:
-        now = datetime.now()
-        
-        # CPU使用率
-        cpu_percent = psutil.cpu_percent(interval=1)
-        
-        # 内存使用情况
-        memory = psutil.virtual_memory()
-        
-        # 磁盘使用情况
-        disk = psutil.disk_usage('/')
-        
-        # 网络统计
-        current_network = psutil.net_io_counters()
-        current_time = now.timestamp()
-        
-        # 计算网络速率 (MB/s)
-        network_in_speed = 0
-        network_out_speed = 0
-        network_total_speed = 0
+        # 读取指标采样器的最新快照（CPU、内存、磁盘、网络由后台任务每秒采样一次）
+        snapshot = metrics_broker.get_snapshot()
+        now = snapshot["timestamp"]
+        cpu_percent = snapshot["cpu"]
+        memory = snapshot["memory"]
+        disk = snapshot["disk"]
+        current_network = snapshot["network"]
         
-        if _last_network_stats and _last_network_time:
-            time_delta = current_time - _last_network_time
-            if time_delta > 0:
-                # 计算每秒的字节数，然后转换为MB/s
-                bytes_in_delta = current_network.bytes_recv - _last_network_stats.bytes_recv
-                bytes_out_delta = current_network.bytes_sent - _last_network_stats.bytes_sent
-                
-                network_in_speed = round((bytes_in_delta / time_delta) / (1024 * 1024), 2)
-                network_out_speed = round((bytes_out_delta / time_delta) / (1024 * 1024), 2)
-                network_total_speed = round(network_in_speed + network_out_speed, 2)
+        # 网络速率 (MB/s) 由采样器基于相邻两次采样计算
+        network_in_speed = snapshot["network_in_speed"]
+        network_out_speed = snapshot["network_out_speed"]
+        network_total_speed = round(network_in_speed + network_out_speed, 2)
         
-        # 更新上次统计数据
-        _last_network_stats = current_network
-        _last_network_time = current_time
-        
-        # 获取活跃连接数
-        try:
-            active_connections = len(psutil.net_connections())
-        except (psutil.AccessDenied, OSError):
-            active_connections = 0
+        # 获取活跃连接数（TTL内复用缓存，仅统计inet套接字）
+        now_mono = time.monotonic()
+        if now_mono - _connections_cache[1] < CONNECTIONS_CACHE_TTL:
+            active_connections = _connections_cache[0]
+        else:
+            try:
+                active_connections = len(psutil.net_connections(kind='inet'))
+            except (psutil.AccessDenied, OSError):
+                active_connections = 0
+            _connections_cache = (active_connections, now_mono)
         
         return {
             "timestamp": now.isoformat(),
@@ -119,24 +109,60 @@ def generate_mock_metrics():
         "threatsBlocked": random.randint(0, 3)
     }
 
-def generate_mock_trend_data(hours: int = 24):
-    """生成模拟的趋势数据"""
+# 严重级别过滤参数只接受模拟数据集中存在的级别
+_EVENT_SEVERITY_PATTERN = f"^({'|'.join(mocks.EVENT_SEVERITIES)})$"
+
+# 模拟告警的取值元组
+_ALERT_TYPES = (
+    "High CPU usage detected",
+    "Suspicious network activity",
+    "Failed login attempts",
+    "Disk space running low",
+    "Memory usage critical"
+)
+_ALERT_SEVERITIES = ("warning", "error", "critical")
+
+# 趋势数据环形缓冲区，保留最近7天的小时级数据点
+TREND_BUFFER_SIZE = 168
+_trend_buffer = deque(maxlen=TREND_BUFFER_SIZE)
+_trend_last_time = None
+
+def _generate_trend_point(timestamp: datetime) -> Dict[str, Any]:
+    """生成单个趋势数据点"""
     import random
-    data = []
+    return {
+        "time": timestamp.strftime("%H:%M"),
+        "timestamp": timestamp.isoformat(),
+        "threats": random.randint(0, 10),
+        "blocked": random.randint(0, 8),
+        "cpu": round(random.uniform(20, 80), 1),
+        "memory": round(random.uniform(30, 70), 1)
+    }
+
+def _refresh_trend_buffer():
+    """按小时向环形缓冲区追加新数据点，首次访问时填满缓冲区"""
+    global _trend_last_time
     now = datetime.now()
     
-    for i in range(hours):
-        timestamp = now - timedelta(hours=hours-i-1)
-        data.append({
-            "time": timestamp.strftime("%H:%M"),
-            "timestamp": timestamp.isoformat(),
-            "threats": random.randint(0, 10),
-            "blocked": random.randint(0, 8),
-            "cpu": round(random.uniform(20, 80), 1),
-            "memory": round(random.uniform(30, 70), 1)
-        })
+    if _trend_last_time is None:
+        new_points = TREND_BUFFER_SIZE
+        _trend_last_time = now - timedelta(hours=TREND_BUFFER_SIZE)
+    else:
+        elapsed_hours = int((now - _trend_last_time) / timedelta(hours=1))
+        new_points = min(elapsed_hours, TREND_BUFFER_SIZE)
+        if new_points < elapsed_hours:
+            _trend_last_time = now - timedelta(hours=new_points)
     
-    return data
+    start_time = _trend_last_time
+    _trend_buffer.extend(
+        _generate_trend_point(start_time + timedelta(hours=k)) for k in range(1, new_points + 1)
+    )
+    _trend_last_time = start_time + timedelta(hours=new_points)
+
+def generate_mock_trend_data(hours: int = 24):
+    """获取模拟的趋势数据（最近hours个小时级数据点）"""
+    _refresh_trend_buffer()
+    return list(islice(_trend_buffer, max(len(_trend_buffer) - hours, 0), None))
 
 @router.get("/metrics")
 async def get_system_metrics():
@@ -182,36 +208,24 @@ async def get_monitor_data(
 
 @router.get("/events")
 async def get_security_events(
-    limit: Optional[int] = Query(10, description="返回事件数量限制"),
-    severity: Optional[str] = Query(None, description="事件严重级别过滤")
+    limit: int = Query(10, ge=1, le=mocks.MOCK_EVENT_COUNT,
+                       description=f"返回事件数量限制（1-{mocks.MOCK_EVENT_COUNT}）"),
+    severity: Optional[str] = Query(None, pattern=_EVENT_SEVERITY_PATTERN,
+                                    description=f"事件严重级别过滤: {', '.join(mocks.EVENT_SEVERITIES)}")
 ):
-    """获取安全事件列表"""
+    """
+    获取安全事件列表
+
+    事件取自共享的模拟数据集（共 MOCK_EVENT_COUNT 条）；按严重级别过滤时，
+    返回数量不超过数据集中该级别的事件数，可能少于 limit
+    """
     try:
-        import random
-        
-        # 模拟安全事件数据
-        severities = ["critical", "high", "medium", "low"]
-        event_types = [
-            "Suspicious file access",
-            "Unauthorized network connection", 
-            "Privilege escalation attempt",
-            "Malware detection",
-            "Brute force attack",
-            "SQL injection attempt"
-        ]
-        
-        events = []
-        for i in range(limit):
-            event_severity = severity if severity else random.choice(severities)
-            events.append({
-                "id": f"evt_{i+1:04d}",
-                "title": random.choice(event_types),
-                "severity": event_severity,
-                "timestamp": (datetime.now() - timedelta(minutes=random.randint(1, 1440))).isoformat(),
-                "source": f"host-{random.randint(1, 10)}",
-                "description": f"Detected {random.choice(event_types).lower()} on system",
-                "status": random.choice(["new", "investigating", "resolved"])
-            })
+        # 从共享的模拟安全事件数据集中按严重级别过滤
+        all_events = mocks.get_events()
+        if severity:
+            events = list(islice((e for e in all_events if e['severity'] == severity), limit))
+        else:
+            events = all_events[:limit]
         
         logger.info(f"Retrieved {len(events)} security events")
         return {
@@ -229,25 +243,18 @@ async def get_active_alerts():
     try:
         import random
         
-        alerts = []
-        alert_types = [
-            "High CPU usage detected",
-            "Suspicious network activity",
-            "Failed login attempts",
-            "Disk space running low",
-            "Memory usage critical"
-        ]
-        
         # 生成0-3个随机告警
         num_alerts = random.randint(0, 3)
-        for i in range(num_alerts):
-            alerts.append({
+        alerts = [
+            {
                 "id": f"alert_{i+1}",
-                "message": random.choice(alert_types),
-                "severity": random.choice(["warning", "error", "critical"]),
+                "message": random.choice(_ALERT_TYPES),
+                "severity": random.choice(_ALERT_SEVERITIES),
                 "timestamp": (datetime.now() - timedelta(minutes=random.randint(1, 60))).isoformat(),
                 "acknowledged": random.choice([True, False])
-            })
+            }
+            for i in range(num_alerts)
+        ]
         
         logger.info(f"Retrieved {len(alerts)} active alerts")
         return {
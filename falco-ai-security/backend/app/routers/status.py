@@ -6,31 +6,69 @@ Falco AI Security System - Status Router
 """
 
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Any, Tuple
 from datetime import datetime
+import asyncio
 import logging
 import psutil
 import os
+import time
+
+from app.metrics_broker import metrics_broker
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/status", tags=["status"])
+router = APIRouter(prefix="/status", tags=["status"], default_response_class=ORJSONResponse)
+
+# 需要检查状态的系统服务
+MONITORED_SERVICES = ("neo4j", "redis", "falco", "nginx")
+# 服务状态缓存TTL（秒）
+SERVICE_STATUS_CACHE_TTL = 5
+# 服务状态缓存: 服务名 -> (检查时间, 状态)
+_service_status_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+# 进行中的服务状态查询: 服务名 -> Task，并发请求共享同一次子进程调用
+_service_status_inflight: Dict[str, asyncio.Task] = {}
 
-def check_service_status(service_name: str) -> Dict[str, Any]:
-    """检查服务状态"""
-    import subprocess
+async def check_service_status(service_name: str) -> Dict[str, Any]:
+    """检查服务状态（带TTL缓存）"""
+    cached = _service_status_cache.get(service_name)
+    if cached and time.monotonic() - cached[0] < SERVICE_STATUS_CACHE_TTL:
+        return cached[1]
     
+    task = _service_status_inflight.get(service_name)
+    if task is None:
+        task = asyncio.ensure_future(_refresh_service_status(service_name))
+        _service_status_inflight[service_name] = task
+    return await asyncio.shield(task)
+
+async def _refresh_service_status(service_name: str) -> Dict[str, Any]:
+    """查询服务状态并写入缓存"""
+    try:
+        status = await _query_service_status(service_name)
+        _service_status_cache[service_name] = (time.monotonic(), status)
+        return status
+    finally:
+        _service_status_inflight.pop(service_name, None)
+
+async def _query_service_status(service_name: str) -> Dict[str, Any]:
+    """查询服务的实际状态"""
     try:
         if service_name == "falco":
-            # 检查Falco服务的实际状态
-            result = subprocess.run(
-                ["systemctl", "is-active", "falco-modern-bpf"],
-                capture_output=True,
-                text=True,
-                timeout=5
+            # 检查Falco服务的实际状态，使用异步子进程避免阻塞事件循环
+            proc = await asyncio.create_subprocess_exec(
+                "systemctl", "is-active", "falco-modern-bpf",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
             )
+            try:
+                stdout, _ = await asyncio.wait_for(proc.communicate(), timeout=5)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                raise
             
-            if result.returncode == 0 and result.stdout.strip() == "active":
+            if proc.returncode == 0 and stdout.decode().strip() == "active":
                 return {
                     "status": "running",
                     "port": 8765,  # Falco health webserver port
@@ -61,17 +99,12 @@ def check_service_status(service_name: str) -> Dict[str, Any]:
 def get_system_resources() -> Dict[str, Any]:
     """获取系统资源使用情况"""
     try:
-        # CPU使用率
-        cpu_percent = psutil.cpu_percent(interval=1)
-        
-        # 内存使用情况
-        memory = psutil.virtual_memory()
-        
-        # 磁盘使用情况
-        disk = psutil.disk_usage('/')
-        
-        # 网络统计
-        network = psutil.net_io_counters()
+        # 读取指标采样器的最新快照，与监控路由共享同一次采样
+        snapshot = metrics_broker.get_snapshot()
+        cpu_percent = snapshot["cpu"]
+        memory = snapshot["memory"]
+        disk = snapshot["disk"]
+        network = snapshot["network"]
         
         return {
             "cpu": {
@@ -105,20 +138,20 @@ def get_system_resources() -> Dict[str, Any]:
 async def get_system_status():
     """获取系统整体状态"""
     try:
-        # 检查各个服务状态
-        services = {
-            "neo4j": check_service_status("neo4j"),
-            "redis": check_service_status("redis"),
-            "falco": check_service_status("falco"),
-            "nginx": check_service_status("nginx")
-        }
+        # 并发检查各个服务状态
+        statuses = await asyncio.gather(*(check_service_status(name) for name in MONITORED_SERVICES))
+        services = dict(zip(MONITORED_SERVICES, statuses))
         
         # 获取系统资源
         resources = get_system_resources()
         
-        # 计算整体健康状态
-        healthy_services = sum(1 for s in services.values() if s.get("health") == "healthy")
-        total_services = len([s for s in services.values() if s.get("status") != "disabled"])
+        # 计算整体健康状态（单次遍历同时统计健康数与有效服务数）
+        healthy_services = total_services = 0
+        for service in services.values():
+            if service.get("status") != "disabled":
+                total_services += 1
+            if service.get("health") == "healthy":
+                healthy_services += 1
         
         overall_health = "healthy" if healthy_services == total_services else "degraded"
         if healthy_services == 0:
@@ -167,13 +200,11 @@ async def health_check():
 async def get_services_status():
     """获取所有服务状态"""
     try:
+        statuses = await asyncio.gather(*(check_service_status(name) for name in MONITORED_SERVICES))
         services = {
             "backend": {"status": "running", "health": "healthy", "port": 8000},
             "frontend": {"status": "running", "health": "healthy", "port": 3000},
-            "neo4j": check_service_status("neo4j"),
-            "redis": check_service_status("redis"),
-            "falco": check_service_status("falco"),
-            "nginx": check_service_status("nginx")
+            **dict(zip(MONITORED_SERVICES, statuses))
         }
         
         logger.info("Services status retrieved successfully")
@@ -5,28 +5,46 @@ WebSocket测试路由
 用于测试实时连接功能
 """
 
-import asyncio
-import json
 from datetime import datetime
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Any, Optional
 
 from app.services.websocket_service import websocket_service
+from app.services.simulation_engine import simulation_engine, SECURITY_AND_METRICS_MIX, MAX_SIMULATION_SECONDS
+from app.utils.routing import ORJSONRoute
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse, route_class=ORJSONRoute)
+
+# 请求模型
+class TestEventRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    rule: str = 'Test Security Rule'
+    priority: str = 'Warning'
+    message: str = 'This is a test security event'
+    fields: Dict[str, Any] = {}
+
+class BroadcastMessageRequest(BaseModel):
+    model_config = ConfigDict(extra='ignore')
+
+    event_type: str = 'test_message'
+    data: Dict[str, Any] = {}
+    room: Optional[str] = None
 
 @router.post("/test/send-event")
-async def send_test_event(event_data: Dict[str, Any]):
+async def send_test_event(event_data: TestEventRequest):
     """发送测试事件"""
     try:
         # 发送测试安全事件
         test_event = {
-            'rule': event_data.get('rule', 'Test Security Rule'),
-            'priority': event_data.get('priority', 'Warning'),
-            'message': event_data.get('message', 'This is a test security event'),
-            'timestamp': datetime.now().isoformat(),
+            'rule': event_data.rule,
+            'priority': event_data.priority,
+            'message': event_data.message,
+            'timestamp': datetime.now(),
             'source': 'test',
-            'fields': event_data.get('fields', {})
+            'fields': event_data.fields
         }
         
         await websocket_service.send_security_alert(test_event)
@@ -53,7 +71,7 @@ async def send_test_metrics():
                 'bytes_sent': 1024000,
                 'bytes_recv': 2048000
             },
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         }
         
         await websocket_service.send_system_metrics(test_metrics)
@@ -81,12 +99,12 @@ async def get_connection_stats():
         raise HTTPException(status_code=500, detail=f"获取连接统计失败: {str(e)}")
 
 @router.post("/test/broadcast")
-async def broadcast_test_message(message_data: Dict[str, Any]):
+async def broadcast_test_message(message_data: BroadcastMessageRequest):
     """广播测试消息"""
     try:
-        event_type = message_data.get('event_type', 'test_message')
-        data = message_data.get('data', {})
-        room = message_data.get('room')
+        event_type = message_data.event_type
+        data = message_data.data
+        room = message_data.room
         
         await websocket_service.broadcast_event(event_type, data, room)
         
@@ -104,50 +122,8 @@ async def broadcast_test_message(message_data: Dict[str, Any]):
 async def simulate_falco_event():
     """模拟Falco安全事件"""
     try:
-        # 模拟各种类型的Falco事件
-        falco_events = [
-            {
-                'rule': 'Terminal shell in container',
-                'priority': 'Notice',
-                'message': 'A shell was used as the entrypoint/exec point into a container with an attached terminal.',
-                'fields': {
-                    'container.id': 'abc123',
-                    'container.name': 'suspicious-container',
-                    'proc.name': 'bash',
-                    'user.name': 'root'
-                }
-            },
-            {
-                'rule': 'Write below binary dir',
-                'priority': 'Error',
-                'message': 'An attempt to write to any file below a set of binary directories',
-                'fields': {
-                    'fd.name': '/bin/malicious',
-                    'proc.name': 'cp',
-                    'user.name': 'attacker'
-                }
-            },
-            {
-                'rule': 'Sensitive file opened for reading',
-                'priority': 'Warning',
-                'message': 'An attempt to read any sensitive file',
-                'fields': {
-                    'fd.name': '/etc/shadow',
-                    'proc.name': 'cat',
-                    'user.name': 'suspicious-user'
-                }
-            }
-        ]
-        
-        # 随机选择一个事件
-        import random
-        selected_event = random.choice(falco_events)
-        selected_event['timestamp'] = datetime.now().isoformat()
-        selected_event['source'] = 'falco-simulation'
-        
-        # 发送事件
-        await websocket_service.broadcast_event('falco_event', selected_event)
-        await websocket_service.broadcast_event('security_event', selected_event)
+        selected_event = simulation_engine.build_falco_event()
+        await websocket_service.send_security_event(selected_event)
         
         return {
             'success': True,
@@ -159,29 +135,12 @@ async def simulate_falco_event():
         raise HTTPException(status_code=500, detail=f"模拟Falco事件失败: {str(e)}")
 
 @router.post("/test/start-event-simulation")
-async def start_event_simulation(duration_seconds: int = 60):
+async def start_event_simulation(
+    duration_seconds: int = Query(60, ge=1, le=MAX_SIMULATION_SECONDS, description="模拟时长（秒）")
+):
     """启动事件模拟"""
     try:
-        async def simulate_events():
-            """后台事件模拟任务"""
-            import random
-            
-            end_time = datetime.now().timestamp() + duration_seconds
-            
-            while datetime.now().timestamp() < end_time:
-                # 模拟安全事件
-                if random.random() < 0.3:  # 30%概率发送安全事件
-                    await simulate_falco_event()
-                
-                # 模拟系统指标
-                if random.random() < 0.5:  # 50%概率发送系统指标
-                    await send_test_metrics()
-                
-                # 等待随机时间
-                await asyncio.sleep(random.uniform(2, 8))
-        
-        # 启动后台任务
-        asyncio.create_task(simulate_events())
+        simulation_engine.start(websocket_service, SECURITY_AND_METRICS_MIX, duration_seconds=duration_seconds)
         
         return {
             'success': True,
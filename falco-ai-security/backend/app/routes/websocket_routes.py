@@ -3,23 +3,51 @@
 """
 WebSocket路由
 处理实时WebSocket连接
+
+部署约定：/api/ws 由前置nginx（config/nginx/nginx.conf）终止TLS后以明文HTTP/1.1
+Upgrade转发到uvicorn，后端进程不加载证书，避免每个长连接在Python进程内承担TLS开销。
+uvicorn以 --ws-per-message-deflate false 启动，/ws 有意不协商permessage-deflate：
+推送的事件帧小且重复度低，逐客户端zlib压缩的CPU开销大于节省的带宽。
 """
 
-import asyncio
 import logging
+import random
+
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import ORJSONResponse, Response
 from typing import Optional
 
-from ..services.simple_websocket import simple_websocket_service
+from ..services.simple_websocket import simple_websocket_service, MSGPACK_SUBPROTOCOL
+from ..services.simulation_engine import simulation_engine, ONE_RANDOM_EVENT_MIX
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+_SIM_EVENT_COUNT = 20  # 每轮模拟发送的事件数
+
+# 固定内容的响应体在导入时预先编码
+_BROADCAST_OK = orjson.dumps({"status": "success", "message": "消息已广播"})
+_SECURITY_EVENT_OK = orjson.dumps({"status": "success", "message": "测试安全事件已发送"})
+_SYSTEM_METRICS_OK = orjson.dumps({"status": "success", "message": "测试系统指标已发送"})
+_SECURITY_ALERT_OK = orjson.dumps({"status": "success", "message": "测试安全警报已发送"})
+_SIMULATION_STARTED = orjson.dumps({"status": "success", "message": "事件模拟已启动"})
+
+def _static_response(body: bytes) -> Response:
+    """返回预编码的JSON响应（每次新建Response，避免中间件修改共享的响应头）"""
+    return Response(content=body, media_type="application/json")
 
 @router.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket, client_id: Optional[str] = Query(None)):
-    """WebSocket连接端点"""
-    await simple_websocket_service.connect(websocket, client_id)
+async def websocket_endpoint(websocket: WebSocket, client_id: Optional[str] = Query(None),
+                             binary: bool = Query(False)):
+    """WebSocket连接端点
+    
+    binary=true 时以二进制帧推送UTF-8 JSON；客户端在 Sec-WebSocket-Protocol 中
+    请求 falco.msgpack.v1 时改为推送MessagePack帧（客户端发往服务端的消息仍为JSON文本）
+    """
+    subprotocol = MSGPACK_SUBPROTOCOL if MSGPACK_SUBPROTOCOL in websocket.scope.get('subprotocols', ()) else None
+    await simple_websocket_service.connect(websocket, client_id, binary, subprotocol)
     
     try:
         while True:
@@ -43,7 +71,7 @@ async def get_websocket_stats():
 async def broadcast_message(message: dict):
     """广播消息到所有WebSocket客户端"""
     await simple_websocket_service.broadcast(message)
-    return {"status": "success", "message": "消息已广播"}
+    return _static_response(_BROADCAST_OK)
 
 @router.post("/ws/test/security-event")
 async def send_test_security_event():
@@ -62,13 +90,11 @@ async def send_test_security_event():
     }
     
     await simple_websocket_service.send_security_event(test_event)
-    return {"status": "success", "message": "测试安全事件已发送"}
+    return _static_response(_SECURITY_EVENT_OK)
 
 @router.post("/ws/test/system-metrics")
 async def send_test_system_metrics():
     """发送测试系统指标"""
-    import random
-    
     test_metrics = {
         "cpu_usage": round(random.uniform(10, 90), 2),
         "memory_usage": round(random.uniform(20, 80), 2),
@@ -82,7 +108,7 @@ async def send_test_system_metrics():
     }
     
     await simple_websocket_service.send_system_metrics(test_metrics)
-    return {"status": "success", "message": "测试系统指标已发送"}
+    return _static_response(_SYSTEM_METRICS_OK)
 
 @router.post("/ws/test/security-alert")
 async def send_test_security_alert():
@@ -104,74 +130,10 @@ async def send_test_security_alert():
     }
     
     await simple_websocket_service.send_security_alert(test_alert)
-    return {"status": "success", "message": "测试安全警报已发送"}
+    return _static_response(_SECURITY_ALERT_OK)
 
 @router.post("/ws/test/start-simulation")
 async def start_event_simulation():
     """启动事件模拟"""
-    asyncio.create_task(_event_simulation_task())
-    return {"status": "success", "message": "事件模拟已启动"}
-
-async def _event_simulation_task():
-    """事件模拟后台任务"""
-    import random
-    from datetime import datetime
-    
-    event_types = [
-        {
-            "type": "security_event",
-            "data": {
-                "rule": "Suspicious File Access",
-                "priority": "Warning",
-                "message": "检测到可疑文件访问",
-                "source": "falco",
-                "fields": {
-                    "proc.name": "cat",
-                    "fd.name": "/etc/shadow",
-                    "user.name": "root"
-                }
-            }
-        },
-        {
-            "type": "system_metrics",
-            "data": {
-                "cpu_usage": round(random.uniform(10, 90), 2),
-                "memory_usage": round(random.uniform(20, 80), 2),
-                "disk_usage": round(random.uniform(30, 70), 2)
-            }
-        },
-        {
-            "type": "security_alert",
-            "data": {
-                "alert_id": f"alert_{random.randint(1000, 9999)}",
-                "severity": random.choice(["low", "medium", "high", "critical"]),
-                "title": "安全威胁检测",
-                "description": "系统检测到潜在的安全威胁"
-            }
-        }
-    ]
-    
-    for i in range(20):  # 发送20个模拟事件
-        try:
-            event = random.choice(event_types)
-            event_type = event["type"]
-            event_data = event["data"].copy()
-            event_data["timestamp"] = datetime.now().isoformat()
-            event_data["simulation"] = True
-            event_data["sequence"] = i + 1
-            
-            if event_type == "security_event":
-                await simple_websocket_service.send_security_event(event_data)
-            elif event_type == "system_metrics":
-                await simple_websocket_service.send_system_metrics(event_data)
-            elif event_type == "security_alert":
-                await simple_websocket_service.send_security_alert(event_data)
-            
-            # 随机间隔
-            await asyncio.sleep(random.uniform(2, 8))
-            
-        except Exception as e:
-            logger.error(f"事件模拟任务错误: {e}")
-            break
-    
-    logger.info("事件模拟任务完成")
\ No newline at end of file
+    simulation_engine.start(simple_websocket_service, ONE_RANDOM_EVENT_MIX, max_events=_SIM_EVENT_COUNT)
+    return _static_response(_SIMULATION_STARTED)
@@ -7,24 +7,118 @@ AI智能体服务，整合所有AI功能并提供统一的智能分析接口
 
 import logging
 import asyncio
-import json
-from datetime import datetime, timedelta
+import heapq
+import sys
+import time
+from datetime import datetime
 from typing import Dict, List, Optional, Any, Tuple
-from dataclasses import dataclass
-from collections import defaultdict, deque
+from dataclasses import dataclass, replace
+from collections import OrderedDict, deque
+
+import numpy as np
 
 from app.config import settings
 from app.services.falco_monitor import FalcoEvent
-from app.services.neo4j_service import Neo4jService, BehaviorTriple
+from app.services.neo4j_service import Neo4jService
 # from app.services.pinecone_service import PineconeService
-from app.services.openai_service import OpenAIService, ThreatAnalysis, SecurityInsight
+from app.services.openai_service import OpenAIService, ThreatAnalysis
+from app.services import risk_kernel
+from app.utils.json_utils import dumps_bytes
+from app.utils.hash_utils import stable_hash64
 
 logger = logging.getLogger(__name__)
 
+# 后台分析合并同一批事件的等待窗口（秒）
+_BATCH_WINDOW = 0.05
+# 待分析队列上限，超出时直接返回空结果而不是无限堆积
+_MAX_PENDING_EVENTS = 1000
+
+# 分析结果缓存容量与有效期（秒），已解决告警的保留时长（秒）
+_ANALYSIS_CACHE_MAXSIZE = 10000
+_ANALYSIS_CACHE_TTL = 3600
+_RESOLVED_ALERT_TTL = 86400
+
+# 优先级基础分低于该值（Notice及以下）的事件不调用OpenAI做威胁分析
+_THREAT_ANALYSIS_MIN_PRIORITY_SCORE = 0.4
+
+# 威胁分析结论按事件内容复用的缓存容量
+_THREAT_MEMO_MAXSIZE = 4096
+
+# 行为上下文查询的主体实体：(实体类型前缀, Falco字段名)
+_CONTEXT_ENTITY_FIELDS = (
+    ('process', 'proc.name'),
+    ('user', 'user.name'),
+    ('container', 'container.name')
+)
+
+# 依赖服务连接失败后再次尝试的最短间隔（秒）
+_CONNECT_RETRY_INTERVAL = 30.0
+
+# 没有相似事件时共用的空评分数组
+_NO_SIMILARITY_SCORES = np.empty(0, dtype=np.float32)
+
+# 事件标识 (主机名, 时间戳, 消息哈希)，元组作为字典键无需拼接字符串，只在对外输出时格式化
+EventKey = Tuple[str, float, int]
+
+def event_key(event: FalcoEvent) -> EventKey:
+    """生成事件标识"""
+    return (event.hostname, event.timestamp.timestamp(), event.message_hash)
+
+def format_event_id(key: EventKey) -> str:
+    """事件标识转为字符串ID"""
+    return f"{key[0]}_{key[1]}_{key[2]}"
+
+@dataclass(slots=True)
+class EventRef:
+    """队列中的轻量事件引用，只保留批量分析和模式分析需要的字段，不持有output_fields/raw_data"""
+    event_id: EventKey
+    rule: str
+    hostname: str
+    priority: str
+    timestamp: datetime
+    message: str
+    proc: str
+    user: str
+    container: str
+    
+    @classmethod
+    def from_event(cls, event_id: EventKey, event: FalcoEvent) -> 'EventRef':
+        """从FalcoEvent创建事件引用"""
+        output_fields = event.output_fields
+        return cls(
+            event_id=event_id,
+            rule=event.rule,
+            hostname=event.hostname,
+            priority=event.priority,
+            timestamp=event.timestamp,
+            message=event.message,
+            proc=output_fields.get('proc.name', ''),
+            user=output_fields.get('user.name', ''),
+            container=output_fields.get('container.name', '')
+        )
+
+def threat_memo_key(event: FalcoEvent) -> Tuple[str, Any, Any, Any]:
+    """威胁分析复用键：规则相同且进程、用户、容器相同的事件视为同一内容"""
+    output_fields = event.output_fields
+    return (
+        event.rule,
+        output_fields.get('proc.name', ''),
+        output_fields.get('user.name', ''),
+        output_fields.get('container.name', '')
+    )
+
+def parse_event_id(event_id: str) -> Optional[EventKey]:
+    """字符串ID还原为事件标识，格式不正确时返回None"""
+    try:
+        hostname, timestamp, message_hash = event_id.rsplit('_', 2)
+        return (hostname, float(timestamp), int(message_hash))
+    except ValueError:
+        return None
+
 @dataclass
 class AnalysisResult:
     """综合分析结果"""
-    event_id: str
+    event_id: EventKey
     threat_analysis: Optional[ThreatAnalysis]
     similar_events: List[Dict[str, Any]]
     behavior_context: List[Dict[str, Any]]
@@ -34,13 +128,17 @@ class AnalysisResult:
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
         return {
-            'event_id': self.event_id,
+            'event_id': format_event_id(self.event_id),
             'threat_analysis': self.threat_analysis.to_dict() if self.threat_analysis else None,
             'similar_events': self.similar_events,
             'behavior_context': self.behavior_context,
             'risk_score': self.risk_score,
             'analysis_timestamp': self.analysis_timestamp.isoformat()
         }
+    
+    def to_json(self) -> bytes:
+        """直接序列化为JSON字节串（orjson原生遍历dataclass和datetime，不构造中间字典），输出与to_dict一致"""
+        return dumps_bytes(replace(self, event_id=format_event_id(self.event_id)))
 
 @dataclass
 class SecurityAlert:
@@ -72,6 +170,10 @@ class SecurityAlert:
             'recommendations': self.recommendations,
             'status': self.status
         }
+    
+    def to_json(self) -> bytes:
+        """直接序列化为JSON字节串，输出与to_dict一致"""
+        return dumps_bytes(self)
 
 class AIAgentService:
     """AI智能体服务"""
@@ -83,10 +185,26 @@ class AIAgentService:
         # self.pinecone_service = pinecone_service
         self.openai_service = openai_service
         
-        # 事件缓存和分析队列
-        self.event_queue = deque(maxlen=1000)
-        self.analysis_cache = {}
+        # 待分析事件队列（EventRef），由后台任务按批取出；完整事件只在分析前暂存
+        self.event_queue = deque()
+        self._event_store: Dict[EventKey, FalcoEvent] = {}
+        self.pending_results: Dict[EventKey, asyncio.Future] = {}
+        self._queue_ready = asyncio.Event()
+        
+        # 已完成分析的近期事件引用，供批量模式分析使用
+        self.recent_events = deque(maxlen=1000)
+        
+        # 分析结果LRU缓存，配合 (过期时间, key) 最小堆按需淘汰过期条目，过期时间取单调时钟
+        self.analysis_cache: OrderedDict = OrderedDict()
+        self._cache_expiry: List[Tuple[float, EventKey]] = []
+        self._cache_deadlines: Dict[EventKey, float] = {}
+        
+        # 活跃告警，已解决的告警按 (过期时间, key) 入堆等待清理
         self.active_alerts = {}
+        self._alert_expiry: List[Tuple[float, str]] = []
+        
+        # alert_id -> active_alerts键的二级索引，按ID更新告警时无需遍历
+        self._alert_keys_by_id: Dict[str, str] = {}
         
         # 分析配置
         self.batch_size = settings.AI_BATCH_SIZE
@@ -94,6 +212,17 @@ class AIAgentService:
         self.similarity_threshold = settings.AI_SIMILARITY_THRESHOLD
         self.risk_threshold = settings.AI_RISK_THRESHOLD
         
+        # 限制同时进行的OpenAI请求数，避免突发流量触发限流后反复重试
+        self._openai_sem = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY or 8)
+        
+        # 依赖服务在首次使用时才连接，每个服务一把锁避免并发重复连接
+        self._neo4j_lock = asyncio.Lock()
+        self._openai_lock = asyncio.Lock()
+        self._last_connect_attempt: Dict[str, float] = {}
+        
+        # 按事件内容缓存的威胁分析结论（LRU），重复事件不再调用OpenAI
+        self._threat_memo: OrderedDict = OrderedDict()
+        
         # 统计信息
         self.stats = {
             'events_processed': 0,
@@ -105,6 +234,7 @@ class AIAgentService:
         
         # 后台任务
         self.analysis_task = None
+        self.maintenance_task = None
         self.is_running = False
     
     async def start(self):
@@ -112,19 +242,12 @@ class AIAgentService:
         try:
             logger.info("启动AI智能体服务...")
             
-            # 确保所有依赖服务已连接
-            if not self.neo4j_service.is_connected:
-                await self.neo4j_service.connect()
-            
-            # if not self.pinecone_service.is_connected:
-            #     await self.pinecone_service.connect()
-            
-            if not self.openai_service.is_connected:
-                await self.openai_service.connect()
+            # 依赖服务不在启动时连接，由 _ensure_neo4j / _ensure_openai 在首次使用时连接
             
             # 启动后台分析任务
             self.is_running = True
             self.analysis_task = asyncio.create_task(self._background_analysis())
+            self.maintenance_task = asyncio.create_task(self._maintenance_loop())
             
             logger.info("AI智能体服务启动成功")
             
@@ -132,177 +255,317 @@ class AIAgentService:
             logger.error(f"启动AI智能体服务失败: {e}")
             raise
     
+    async def _ensure_connected(self, name: str, service: Any, lock: asyncio.Lock) -> bool:
+        """确保依赖服务已连接，未连接时加锁连接（失败后按间隔重试）"""
+        if service.is_connected:
+            return True
+        
+        async with lock:
+            if service.is_connected:
+                return True
+            
+            now = time.monotonic()
+            last_attempt = self._last_connect_attempt.get(name)
+            if last_attempt is not None and now - last_attempt < _CONNECT_RETRY_INTERVAL:
+                return False
+            self._last_connect_attempt[name] = now
+            
+            logger.info(f"首次使用，连接{name}服务...")
+            await service.connect()
+            return service.is_connected
+    
+    async def _ensure_neo4j(self) -> bool:
+        """确保Neo4j已连接"""
+        return await self._ensure_connected('Neo4j', self.neo4j_service, self._neo4j_lock)
+    
+    async def _ensure_openai(self) -> bool:
+        """确保OpenAI已连接"""
+        return await self._ensure_connected('OpenAI', self.openai_service, self._openai_lock)
+    
     async def stop(self):
         """停止AI智能体服务"""
         logger.info("停止AI智能体服务...")
         
         self.is_running = False
         
-        if self.analysis_task:
-            self.analysis_task.cancel()
-            try:
-                await self.analysis_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self.analysis_task, self.maintenance_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        
+        # 未完成分析的事件返回空结果，避免调用方一直等待
+        for future in self.pending_results.values():
+            if not future.done():
+                future.set_result(None)
+        self.pending_results.clear()
+        self.event_queue.clear()
+        self._event_store.clear()
         
         logger.info("AI智能体服务已停止")
     
+    def submit_event(self, event: FalcoEvent) -> asyncio.Future:
+        """提交事件到分析队列，返回以事件标识为键的Future，由后台任务批量分析后完成"""
+        self.stats['events_processed'] += 1
+        
+        # 驻留重复度高的短字符串，缓存中的大量分析结果共享同一份字符串对象
+        event.hostname = sys.intern(event.hostname)
+        event.priority = sys.intern(event.priority)
+        event.rule = sys.intern(event.rule)
+        
+        # 生成事件标识
+        event_id = event_key(event)
+        
+        # 同一事件已在队列中时共享同一个Future
+        future = self.pending_results.get(event_id)
+        if future is not None:
+            return future
+        
+        future = asyncio.get_running_loop().create_future()
+        
+        # 检查缓存
+        if event_id in self.analysis_cache:
+            self.analysis_cache.move_to_end(event_id)
+            future.set_result(self.analysis_cache[event_id])
+            return future
+        
+        if len(self.event_queue) >= _MAX_PENDING_EVENTS:
+            logger.warning(f"AI分析队列已满，丢弃事件: {event.rule}")
+            future.set_result(None)
+            return future
+        
+        self.pending_results[event_id] = future
+        self._event_store[event_id] = event
+        self.event_queue.append(EventRef.from_event(event_id, event))
+        self._queue_ready.set()
+        return future
+    
     async def process_event(self, event: FalcoEvent) -> Optional[AnalysisResult]:
-        """处理单个事件"""
+        """处理单个事件（入队后等待批量分析结果）
+        
+        只是 submit_event 的简单封装，分析总是走批量路径；大量事件应并发提交，
+        由后台任务合并成批后统一调用OpenAI和Neo4j。
+        """
         try:
-            # 添加到事件队列
-            self.event_queue.append(event)
-            self.stats['events_processed'] += 1
-            
-            # 生成事件ID
-            event_id = f"{event.hostname}_{event.timestamp.timestamp()}_{hash(event.message)}"
-            
-            # 检查缓存
-            if event_id in self.analysis_cache:
-                return self.analysis_cache[event_id]
-            
-            # 并行执行多种分析
-            analysis_tasks = [
-                self._analyze_threat(event),
-                self._find_similar_events(event),
-                self._analyze_behavior_context(event),
-                self._store_event_data(event)
-            ]
-            
-            results = await asyncio.gather(*analysis_tasks, return_exceptions=True)
+            future = self.submit_event(event)
             
-            threat_analysis = results[0] if not isinstance(results[0], Exception) else None
-            similar_events = results[1] if not isinstance(results[1], Exception) else []
-            behavior_context = results[2] if not isinstance(results[2], Exception) else []
+            # 后台任务未运行时就地分析
+            if not self.is_running:
+                while self.event_queue:
+                    await self._analyze_pending()
             
-            # 计算风险评分
-            risk_score = self._calculate_risk_score(event, threat_analysis, similar_events)
+            return await future
             
+        except Exception as e:
+            logger.error(f"处理事件失败: {e}")
+            self.stats['analysis_errors'] += 1
+            return None
+    
+    async def _analyze_pending(self):
+        """从队列取出一批事件进行分析，并完成对应的Future"""
+        n = min(self.batch_size, len(self.event_queue))
+        if n == 0:
+            return
+        
+        popleft = self.event_queue.popleft
+        refs = [popleft() for _ in range(n)]
+        
+        # 取出完整事件后即从暂存中删除，之后只保留引用
+        event_ids = [ref.event_id for ref in refs]
+        events = [self._event_store.pop(event_id) for event_id in event_ids]
+        
+        try:
+            results = await self._analyze_batch(event_ids, events)
+        except Exception as e:
+            logger.error(f"批量处理事件失败: {e}")
+            self.stats['analysis_errors'] += len(refs)
+            results = [None] * len(refs)
+        
+        self.recent_events.extend(refs)
+        
+        for event_id, result in zip(event_ids, results):
+            future = self.pending_results.pop(event_id, None)
+            if future is not None and not future.done():
+                future.set_result(result)
+    
+    async def _analyze_batch(self, event_ids: List[EventKey], events: List[FalcoEvent]) -> List[AnalysisResult]:
+        """批量分析事件：一次威胁分析调用、一次图数据库写入"""
+        # 并行执行多种分析
+        # 低优先级事件（且没有相似事件）跳过威胁分析，只对Warning及以上调用OpenAI
+        threat_indexes = [
+            i for i, event in enumerate(events)
+            if risk_kernel.PRIORITY_SCORES.get(event.priority, risk_kernel.DEFAULT_PRIORITY_SCORE)
+            >= _THREAT_ANALYSIS_MIN_PRIORITY_SCORE
+        ]
+        
+        analyzed_threats, behavior_contexts, _ = await asyncio.gather(
+            self._analyze_threats([events[i] for i in threat_indexes]),
+            asyncio.gather(*(self._analyze_behavior_context(event) for event in events)),
+            self._store_events_data(events)
+        )
+        
+        threat_analyses: List[Optional[ThreatAnalysis]] = [None] * len(events)
+        for i, threat_analysis in zip(threat_indexes, analyzed_threats):
+            threat_analyses[i] = threat_analysis
+        
+        # 相似事件检索依赖Pinecone，启用前统一为空
+        similar_events_list = [[] for _ in events]
+        similarity_scores_list = [_NO_SIMILARITY_SCORES] * len(events)
+        
+        # 计算风险评分
+        risk_scores = self._calculate_risk_scores(events, threat_analyses, similarity_scores_list)
+        
+        # 整批共用同一个分析时间
+        now = datetime.now()
+        
+        results = []
+        for i, event in enumerate(events):
             # 创建分析结果
             analysis_result = AnalysisResult(
-                event_id=event_id,
-                threat_analysis=threat_analysis,
-                similar_events=similar_events,
-                behavior_context=behavior_context,
-                risk_score=risk_score,
-                analysis_timestamp=datetime.now()
+                event_id=event_ids[i],
+                threat_analysis=threat_analyses[i],
+                similar_events=similar_events_list[i],
+                behavior_context=behavior_contexts[i],
+                risk_score=risk_scores[i],
+                analysis_timestamp=now
             )
             
             # 缓存结果
-            self.analysis_cache[event_id] = analysis_result
+            self._cache_analysis(event_ids[i], analysis_result)
             
             # 检查是否需要生成告警
-            if risk_score >= self.risk_threshold:
-                await self._generate_alert(event, analysis_result)
+            if analysis_result.risk_score >= self.risk_threshold:
+                await self._generate_alert(event, analysis_result, now)
             
-            return analysis_result
-            
-        except Exception as e:
-            logger.error(f"处理事件失败: {e}")
-            self.stats['analysis_errors'] += 1
-            return None
+            results.append(analysis_result)
+        
+        return results
     
-    async def _analyze_threat(self, event: FalcoEvent) -> Optional[ThreatAnalysis]:
-        """威胁分析"""
-        try:
-            return await self.openai_service.analyze_threat(event)
-        except Exception as e:
-            logger.error(f"威胁分析失败: {e}")
-            return None
+    def _cache_analysis(self, event_id: EventKey, analysis_result: AnalysisResult):
+        """写入分析结果缓存，超出容量时淘汰最久未使用的条目"""
+        deadline = time.monotonic() + _ANALYSIS_CACHE_TTL
+        self.analysis_cache[event_id] = analysis_result
+        self.analysis_cache.move_to_end(event_id)
+        self._cache_deadlines[event_id] = deadline
+        heapq.heappush(self._cache_expiry, (deadline, event_id))
+        
+        if len(self.analysis_cache) > _ANALYSIS_CACHE_MAXSIZE:
+            evicted_key, _ = self.analysis_cache.popitem(last=False)
+            self._cache_deadlines.pop(evicted_key, None)
     
-    async def _find_similar_events(self, event: FalcoEvent) -> List[Dict[str, Any]]:
-        """查找相似事件"""
-        try:
-            # return await self.pinecone_service.find_similar_events(
-            #     event, top_k=10, threshold=self.similarity_threshold
-            # )
+    async def _analyze_threats(self, events: List[FalcoEvent]) -> List[Optional[ThreatAnalysis]]:
+        """批量威胁分析（内容相同的事件复用已有结论，只把未命中的事件发给OpenAI）"""
+        if not events:
             return []
+        
+        try:
+            threat_analyses: List[Optional[ThreatAnalysis]] = [None] * len(events)
+            
+            # 未命中的复用键 -> 事件下标，同一批内相同内容只请求一次
+            misses: Dict[Tuple[str, Any, Any, Any], List[int]] = {}
+            for i, event in enumerate(events):
+                key = threat_memo_key(event)
+                memo = self._threat_memo.get(key)
+                if memo is not None:
+                    self._threat_memo.move_to_end(key)
+                    threat_analyses[i] = replace(memo, event_id=format_event_id(event_key(event)))
+                else:
+                    misses.setdefault(key, []).append(i)
+            
+            if not misses or not await self._ensure_openai():
+                return threat_analyses
+            
+            async with self._openai_sem:
+                fresh_analyses = await self.openai_service.analyze_threats_batch(
+                    [events[indexes[0]] for indexes in misses.values()]
+                )
+            
+            for (key, indexes), threat_analysis in zip(misses.items(), fresh_analyses):
+                if threat_analysis is None:
+                    continue
+                
+                # AI响应的字段类型不可控，只驻留字符串
+                if isinstance(threat_analysis.threat_level, str):
+                    threat_analysis.threat_level = sys.intern(threat_analysis.threat_level)
+                if isinstance(threat_analysis.threat_type, str):
+                    threat_analysis.threat_type = sys.intern(threat_analysis.threat_type)
+                
+                self._threat_memo[key] = threat_analysis
+                if len(self._threat_memo) > _THREAT_MEMO_MAXSIZE:
+                    self._threat_memo.popitem(last=False)
+                
+                threat_analyses[indexes[0]] = threat_analysis
+                for i in indexes[1:]:
+                    threat_analyses[i] = replace(threat_analysis, event_id=format_event_id(event_key(events[i])))
+            
+            return threat_analyses
         except Exception as e:
-            logger.error(f"查找相似事件失败: {e}")
-            return []
+            logger.error(f"威胁分析失败: {e}")
+            return [None] * len(events)
     
     async def _analyze_behavior_context(self, event: FalcoEvent) -> List[Dict[str, Any]]:
         """分析行为上下文"""
         try:
-            # 提取主体实体
+            # 提取主体实体（每个字段只查一次字典）
             output_fields = event.output_fields
-            entities = []
-            
-            if 'proc.name' in output_fields:
-                entities.append(f"process:{output_fields['proc.name']}")
-            if 'user.name' in output_fields:
-                entities.append(f"user:{output_fields['user.name']}")
-            if 'container.name' in output_fields:
-                entities.append(f"container:{output_fields['container.name']}")
+            entities = [
+                f"{prefix}:{value}"
+                for prefix, field_name in _CONTEXT_ENTITY_FIELDS
+                if (value := output_fields.get(field_name)) is not None
+            ]
             
-            # 查询相关行为
-            all_behaviors = []
-            for entity in entities:
-                behaviors = await self.neo4j_service.query_related_behaviors(entity, depth=2)
-                all_behaviors.extend(behaviors)
+            if not entities or not await self._ensure_neo4j():
+                return []
             
-            return all_behaviors
+            # 单次查询所有实体的相关行为
+            return await self.neo4j_service.query_related_behaviors_batch(entities, depth=2)
             
         except Exception as e:
             logger.error(f"分析行为上下文失败: {e}")
             return []
     
-    async def _store_event_data(self, event: FalcoEvent):
-        """存储事件数据"""
+    async def _store_events_data(self, events: List[FalcoEvent]):
+        """批量存储事件数据"""
         try:
-            # 并行存储到Neo4j和Pinecone
-            tasks = []
+            # 存储到Neo4j（单次UNWIND写入）
+            triples = []
+            for event in events:
+                triple = self.neo4j_service.extract_behavior_triple(event)
+                if triple:
+                    triples.append(triple)
             
-            # 存储到Neo4j
-            triple = self.neo4j_service.extract_behavior_triple(event)
-            if triple:
-                tasks.append(self.neo4j_service.store_behavior_triple(triple))
+            if triples and await self._ensure_neo4j():
+                await self.neo4j_service.store_behavior_triples_batch(triples)
             
             # 存储到Pinecone
-            # tasks.append(self.pinecone_service.store_event_vector(event))
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
+            # await self.pinecone_service.store_event_vectors(events)
                 
         except Exception as e:
             logger.error(f"存储事件数据失败: {e}")
     
     def _calculate_risk_score(self, event: FalcoEvent, 
                             threat_analysis: Optional[ThreatAnalysis],
-                            similar_events: List[Dict[str, Any]]) -> float:
+                            similarity_scores: np.ndarray) -> float:
         """计算风险评分"""
         try:
             score = 0.0
             
             # 基础优先级评分
-            priority_scores = {
-                'Emergency': 1.0,
-                'Alert': 0.9,
-                'Critical': 0.8,
-                'Error': 0.6,
-                'Warning': 0.4,
-                'Notice': 0.2,
-                'Informational': 0.1,
-                'Debug': 0.05
-            }
-            score += priority_scores.get(event.priority, 0.1) * 0.3
+            score += risk_kernel.PRIORITY_SCORES.get(event.priority, risk_kernel.DEFAULT_PRIORITY_SCORE) * 0.3
             
             # 威胁分析评分
             if threat_analysis:
-                threat_scores = {
-                    'critical': 1.0,
-                    'high': 0.8,
-                    'medium': 0.5,
-                    'low': 0.2
-                }
-                threat_score = threat_scores.get(threat_analysis.threat_level, 0.2)
+                threat_score = risk_kernel.THREAT_SCORES.get(threat_analysis.threat_level, risk_kernel.DEFAULT_THREAT_SCORE)
                 confidence_weight = threat_analysis.confidence
                 score += threat_score * confidence_weight * 0.4
             
             # 相似事件评分
-            if similar_events:
-                similarity_score = min(len(similar_events) / 10.0, 1.0)  # 最多10个相似事件
-                avg_similarity = sum(event.get('score', 0) for event in similar_events) / len(similar_events)
+            n_similar = similarity_scores.size
+            if n_similar:
+                similarity_score = min(n_similar / 10.0, 1.0)  # 最多10个相似事件
+                avg_similarity = float(similarity_scores.mean())
                 score += similarity_score * avg_similarity * 0.2
             
             # 时间因素（最近的事件权重更高）
@@ -310,11 +573,7 @@ class AIAgentService:
             score *= time_factor
             
             # 规则特定评分
-            rule_lower = event.rule.lower()
-            if any(keyword in rule_lower for keyword in ['shell', 'exec', 'privilege']):
-                score += 0.1
-            if any(keyword in rule_lower for keyword in ['network', 'connect', 'outbound']):
-                score += 0.05
+            score += risk_kernel.rule_bonus(event.rule)
             
             return min(score, 1.0)  # 确保评分不超过1.0
             
@@ -322,7 +581,36 @@ class AIAgentService:
             logger.error(f"计算风险评分失败: {e}")
             return 0.5  # 默认中等风险
     
-    async def _generate_alert(self, event: FalcoEvent, analysis_result: AnalysisResult):
+    def _calculate_risk_scores(self, events: List[FalcoEvent],
+                               threat_analyses: List[Optional[ThreatAnalysis]],
+                               similarity_scores_list: List[np.ndarray]) -> List[float]:
+        """批量计算风险评分（按列组织成数组后一次向量化计算）"""
+        try:
+            prio_idx = np.fromiter((risk_kernel.priority_index(event.priority) for event in events),
+                                   dtype=np.intp, count=len(events))
+            thr_idx = np.fromiter(
+                (risk_kernel.threat_index(analysis.threat_level) if analysis else risk_kernel.NO_THREAT_INDEX
+                 for analysis in threat_analyses),
+                dtype=np.intp, count=len(events))
+            conf = np.fromiter((analysis.confidence if analysis else 0.0 for analysis in threat_analyses),
+                               dtype=np.float64, count=len(events))
+            nsim = np.fromiter((scores.size for scores in similarity_scores_list),
+                               dtype=np.float64, count=len(events))
+            avgsim = np.fromiter((scores.mean() if scores.size else 0.0 for scores in similarity_scores_list),
+                                 dtype=np.float64, count=len(events))
+            flags = np.fromiter((risk_kernel.rule_bonus(event.rule) for event in events),
+                                dtype=np.float64, count=len(events))
+            
+            return risk_kernel.score_batch(prio_idx, thr_idx, conf, nsim, avgsim, flags).tolist()
+            
+        except Exception as e:
+            logger.error(f"批量计算风险评分失败: {e}")
+            return [
+                self._calculate_risk_score(event, threat_analysis, scores)
+                for event, threat_analysis, scores in zip(events, threat_analyses, similarity_scores_list)
+            ]
+    
+    async def _generate_alert(self, event: FalcoEvent, analysis_result: AnalysisResult, now: datetime):
         """生成安全告警"""
         try:
             # 检查是否已有相似告警
@@ -332,14 +620,14 @@ class AIAgentService:
                 # 更新现有告警
                 alert = self.active_alerts[alert_key]
                 alert.event_count += 1
-                alert.last_seen = datetime.now()
+                alert.last_seen = now
                 
                 # 更新受影响主机
                 if event.hostname not in alert.affected_hosts:
                     alert.affected_hosts.append(event.hostname)
             else:
                 # 创建新告警
-                alert_id = f"alert_{datetime.now().timestamp()}_{hash(event.rule)}"
+                alert_id = f"alert_{int(now.timestamp() * 1000)}_{stable_hash64(alert_key):x}"
                 
                 # 确定严重程度
                 severity = 'medium'
@@ -354,11 +642,14 @@ class AIAgentService:
                 
                 # 生成告警标题和描述
                 title = f"安全事件检测: {event.rule}"
-                description = f"在主机 {event.hostname} 上检测到安全事件。风险评分: {analysis_result.risk_score:.2f}"
+                description_parts = [f"在主机 {event.hostname} 上检测到安全事件。风险评分: {analysis_result.risk_score:.2f}"]
                 
-                if analysis_result.threat_analysis:
-                    description += f"\n威胁类型: {analysis_result.threat_analysis.threat_type}"
-                    description += f"\n威胁等级: {analysis_result.threat_analysis.threat_level}"
+                threat_analysis = analysis_result.threat_analysis
+                if threat_analysis:
+                    description_parts.append(f"威胁类型: {threat_analysis.threat_type}")
+                    description_parts.append(f"威胁等级: {threat_analysis.threat_level}")
+                
+                description = "\n".join(description_parts)
                 
                 # 收集指标
                 indicators = [event.rule, event.hostname]
@@ -377,14 +668,15 @@ class AIAgentService:
                     description=description,
                     affected_hosts=[event.hostname],
                     event_count=1,
-                    first_seen=datetime.now(),
-                    last_seen=datetime.now(),
-                    indicators=list(set(indicators)),
-                    recommendations=list(set(recommendations)),
+                    first_seen=now,
+                    last_seen=now,
+                    indicators=list(dict.fromkeys(indicators)),
+                    recommendations=list(dict.fromkeys(recommendations)),
                     status='open'
                 )
                 
                 self.active_alerts[alert_key] = alert
+                self._alert_keys_by_id[alert_id] = alert_key
                 self.stats['alerts_generated'] += 1
                 
                 logger.warning(f"生成安全告警: {alert.title} (严重程度: {alert.severity})")
@@ -393,13 +685,34 @@ class AIAgentService:
             logger.error(f"生成告警失败: {e}")
     
     async def _background_analysis(self):
-        """后台分析任务"""
+        """后台分析任务：合并队列中的事件批量分析"""
         logger.info("启动后台分析任务")
         
+        while self.is_running:
+            try:
+                await self._queue_ready.wait()
+                self._queue_ready.clear()
+                
+                # 短暂等待，让并发提交的事件合并到同一批
+                await asyncio.sleep(_BATCH_WINDOW)
+                
+                while self.event_queue:
+                    await self._analyze_pending()
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"后台分析任务错误: {e}")
+                await asyncio.sleep(5)  # 错误后短暂等待
+        
+        logger.info("后台分析任务已停止")
+    
+    async def _maintenance_loop(self):
+        """后台维护任务：模式分析、定期分析和过期数据清理"""
         while self.is_running:
             try:
                 # 批量模式分析
-                if len(self.event_queue) >= self.batch_size:
+                if len(self.recent_events) >= self.batch_size:
                     await self._batch_analysis()
                 
                 # 定期分析任务
@@ -417,33 +730,33 @@ class AIAgentService:
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"后台分析任务错误: {e}")
+                logger.error(f"后台维护任务错误: {e}")
                 await asyncio.sleep(5)  # 错误后短暂等待
-        
-        logger.info("后台分析任务已停止")
     
     async def _batch_analysis(self):
         """批量分析"""
         try:
             # 获取批量事件
-            events = []
-            for _ in range(min(self.batch_size, len(self.event_queue))):
-                if self.event_queue:
-                    events.append(self.event_queue.popleft())
-            
-            if not events:
+            n = min(self.batch_size, len(self.recent_events))
+            if n == 0:
                 return
             
-            # 模式分析
-            pattern_result = await self.openai_service.analyze_event_pattern(events)
-            if pattern_result and pattern_result.get('pattern_detected'):
-                logger.info(f"检测到攻击模式: {pattern_result}")
-                # 这里可以生成模式告警
+            popleft = self.recent_events.popleft
+            events = [popleft() for _ in range(n)]
+            
+            # 模式分析（EventRef 满足 PatternEvent 协议）
+            if await self._ensure_openai():
+                async with self._openai_sem:
+                    pattern_result = await self.openai_service.analyze_event_pattern(events)
+                if pattern_result and pattern_result.get('pattern_detected'):
+                    logger.info(f"检测到攻击模式: {pattern_result}")
+                    # 这里可以生成模式告警
             
             # 异常检测
-            anomalies = await self.neo4j_service.detect_anomalies()
-            if anomalies:
-                logger.info(f"检测到 {len(anomalies)} 个异常行为")
+            if await self._ensure_neo4j():
+                anomalies = await self.neo4j_service.detect_anomalies()
+                if anomalies:
+                    logger.info(f"检测到 {len(anomalies)} 个异常行为")
             
         except Exception as e:
             logger.error(f"批量分析失败: {e}")
@@ -455,10 +768,14 @@ class AIAgentService:
             analysis_data = {
                 'stats': self.stats,
                 'active_alerts': len(self.active_alerts),
-                'recent_events': len(self.event_queue)
+                'recent_events': len(self.recent_events)
             }
             
-            insights = await self.openai_service.generate_security_insights(analysis_data)
+            if not await self._ensure_openai():
+                return
+            
+            async with self._openai_sem:
+                insights = await self.openai_service.generate_security_insights(analysis_data)
             if insights:
                 logger.info(f"生成了 {len(insights)} 个安全洞察")
             
@@ -466,34 +783,42 @@ class AIAgentService:
             logger.error(f"定期分析失败: {e}")
     
     async def _cleanup_expired_data(self):
-        """清理过期数据"""
+        """清理过期数据（只弹出堆顶已到期的条目）"""
         try:
             # 清理过期的分析缓存
-            current_time = datetime.now()
-            expired_keys = []
-            
-            for key, result in self.analysis_cache.items():
-                if (current_time - result.analysis_timestamp).total_seconds() > 3600:  # 1小时过期
-                    expired_keys.append(key)
-            
-            for key in expired_keys:
-                del self.analysis_cache[key]
-            
-            # 清理已解决的告警
-            resolved_alerts = []
-            for key, alert in self.active_alerts.items():
-                if alert.status == 'resolved' and (current_time - alert.last_seen).total_seconds() > 86400:  # 24小时
-                    resolved_alerts.append(key)
-            
-            for key in resolved_alerts:
-                del self.active_alerts[key]
+            now = time.monotonic()
+            cache_expiry = self._cache_expiry
+            cache_deadlines = self._cache_deadlines
+            while cache_expiry and cache_expiry[0][0] < now:
+                deadline, key = heapq.heappop(cache_expiry)
+                # 同一key重新写入或已被LRU淘汰时，堆中的旧条目直接丢弃
+                if cache_deadlines.get(key) == deadline:
+                    del cache_deadlines[key]
+                    self.analysis_cache.pop(key, None)
+            
+            # 清理已解决的告警（告警时间是墙上时间，这里用time.time()比较）
+            now = time.time()
+            alert_expiry = self._alert_expiry
+            while alert_expiry and alert_expiry[0][0] < now:
+                _, key = heapq.heappop(alert_expiry)
+                alert = self.active_alerts.get(key)
+                if alert is None or alert.status != 'resolved':
+                    continue
+                expires_at = alert.last_seen.timestamp() + _RESOLVED_ALERT_TTL
+                if expires_at < now:
+                    del self.active_alerts[key]
+                    self._alert_keys_by_id.pop(alert.alert_id, None)
+                else:
+                    # 解决后又有新事件，按新的last_seen重新入堆
+                    heapq.heappush(alert_expiry, (expires_at, key))
             
         except Exception as e:
             logger.error(f"清理过期数据失败: {e}")
     
     async def get_analysis_result(self, event_id: str) -> Optional[AnalysisResult]:
         """获取分析结果"""
-        return self.analysis_cache.get(event_id)
+        key = parse_event_id(event_id)
+        return self.analysis_cache.get(key) if key is not None else None
     
     async def get_active_alerts(self) -> List[SecurityAlert]:
         """获取活跃告警"""
@@ -502,11 +827,15 @@ class AIAgentService:
     async def update_alert_status(self, alert_id: str, status: str) -> bool:
         """更新告警状态"""
         try:
-            for alert in self.active_alerts.values():
-                if alert.alert_id == alert_id:
-                    alert.status = status
-                    return True
-            return False
+            alert_key = self._alert_keys_by_id.get(alert_id)
+            alert = self.active_alerts.get(alert_key) if alert_key is not None else None
+            if alert is None:
+                return False
+            
+            alert.status = sys.intern(status)
+            if status == 'resolved':
+                heapq.heappush(self._alert_expiry, (alert.last_seen.timestamp() + _RESOLVED_ALERT_TTL, alert_key))
+            return True
         except Exception as e:
             logger.error(f"更新告警状态失败: {e}")
             return False
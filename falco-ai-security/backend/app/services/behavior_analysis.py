@@ -11,14 +11,18 @@ Falco AI Security System - 行为链路分析服务
 创建时间: 2024-01-20
 """
 
-from typing import Dict, List, Optional, Any, Tuple, Set
+from typing import Dict, Iterator, List, Optional, Any, Tuple, Set
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from enum import Enum
 import logging
 import json
 import math
-from collections import defaultdict, Counter
+import re
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict
 
 from neo4j import Driver
 
@@ -29,6 +33,49 @@ from .graph_operations import GraphOperations, PathAnalysisResult
 
 logger = logging.getLogger(__name__)
 
+# 行为链提取涉及的关系类型，写入匹配模式（[r:A|B|...]），按关系类型扫描而不是扫描全部关系
+CHAIN_RELATIONSHIP_TYPES = [rel_type.value for rel_type in RelationshipType]
+_CHAIN_RELATIONSHIP_PATTERN = "|".join(CHAIN_RELATIONSHIP_TYPES)
+
+# 节点/关系类型的整数编码，用于模式匹配；未知类型编码为 -1，不与任何模式匹配
+_NODE_TYPE_CODES: Dict[str, int] = {node_type.value: code for code, node_type in enumerate(NodeType)}
+_RELATIONSHIP_TYPE_CODES: Dict[str, int] = {rel_type.value: code for code, rel_type in enumerate(RelationshipType)}
+_UNKNOWN_TYPE_CODE = -1
+
+# 模式匹配结果缓存的最大条目数（按行为链形状缓存）
+_PATTERN_MATCH_CACHE_MAXSIZE = 4096
+
+# 风险评分分布区间边界：low < 0.4 <= medium < 0.6 <= high < 0.8 <= critical
+_RISK_BUCKET_BOUNDS = (0.4, 0.6, 0.8)
+
+# IOC类型 -> (数据字段, 是否精确匹配, 比较前是否转为字符串)
+# 非精确匹配为不区分大小写的子串匹配
+_IOC_MATCH_RULES: Dict[str, Tuple[str, bool, bool]] = {
+    "process_name": ("name", False, False),
+    "process_cmdline": ("cmdline", False, False),
+    "file_path": ("path", False, False),
+    "network_port": ("port", True, True),
+    "ip_address": ("ip", True, False),
+}
+
+# 关系上只可能带有命令行（执行类事件），其余IOC字段只出现在节点上
+_RELATIONSHIP_IOC_MATCH_RULES: Dict[str, Tuple[str, bool, bool]] = {
+    ioc_type: _IOC_MATCH_RULES[ioc_type] for ioc_type in ("process_cmdline",)
+}
+
+
+def _ioc_fields(rules: Dict[str, Tuple[str, bool, bool]]) -> Tuple[str, ...]:
+    """IOC匹配规则涉及的数据字段（去重，保持顺序）"""
+    return tuple(dict.fromkeys(field_name for field_name, _, _ in rules.values()))
+
+
+# 行为链查询投影的属性：ID、类型和IOC匹配字段
+_NODE_PROJECTION = ", ".join([".id", ".type", *(f".{name}" for name in _ioc_fields(_IOC_MATCH_RULES))])
+_RELATIONSHIP_PROJECTION = ", ".join(
+    ["type: type(r)", ".id", ".timestamp",
+     *(f".{name}" for name in _ioc_fields(_RELATIONSHIP_IOC_MATCH_RULES))]
+)
+
 
 class ThreatLevel(Enum):
     """威胁等级"""
@@ -38,6 +85,15 @@ class ThreatLevel(Enum):
     CRITICAL = "critical"
 
 
+# 威胁等级对应的指标评分
+_THREAT_LEVEL_SCORES: Dict[str, float] = {
+    ThreatLevel.LOW.value: 0.2,
+    ThreatLevel.MEDIUM.value: 0.5,
+    ThreatLevel.HIGH.value: 0.8,
+    ThreatLevel.CRITICAL.value: 1.0
+}
+
+
 class AnalysisType(Enum):
     """分析类型"""
     REAL_TIME = "real_time"  # 实时分析
@@ -46,7 +102,32 @@ class AnalysisType(Enum):
     PREDICTIVE = "predictive"  # 预测分析
 
 
-@dataclass
+def _type_mask(codes: array) -> int:
+    """类型编码序列转为位掩码，未知类型不计入"""
+    mask = 0
+    for code in codes:
+        if code >= 0:
+            mask |= 1 << code
+    return mask
+
+
+def _ioc_field_value(data: Dict[str, Any], field_name: str, stringify: bool) -> Optional[str]:
+    """取出用于IOC匹配的字段值，非字符串值（stringify 为 False 时）不参与匹配，返回None"""
+    value = data.get(field_name, "")
+    if stringify:
+        return str(value)
+    return value if isinstance(value, str) else None
+
+
+def _parse_iso_datetime(value: Any) -> Optional[datetime]:
+    """解析ISO格式时间字符串（兼容 'Z' 后缀），无法解析时返回None"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
 class BehaviorPattern:
     """行为模式"""
     pattern_id: str
@@ -59,46 +140,82 @@ class BehaviorPattern:
     risk_score: float = 0.5
     tags: List[str] = field(default_factory=list)
     
-    def matches(self, sequence: List[Dict[str, Any]]) -> Tuple[bool, float]:
+    _node_type_codes: Tuple[int, ...] = field(init=False, repr=False, compare=False)
+    _relationship_type_codes: Tuple[int, ...] = field(init=False, repr=False, compare=False)
+    _node_type_bits: Tuple[int, ...] = field(init=False, repr=False, compare=False)
+    _relationship_type_bits: Tuple[int, ...] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # 模式中的类型预先编码为整数，匹配时只做整数比较
+        self._node_type_codes = tuple(_NODE_TYPE_CODES[nt.value] for nt in self.node_types)
+        self._relationship_type_codes = tuple(
+            _RELATIONSHIP_TYPE_CODES[rt.value] for rt in self.relationship_types
+        )
+        # 参与匹配的各步骤期望类型对应的位，用于预筛选
+        self._node_type_bits = tuple(1 << code for code in self._node_type_codes[:self.sequence_length])
+        self._relationship_type_bits = tuple(
+            1 << code for code in self._relationship_type_codes[:self.sequence_length]
+        )
+    
+    def could_match(self, sequence_length: int, node_mask: int, relationship_mask: int) -> bool:
+        """
+        按序列中出现的类型集合估算置信度上界，上界达不到阈值时不可能匹配
+        
+        Args:
+            sequence_length: 行为序列长度
+            node_mask: 序列中出现的节点类型位掩码
+            relationship_mask: 序列中出现的关系类型位掩码
+            
+        Returns:
+            bool: 是否可能匹配（False 时 matches 必然不匹配）
+        """
+        if sequence_length < self.sequence_length:
+            return False
+        
+        # 假设每个出现过的期望类型都恰好落在对应步骤上
+        node_hits = sum(1 for bit in self._node_type_bits if node_mask & bit)
+        relationship_hits = sum(1 for bit in self._relationship_type_bits if relationship_mask & bit)
+        total_checks = self.sequence_length + relationship_hits
+        
+        max_confidence = (node_hits + relationship_hits) / total_checks if total_checks > 0 else 0.0
+        return max_confidence >= self.confidence_threshold
+    
+    def matches(self, node_codes: array, relationship_codes: array) -> Tuple[bool, float]:
         """
         检查序列是否匹配该模式
         
         Args:
-            sequence: 行为序列
+            node_codes: 行为序列各步骤的节点类型编码
+            relationship_codes: 行为序列各步骤的关系类型编码
             
         Returns:
             Tuple[bool, float]: (是否匹配, 置信度)
         """
-        if len(sequence) < self.sequence_length:
+        length = self.sequence_length
+        if len(relationship_codes) < length:
             return False, 0.0
         
-        # 简单的模式匹配逻辑
-        match_score = 0.0
-        total_checks = 0
+        # 每个步骤计一次检查，关系类型匹配时额外计一次
+        node_hits = sum(actual == expected for actual, expected
+                        in zip(node_codes[:length], self._node_type_codes))
         
-        for i, step in enumerate(sequence[:self.sequence_length]):
-            total_checks += 1
-            
-            # 检查节点类型
-            if i < len(self.node_types):
-                expected_type = self.node_types[i]
-                if step.get("node_type") == expected_type.value:
-                    match_score += 1.0
-            
-            # 检查关系类型
-            if i < len(self.relationship_types):
-                expected_rel = self.relationship_types[i]
-                if step.get("relationship_type") == expected_rel.value:
-                    match_score += 1.0
-                    total_checks += 1
+        # 即使关系类型全部命中也达不到阈值时提前返回
+        max_relationship_hits = len(self._relationship_type_bits)
+        max_checks = length + max_relationship_hits
+        if max_checks > 0 and (node_hits + max_relationship_hits) / max_checks < self.confidence_threshold:
+            return False, 0.0
+        
+        relationship_hits = sum(actual == expected for actual, expected
+                                in zip(relationship_codes[:length], self._relationship_type_codes))
+        total_checks = length + relationship_hits
         
-        confidence = match_score / total_checks if total_checks > 0 else 0.0
+        confidence = (node_hits + relationship_hits) / total_checks if total_checks > 0 else 0.0
         matches = confidence >= self.confidence_threshold
         
         return matches, confidence
 
 
-@dataclass
+@dataclass(slots=True)
 class ThreatIndicator:
     """威胁指标"""
     indicator_id: str
@@ -112,20 +229,28 @@ class ThreatIndicator:
     created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
     expires_at: Optional[str] = None
     tags: List[str] = field(default_factory=list)
+    _expires_ts: Optional[float] = field(init=False, repr=False, compare=False)
+    ioc_value_lower: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # 子串匹配时使用的小写IOC值
+        self.ioc_value_lower = self.ioc_value.lower()
+        
+        # 过期时间只解析一次，不带时区的时间按UTC处理；无法解析时视为永不过期
+        self._expires_ts = None
+        if self.expires_at:
+            expire_time = _parse_iso_datetime(self.expires_at)
+            if expire_time is not None:
+                if expire_time.tzinfo is None:
+                    expire_time = expire_time.replace(tzinfo=timezone.utc)
+                self._expires_ts = expire_time.timestamp()
     
     def is_expired(self) -> bool:
         """检查指标是否过期"""
-        if not self.expires_at:
-            return False
-        
-        try:
-            expire_time = datetime.fromisoformat(self.expires_at.replace('Z', '+00:00'))
-            return datetime.utcnow() > expire_time
-        except:
-            return False
+        return self._expires_ts is not None and time.time() > self._expires_ts
 
 
-@dataclass
+@dataclass(slots=True)
 class BehaviorChain:
     """行为链"""
     chain_id: str
@@ -139,16 +264,22 @@ class BehaviorChain:
     matched_patterns: List[str] = field(default_factory=list)
     matched_indicators: List[str] = field(default_factory=list)
     analysis_summary: Dict[str, Any] = field(default_factory=dict)
+    _duration_seconds: float = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # 持续时间只在构造时解析计算一次
+        start = _parse_iso_datetime(self.start_time)
+        end = _parse_iso_datetime(self.end_time)
+        try:
+            self._duration_seconds = (end - start).total_seconds()
+        except TypeError:
+            # 时间无法解析，或带时区与不带时区的时间混用
+            self._duration_seconds = 0.0
     
     @property
     def duration_seconds(self) -> float:
         """获取链持续时间（秒）"""
-        try:
-            start = datetime.fromisoformat(self.start_time.replace('Z', '+00:00'))
-            end = datetime.fromisoformat(self.end_time.replace('Z', '+00:00'))
-            return (end - start).total_seconds()
-        except:
-            return 0.0
+        return self._duration_seconds
     
     @property
     def chain_length(self) -> int:
@@ -156,7 +287,7 @@ class BehaviorChain:
         return len(self.relationships)
 
 
-@dataclass
+@dataclass(slots=True)
 class AnalysisResult:
     """分析结果"""
     analysis_id: str
@@ -166,12 +297,112 @@ class AnalysisResult:
     total_chains: int
     high_risk_chains: int
     detected_threats: List[Dict[str, Any]]
-    behavior_chains: List[BehaviorChain]
+    behavior_chains: List[BehaviorChain]  # 仅保留高风险链
     statistics: Dict[str, Any]
     recommendations: List[str] = field(default_factory=list)
     execution_time: float = 0.0
 
 
+@dataclass(slots=True)
+class _ChainStatistics:
+    """行为链统计累加器，逐条累计，不保留行为链本身"""
+    total: int = 0
+    threat_level_dist: Counter = field(default_factory=Counter)
+    pattern_matches: Counter = field(default_factory=Counter)
+    indicator_matches: Counter = field(default_factory=Counter)
+    risk_buckets: List[int] = field(default_factory=lambda: [0] * (len(_RISK_BUCKET_BOUNDS) + 1))
+    sum_risk: float = 0
+    sum_length: int = 0
+    sum_duration: float = 0
+    max_risk: Optional[float] = None
+    max_length: Optional[int] = None
+    max_duration: Optional[float] = None
+    
+    def add(self, chain: BehaviorChain) -> None:
+        """累计一个已评分的行为链"""
+        self.total += 1
+        self.threat_level_dist[chain.threat_level.value] += 1
+        self.pattern_matches.update(chain.matched_patterns)
+        self.indicator_matches.update(chain.matched_indicators)
+        
+        risk_score = chain.risk_score
+        chain_length = chain.chain_length
+        duration = chain.duration_seconds
+        
+        self.sum_risk += risk_score
+        self.sum_length += chain_length
+        self.sum_duration += duration
+        if self.max_risk is None or risk_score > self.max_risk:
+            self.max_risk = risk_score
+        if self.max_length is None or chain_length > self.max_length:
+            self.max_length = chain_length
+        if self.max_duration is None or duration > self.max_duration:
+            self.max_duration = duration
+        
+        self.risk_buckets[bisect_right(_RISK_BUCKET_BOUNDS, risk_score)] += 1
+    
+    @property
+    def average_risk(self) -> float:
+        """平均风险评分"""
+        return self.sum_risk / self.total if self.total else 0.0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """生成统计信息"""
+        if not self.total:
+            return {}
+        
+        low_count, medium_count, high_count, critical_count = self.risk_buckets
+        
+        return {
+            "total_chains": self.total,
+            "threat_level_distribution": dict(self.threat_level_dist),
+            "risk_score_stats": {
+                "average": round(self.average_risk, 3),
+                "maximum": round(self.max_risk, 3),
+                "distribution": {
+                    "low": low_count,
+                    "medium": medium_count,
+                    "high": high_count,
+                    "critical": critical_count
+                }
+            },
+            "chain_length_stats": {
+                "average": round(self.sum_length / self.total, 2),
+                "maximum": self.max_length
+            },
+            "duration_stats": {
+                "average_seconds": round(self.sum_duration / self.total, 2),
+                "maximum_seconds": round(self.max_duration, 2)
+            },
+            "pattern_matches": dict(self.pattern_matches.most_common(10)),
+            "indicator_matches": dict(self.indicator_matches.most_common(10))
+        }
+
+
+@dataclass(slots=True)
+class _WindowAnalysis:
+    """单个时间窗口的流式分析状态"""
+    statistics: _ChainStatistics = field(default_factory=_ChainStatistics)
+    detected_threats: List[Dict[str, Any]] = field(default_factory=list)
+    high_risk_chains: List[BehaviorChain] = field(default_factory=list)
+    error: Optional[Exception] = None
+    
+    def add(self, chain: BehaviorChain) -> None:
+        """记录一个已评分的行为链，只保留高风险链"""
+        self.statistics.add(chain)
+        
+        if chain.threat_level in (ThreatLevel.HIGH, ThreatLevel.CRITICAL):
+            self.high_risk_chains.append(chain)
+            self.detected_threats.append({
+                "chain_id": chain.chain_id,
+                "threat_level": chain.threat_level.value,
+                "risk_score": chain.risk_score,
+                "matched_patterns": chain.matched_patterns,
+                "matched_indicators": chain.matched_indicators,
+                "summary": chain.analysis_summary
+            })
+
+
 class BehaviorAnalysis:
     """行为链路分析服务"""
     
@@ -186,8 +417,36 @@ class BehaviorAnalysis:
         self.threat_patterns = self._load_default_patterns()
         self.threat_indicators = self._load_default_indicators()
         
+        # 模式匹配结果缓存：匹配结果只取决于序列前 _max_pattern_length 步的类型编码，
+        # 相同形状的行为链直接复用结果（LRU，模式变化时清空）
+        self._pattern_match_cache: OrderedDict = OrderedDict()
+        self._max_pattern_length = max((p.sequence_length for p in self.threat_patterns), default=0)
+        
+        # 威胁指标查找表：子串匹配类按IOC类型分组（预先转小写），精确匹配类按 (IOC类型, 值) 索引
+        self._indicators_by_type: Dict[str, List[Tuple[str, ThreatIndicator]]] = {}
+        self._exact_indicators: Dict[Tuple[str, str], List[ThreatIndicator]] = {}
+        # 子串匹配类的预筛选正则：同类型全部IOC值合成一个分支表达式，一次扫描判断是否可能命中
+        self._substring_prefilters: Dict[str, re.Pattern] = {}
+        for indicator in self.threat_indicators:
+            self._index_indicator(indicator)
+        
         logger.info("行为链路分析服务已初始化")
     
+    def _index_indicator(self, indicator: ThreatIndicator) -> None:
+        """将威胁指标加入查找表"""
+        rule = _IOC_MATCH_RULES.get(indicator.ioc_type)
+        if rule is None:
+            return
+        
+        if rule[1]:
+            self._exact_indicators.setdefault((indicator.ioc_type, indicator.ioc_value), []).append(indicator)
+        else:
+            candidates = self._indicators_by_type.setdefault(indicator.ioc_type, [])
+            candidates.append((indicator.ioc_value_lower, indicator))
+            self._substring_prefilters[indicator.ioc_type] = re.compile(
+                "|".join(re.escape(ioc_value_lower) for ioc_value_lower, _ in candidates)
+            )
+    
     def _load_default_patterns(self) -> List[BehaviorPattern]:
         """加载默认威胁模式"""
         patterns = [
@@ -341,93 +600,145 @@ class BehaviorAnalysis:
         Returns:
             AnalysisResult: 分析结果
         """
+        end_time = datetime.utcnow()
+        start_time_window = end_time - timedelta(seconds=time_window)
+        
+        return self.analyze_behavior_chains_batch(
+            [(start_time_window.isoformat(), end_time.isoformat())],
+            analysis_type
+        )[0]
+    
+    def analyze_behavior_chains_batch(self,
+                                      windows: List[Tuple[str, str]],
+                                      analysis_type: AnalysisType = AnalysisType.BATCH) -> List[AnalysisResult]:
+        """
+        批量分析多个时间窗口的行为链，所有窗口共用一次图数据库查询
+        
+        Args:
+            windows: (开始时间, 结束时间) 列表，ISO格式
+            analysis_type: 分析类型
+            
+        Returns:
+            List[AnalysisResult]: 与 windows 一一对应的分析结果
+        """
+        if not windows:
+            return []
+        
         start_time = datetime.utcnow()
-        analysis_id = f"analysis_{int(start_time.timestamp())}"
+        base_id = f"analysis_{int(start_time.timestamp())}"
+        analysis_ids = [base_id] if len(windows) == 1 else [f"{base_id}_{i}" for i in range(len(windows))]
         
-        logger.info(f"开始行为链分析: {analysis_id}")
+        logger.info(f"开始行为链分析: {base_id}, 时间窗口数: {len(windows)}")
         
+        # 逐条评分并累计统计，只保留高风险链
+        window_analyses = [_WindowAnalysis() for _ in windows]
         try:
-            # 获取时间范围内的行为数据
-            end_time = start_time
-            start_time_window = end_time - timedelta(seconds=time_window)
-            
-            behavior_chains = self._extract_behavior_chains(
-                start_time_window.isoformat(),
-                end_time.isoformat()
-            )
-            
-            # 分析每个行为链
-            detected_threats = []
-            high_risk_count = 0
-            
-            for chain in behavior_chains:
-                # 模式匹配
-                self._match_threat_patterns(chain)
+            for window_index, chain in self._iter_behavior_chains(windows):
+                window_analysis = window_analyses[window_index]
+                if window_analysis.error is not None:
+                    continue
                 
-                # 指标匹配
-                self._match_threat_indicators(chain)
-                
-                # 计算风险评分
-                self._calculate_chain_risk_score(chain)
-                
-                # 确定威胁等级
-                self._determine_threat_level(chain)
-                
-                # 收集高风险链
-                if chain.threat_level in [ThreatLevel.HIGH, ThreatLevel.CRITICAL]:
-                    high_risk_count += 1
-                    detected_threats.append({
-                        "chain_id": chain.chain_id,
-                        "threat_level": chain.threat_level.value,
-                        "risk_score": chain.risk_score,
-                        "matched_patterns": chain.matched_patterns,
-                        "matched_indicators": chain.matched_indicators,
-                        "summary": chain.analysis_summary
-                    })
-            
-            # 生成统计信息
-            statistics = self._generate_statistics(behavior_chains)
-            
-            # 生成建议
-            recommendations = self._generate_recommendations(behavior_chains, detected_threats)
-            
-            execution_time = (datetime.utcnow() - start_time).total_seconds()
-            
-            result = AnalysisResult(
-                analysis_id=analysis_id,
-                analysis_type=analysis_type,
-                start_time=start_time_window.isoformat(),
-                end_time=end_time.isoformat(),
-                total_chains=len(behavior_chains),
-                high_risk_chains=high_risk_count,
-                detected_threats=detected_threats,
-                behavior_chains=behavior_chains,
-                statistics=statistics,
-                recommendations=recommendations,
-                execution_time=execution_time
-            )
-            
-            logger.info(f"行为链分析完成: {analysis_id}, 发现 {high_risk_count} 个高风险链")
-            return result
-            
+                try:
+                    self._score_chain(chain)
+                    window_analysis.add(chain)
+                except Exception as e:
+                    logger.error(f"行为链分析失败: {e}")
+                    window_analysis.error = e
         except Exception as e:
-            logger.error(f"行为链分析失败: {e}")
+            # 提取中断时结果不完整，所有尚未出错的窗口都按失败返回，避免不完整的分析被当作正常结果
+            for window_analysis in window_analyses:
+                if window_analysis.error is None:
+                    window_analysis.error = e
+        
+        return [
+            self._build_window_result(analysis_id, analysis_type, window_start, window_end, window_analysis, start_time)
+            for analysis_id, (window_start, window_end), window_analysis
+            in zip(analysis_ids, windows, window_analyses)
+        ]
+    
+    def _build_window_result(self,
+                             analysis_id: str,
+                             analysis_type: AnalysisType,
+                             window_start: str,
+                             window_end: str,
+                             window_analysis: _WindowAnalysis,
+                             start_time: datetime) -> AnalysisResult:
+        """
+        汇总单个时间窗口的分析结果
+        
+        Args:
+            analysis_id: 分析ID
+            analysis_type: 分析类型
+            window_start: 窗口开始时间
+            window_end: 窗口结束时间
+            window_analysis: 窗口的流式分析状态
+            start_time: 分析开始时间，用于计算执行耗时
+            
+        Returns:
+            AnalysisResult: 分析结果
+        """
+        if window_analysis.error is not None:
             execution_time = (datetime.utcnow() - start_time).total_seconds()
             
             return AnalysisResult(
                 analysis_id=analysis_id,
                 analysis_type=analysis_type,
-                start_time=start_time_window.isoformat() if 'start_time_window' in locals() else "",
+                start_time=window_start,
                 end_time=datetime.utcnow().isoformat(),
                 total_chains=0,
                 high_risk_chains=0,
                 detected_threats=[],
                 behavior_chains=[],
-                statistics={"error": str(e)},
+                statistics={"error": str(window_analysis.error)},
                 execution_time=execution_time
             )
+        
+        statistics = window_analysis.statistics
+        detected_threats = window_analysis.detected_threats
+        high_risk_count = len(detected_threats)
+        
+        # 生成建议
+        recommendations = self._generate_recommendations(statistics, detected_threats)
+        
+        execution_time = (datetime.utcnow() - start_time).total_seconds()
+        
+        result = AnalysisResult(
+            analysis_id=analysis_id,
+            analysis_type=analysis_type,
+            start_time=window_start,
+            end_time=window_end,
+            total_chains=statistics.total,
+            high_risk_chains=high_risk_count,
+            detected_threats=detected_threats,
+            behavior_chains=window_analysis.high_risk_chains,
+            statistics=statistics.to_dict(),
+            recommendations=recommendations,
+            execution_time=execution_time
+        )
+        
+        logger.info(f"行为链分析完成: {analysis_id}, 发现 {high_risk_count} 个高风险链")
+        return result
+    
+    def _score_chain(self, chain: BehaviorChain) -> None:
+        """
+        对单个行为链做模式/指标匹配并评分，只修改该链本身
+        
+        Args:
+            chain: 行为链
+        """
+        # 模式匹配
+        self._match_threat_patterns(chain)
+        
+        # 指标匹配
+        self._match_threat_indicators(chain)
+        
+        # 计算风险评分
+        self._calculate_chain_risk_score(chain)
+        
+        # 确定威胁等级
+        self._determine_threat_level(chain)
     
-    def _extract_behavior_chains(self, start_time: str, end_time: str) -> List[BehaviorChain]:
+    def _extract_behavior_chains(self, start_time: str, end_time: str) -> Iterator[BehaviorChain]:
         """
         提取行为链
         
@@ -436,97 +747,104 @@ class BehaviorAnalysis:
             end_time: 结束时间
             
         Returns:
-            List[BehaviorChain]: 行为链列表
+            Iterator[BehaviorChain]: 行为链迭代器
+        """
+        return (chain for _, chain in self._iter_behavior_chains([(start_time, end_time)]))
+    
+    def _iter_behavior_chains(self, windows: List[Tuple[str, str]]) -> Iterator[Tuple[int, BehaviorChain]]:
+        """
+        在一次查询中流式提取多个时间窗口的行为链
+        
+        Args:
+            windows: (开始时间, 结束时间) 列表
+            
+        Returns:
+            Iterator[Tuple[int, BehaviorChain]]: (窗口下标, 行为链) 迭代器，不同窗口的行为链可能交错；
+            查询或读取结果失败时记录日志后重新抛出，由调用方将分析标记为失败
         """
+        chain_count = 0
+        
         try:
-            # 查询时间范围内的所有关系
+            # 查询各时间窗口内的所有关系，在数据库端按窗口和源节点分组并按时间排序，
+            # 关系数不足2个的源节点不返回（至少需要2个关系才能形成链）
+            # 只投影分析用到的属性，关系类型取自 type(r)；源节点每个分组只返回一次
             query = f"""
-            MATCH (n)-[r]->(m)
-            WHERE r.timestamp >= '{start_time}' AND r.timestamp <= '{end_time}'
-            RETURN n, r, m, r.timestamp as timestamp
-            ORDER BY timestamp
+            UNWIND $windows AS w
+            MATCH (n)-[r:{_CHAIN_RELATIONSHIP_PATTERN}]->(m)
+            WHERE r.timestamp >= w.start AND r.timestamp <= w.end
+            WITH w, n, r, m ORDER BY r.timestamp
+            WITH w, n,
+                 collect({{
+                     relationship: r {{{_RELATIONSHIP_PROJECTION}}},
+                     target_node: m {{{_NODE_PROJECTION}}}
+                 }}) AS rels
+            WHERE size(rels) >= 2
+            RETURN w.id AS window_id,
+                   coalesce(n.id, '') AS source_id,
+                   n {{{_NODE_PROJECTION}}} AS source_node,
+                   rels
             """
+            window_params = [
+                {"id": i, "start": window_start, "end": window_end}
+                for i, (window_start, window_end) in enumerate(windows)
+            ]
             
             with self.graph_ops.driver.session(database=self.graph_ops.database) as session:
-                result = session.run(query)
+                result = session.run(query, windows=window_params)
                 
-                # 按时间顺序收集所有关系
-                relationships = []
+                # 每条记录对应一个窗口内一个源节点的全部关系（已按时间排序），逐条构建行为链；
+                # 链ID带上窗口ID和查询内序号，源节点缺少id或出现在多个窗口时也不会重复
+                query_ts = int(datetime.utcnow().timestamp())
                 for record in result:
-                    relationships.append({
-                        "source_node": dict(record["n"]),
-                        "relationship": dict(record["r"]),
-                        "target_node": dict(record["m"]),
-                        "timestamp": record["timestamp"]
-                    })
+                    chain_id = f"chain_{record['source_id']}_{query_ts}_{record['window_id']}_{chain_count}"
+                    chain = self._build_chain(chain_id, record["source_node"], record["rels"])
+                    chain_count += 1
+                    yield record["window_id"], chain
             
-            # 构建行为链
-            chains = self._build_chains_from_relationships(relationships)
-            
-            logger.info(f"提取了 {len(chains)} 个行为链")
-            return chains
+            logger.info(f"提取了 {chain_count} 个行为链")
             
         except Exception as e:
             logger.error(f"提取行为链失败: {e}")
-            return []
+            raise
     
-    def _build_chains_from_relationships(self, relationships: List[Dict[str, Any]]) -> List[BehaviorChain]:
+    def _build_chain(self,
+                     chain_id: str,
+                     source_node: Dict[str, Any],
+                     source_rels: List[Dict[str, Any]]) -> BehaviorChain:
         """
-        从关系列表构建行为链
+        从单个源节点按时间排序的关系构建行为链
         
         Args:
-            relationships: 关系列表
+            chain_id: 行为链ID
+            source_node: 源节点
+            source_rels: 按时间排序的关系列表，每项包含 relationship 和 target_node
             
         Returns:
-            List[BehaviorChain]: 行为链列表
+            BehaviorChain: 行为链
         """
-        if not relationships:
-            return []
+        # 创建行为链
         
-        # 按源节点分组
-        chains_by_source = defaultdict(list)
+        nodes = [source_node]
+        for rel in source_rels:
+            nodes.append(rel["target_node"])
         
-        for rel in relationships:
-            source_id = rel["source_node"].get("id", "")
-            chains_by_source[source_id].append(rel)
+        # 去重节点
+        unique_nodes = []
+        seen_ids = set()
+        for node in nodes:
+            node_id = node.get("id", "")
+            if node_id not in seen_ids:
+                unique_nodes.append(node)
+                seen_ids.add(node_id)
         
-        chains = []
-        
-        for source_id, source_rels in chains_by_source.items():
-            if len(source_rels) < 2:  # 至少需要2个关系才能形成链
-                continue
-            
-            # 按时间排序
-            source_rels.sort(key=lambda x: x["timestamp"])
-            
-            # 创建行为链
-            chain_id = f"chain_{source_id}_{int(datetime.utcnow().timestamp())}"
-            
-            nodes = [source_rels[0]["source_node"]]
-            for rel in source_rels:
-                nodes.append(rel["target_node"])
-            
-            # 去重节点
-            unique_nodes = []
-            seen_ids = set()
-            for node in nodes:
-                node_id = node.get("id", "")
-                if node_id not in seen_ids:
-                    unique_nodes.append(node)
-                    seen_ids.add(node_id)
-            
-            chain = BehaviorChain(
-                chain_id=chain_id,
-                start_time=source_rels[0]["timestamp"],
-                end_time=source_rels[-1]["timestamp"],
-                nodes=unique_nodes,
-                relationships=[rel["relationship"] for rel in source_rels],
-                total_events=len(source_rels)
-            )
-            
-            chains.append(chain)
-        
-        return chains
+        return BehaviorChain(
+            chain_id=chain_id,
+            start_time=source_rels[0]["relationship"]["timestamp"],
+            end_time=source_rels[-1]["relationship"]["timestamp"],
+            nodes=unique_nodes,
+            relationships=[rel["relationship"] for rel in source_rels],
+            total_events=len(source_rels)
+        )
     
     def _match_threat_patterns(self, chain: BehaviorChain) -> None:
         """
@@ -535,39 +853,68 @@ class BehaviorAnalysis:
         Args:
             chain: 行为链
         """
-        # 构建序列用于模式匹配
-        sequence = []
+        # 将序列前 _max_pattern_length 步编码为整数数组，所有模式共用；第i步的节点为 chain.nodes[i]
+        length = self._max_pattern_length
+        relationship_codes = array('b', (
+            _RELATIONSHIP_TYPE_CODES.get(rel.get("type", ""), _UNKNOWN_TYPE_CODE)
+            for rel in chain.relationships[:length]
+        ))
+        node_codes = array('b', (
+            _NODE_TYPE_CODES.get(node.get("type", ""), _UNKNOWN_TYPE_CODE)
+            for node in chain.nodes[:len(relationship_codes)]
+        ))
         
-        for i, rel in enumerate(chain.relationships):
-            step = {
-                "relationship_type": rel.get("type", ""),
-                "timestamp": rel.get("timestamp", "")
-            }
+        cache_key = (node_codes.tobytes(), relationship_codes.tobytes())
+        matched = self._pattern_match_cache.get(cache_key)
+        if matched is None:
+            matched = self._match_encoded_sequence(node_codes, relationship_codes)
+            self._pattern_match_cache[cache_key] = matched
+            if len(self._pattern_match_cache) > _PATTERN_MATCH_CACHE_MAXSIZE:
+                self._pattern_match_cache.popitem(last=False)
+        else:
+            self._pattern_match_cache.move_to_end(cache_key)
+        
+        for pattern, confidence in matched:
+            chain.matched_patterns.append(pattern.pattern_id)
             
-            # 添加节点类型信息
-            if i < len(chain.nodes):
-                step["node_type"] = chain.nodes[i].get("type", "")
+            # 更新分析摘要
+            if "matched_patterns" not in chain.analysis_summary:
+                chain.analysis_summary["matched_patterns"] = []
+            
+            chain.analysis_summary["matched_patterns"].append({
+                "pattern_id": pattern.pattern_id,
+                "pattern_name": pattern.name,
+                "confidence": confidence,
+                "risk_score": pattern.risk_score,
+                "tags": pattern.tags
+            })
+    
+    def _match_encoded_sequence(self, node_codes: array,
+                                relationship_codes: array) -> Tuple[Tuple[BehaviorPattern, float], ...]:
+        """
+        用全部威胁模式匹配编码后的序列
+        
+        Args:
+            node_codes: 节点类型编码
+            relationship_codes: 关系类型编码
             
-            sequence.append(step)
+        Returns:
+            Tuple[Tuple[BehaviorPattern, float], ...]: 匹配的 (模式, 置信度)，按模式定义顺序
+        """
+        node_mask = _type_mask(node_codes)
+        relationship_mask = _type_mask(relationship_codes)
         
-        # 检查每个威胁模式
+        # 检查每个威胁模式，先按类型掩码排除不可能匹配的模式
+        matched = []
         for pattern in self.threat_patterns:
-            matches, confidence = pattern.matches(sequence)
+            if not pattern.could_match(len(relationship_codes), node_mask, relationship_mask):
+                continue
             
+            matches, confidence = pattern.matches(node_codes, relationship_codes)
             if matches:
-                chain.matched_patterns.append(pattern.pattern_id)
-                
-                # 更新分析摘要
-                if "matched_patterns" not in chain.analysis_summary:
-                    chain.analysis_summary["matched_patterns"] = []
-                
-                chain.analysis_summary["matched_patterns"].append({
-                    "pattern_id": pattern.pattern_id,
-                    "pattern_name": pattern.name,
-                    "confidence": confidence,
-                    "risk_score": pattern.risk_score,
-                    "tags": pattern.tags
-                })
+                matched.append((pattern, confidence))
+        
+        return tuple(matched)
     
     def _match_threat_indicators(self, chain: BehaviorChain) -> None:
         """
@@ -576,36 +923,93 @@ class BehaviorAnalysis:
         Args:
             chain: 行为链
         """
-        # 检查每个威胁指标
+        # 每个节点/关系只按相关IOC类型查表一次
+        node_matches = set()
+        for node in chain.nodes:
+            node_matches.update(map(id, self._find_matching_indicators(node, _IOC_MATCH_RULES)))
+        
+        relationship_matches = set()
+        for relationship in chain.relationships:
+            relationship_matches.update(
+                map(id, self._find_matching_indicators(relationship, _RELATIONSHIP_IOC_MATCH_RULES))
+            )
+        
+        if not node_matches and not relationship_matches:
+            return
+        
+        # 按指标定义顺序输出匹配结果；matched_indicators 需保持顺序输出，另用集合做去重判断
+        matched_ids = set(chain.matched_indicators)
         for indicator in self.threat_indicators:
+            indicator_key = id(indicator)
+            matched_node = indicator_key in node_matches
+            if not matched_node and indicator_key not in relationship_matches:
+                continue
+            
             if indicator.is_expired():
                 continue
             
-            # 检查节点中的指标
-            for node in chain.nodes:
-                if self._check_indicator_match(node, indicator):
-                    chain.matched_indicators.append(indicator.indicator_id)
-                    
-                    # 更新分析摘要
-                    if "matched_indicators" not in chain.analysis_summary:
-                        chain.analysis_summary["matched_indicators"] = []
-                    
-                    chain.analysis_summary["matched_indicators"].append({
-                        "indicator_id": indicator.indicator_id,
-                        "indicator_name": indicator.name,
-                        "threat_level": indicator.threat_level.value,
-                        "confidence": indicator.confidence,
-                        "ioc_type": indicator.ioc_type,
-                        "ioc_value": indicator.ioc_value,
-                        "tags": indicator.tags
-                    })
-                    break  # 找到匹配就跳出
-            
-            # 检查关系中的指标
-            for relationship in chain.relationships:
-                if self._check_indicator_match(relationship, indicator):
-                    if indicator.indicator_id not in chain.matched_indicators:
-                        chain.matched_indicators.append(indicator.indicator_id)
+            if matched_node:
+                chain.matched_indicators.append(indicator.indicator_id)
+                matched_ids.add(indicator.indicator_id)
+                
+                # 更新分析摘要
+                if "matched_indicators" not in chain.analysis_summary:
+                    chain.analysis_summary["matched_indicators"] = []
+                
+                chain.analysis_summary["matched_indicators"].append({
+                    "indicator_id": indicator.indicator_id,
+                    "indicator_name": indicator.name,
+                    "threat_level": indicator.threat_level.value,
+                    "confidence": indicator.confidence,
+                    "ioc_type": indicator.ioc_type,
+                    "ioc_value": indicator.ioc_value,
+                    "tags": indicator.tags
+                })
+            elif indicator.indicator_id not in matched_ids:
+                # 仅在关系中匹配到的指标
+                chain.matched_indicators.append(indicator.indicator_id)
+                matched_ids.add(indicator.indicator_id)
+    
+    def _find_matching_indicators(self,
+                                  data: Dict[str, Any],
+                                  rules: Dict[str, Tuple[str, bool, bool]]) -> List[ThreatIndicator]:
+        """
+        查找数据（节点或关系）匹配的全部威胁指标
+        
+        Args:
+            data: 数据对象（节点或关系）
+            rules: 参与匹配的IOC规则，关系只检查可能出现在关系上的IOC类型
+            
+        Returns:
+            List[ThreatIndicator]: 匹配的指标（未过滤过期指标）
+        """
+        if not isinstance(data, dict):
+            return []
+        
+        matched = []
+        
+        for ioc_type, (field_name, exact, stringify) in rules.items():
+            if exact:
+                value = _ioc_field_value(data, field_name, stringify)
+                if value is not None:
+                    matched.extend(self._exact_indicators.get((ioc_type, value), ()))
+            else:
+                candidates = self._indicators_by_type.get(ioc_type)
+                if not candidates:
+                    continue
+                
+                value = _ioc_field_value(data, field_name, stringify)
+                if value is None:
+                    continue
+                
+                value_lower = value.lower()
+                # 绝大多数字段不命中任何指标，预筛选未命中时跳过逐个比较
+                if not self._substring_prefilters[ioc_type].search(value_lower):
+                    continue
+                matched.extend(indicator for ioc_value_lower, indicator in candidates
+                               if ioc_value_lower in value_lower)
+        
+        return matched
     
     def _check_indicator_match(self, data: Dict[str, Any], indicator: ThreatIndicator) -> bool:
         """
@@ -618,32 +1022,17 @@ class BehaviorAnalysis:
         Returns:
             bool: 是否匹配
         """
-        try:
-            if indicator.ioc_type == "process_name":
-                process_name = data.get("name", "").lower()
-                return indicator.ioc_value.lower() in process_name
-            
-            elif indicator.ioc_type == "process_cmdline":
-                cmdline = data.get("cmdline", "").lower()
-                return indicator.ioc_value.lower() in cmdline
-            
-            elif indicator.ioc_type == "file_path":
-                file_path = data.get("path", "").lower()
-                return indicator.ioc_value.lower() in file_path
-            
-            elif indicator.ioc_type == "network_port":
-                port = str(data.get("port", ""))
-                return indicator.ioc_value == port
-            
-            elif indicator.ioc_type == "ip_address":
-                ip = data.get("ip", "")
-                return indicator.ioc_value == ip
-            
+        rule = _IOC_MATCH_RULES.get(indicator.ioc_type)
+        if rule is None or not isinstance(data, dict):
             return False
-            
-        except Exception as e:
-            logger.warning(f"指标匹配检查失败: {e}")
+        
+        field_name, exact, stringify = rule
+        value = _ioc_field_value(data, field_name, stringify)
+        if value is None:
             return False
+        if exact:
+            return indicator.ioc_value == value
+        return indicator.ioc_value_lower in value.lower()
     
     def _calculate_chain_risk_score(self, chain: BehaviorChain) -> None:
         """
@@ -655,23 +1044,16 @@ class BehaviorAnalysis:
         base_score = 0.1  # 基础分数
         
         # 基于匹配的模式计算分数
-        pattern_score = 0.0
-        if "matched_patterns" in chain.analysis_summary:
-            for pattern_match in chain.analysis_summary["matched_patterns"]:
-                pattern_score += pattern_match["risk_score"] * pattern_match["confidence"]
+        pattern_score = sum(
+            pattern_match["risk_score"] * pattern_match["confidence"]
+            for pattern_match in chain.analysis_summary.get("matched_patterns", ())
+        )
         
         # 基于匹配的指标计算分数
-        indicator_score = 0.0
-        if "matched_indicators" in chain.analysis_summary:
-            for indicator_match in chain.analysis_summary["matched_indicators"]:
-                threat_level_scores = {
-                    ThreatLevel.LOW.value: 0.2,
-                    ThreatLevel.MEDIUM.value: 0.5,
-                    ThreatLevel.HIGH.value: 0.8,
-                    ThreatLevel.CRITICAL.value: 1.0
-                }
-                level_score = threat_level_scores.get(indicator_match["threat_level"], 0.2)
-                indicator_score += level_score * indicator_match["confidence"]
+        indicator_score = sum(
+            _THREAT_LEVEL_SCORES.get(indicator_match["threat_level"], 0.2) * indicator_match["confidence"]
+            for indicator_match in chain.analysis_summary.get("matched_indicators", ())
+        )
         
         # 基于链长度和持续时间的调整
         length_factor = min(chain.chain_length / 10.0, 1.0)  # 链越长风险越高
@@ -708,80 +1090,12 @@ class BehaviorAnalysis:
                 elif indicator_match["threat_level"] == ThreatLevel.HIGH.value and chain.threat_level != ThreatLevel.CRITICAL:
                     chain.threat_level = ThreatLevel.HIGH
     
-    def _generate_statistics(self, chains: List[BehaviorChain]) -> Dict[str, Any]:
-        """
-        生成统计信息
-        
-        Args:
-            chains: 行为链列表
-            
-        Returns:
-            Dict[str, Any]: 统计信息
-        """
-        if not chains:
-            return {}
-        
-        # 威胁等级分布
-        threat_level_dist = Counter(chain.threat_level.value for chain in chains)
-        
-        # 风险评分分布
-        risk_scores = [chain.risk_score for chain in chains]
-        avg_risk_score = sum(risk_scores) / len(risk_scores)
-        max_risk_score = max(risk_scores)
-        
-        # 链长度分布
-        chain_lengths = [chain.chain_length for chain in chains]
-        avg_chain_length = sum(chain_lengths) / len(chain_lengths)
-        max_chain_length = max(chain_lengths)
-        
-        # 持续时间分布
-        durations = [chain.duration_seconds for chain in chains]
-        avg_duration = sum(durations) / len(durations)
-        max_duration = max(durations)
-        
-        # 模式匹配统计
-        pattern_matches = Counter()
-        for chain in chains:
-            for pattern_id in chain.matched_patterns:
-                pattern_matches[pattern_id] += 1
-        
-        # 指标匹配统计
-        indicator_matches = Counter()
-        for chain in chains:
-            for indicator_id in chain.matched_indicators:
-                indicator_matches[indicator_id] += 1
-        
-        return {
-            "total_chains": len(chains),
-            "threat_level_distribution": dict(threat_level_dist),
-            "risk_score_stats": {
-                "average": round(avg_risk_score, 3),
-                "maximum": round(max_risk_score, 3),
-                "distribution": {
-                    "low": len([s for s in risk_scores if s < 0.4]),
-                    "medium": len([s for s in risk_scores if 0.4 <= s < 0.6]),
-                    "high": len([s for s in risk_scores if 0.6 <= s < 0.8]),
-                    "critical": len([s for s in risk_scores if s >= 0.8])
-                }
-            },
-            "chain_length_stats": {
-                "average": round(avg_chain_length, 2),
-                "maximum": max_chain_length
-            },
-            "duration_stats": {
-                "average_seconds": round(avg_duration, 2),
-                "maximum_seconds": round(max_duration, 2)
-            },
-            "pattern_matches": dict(pattern_matches.most_common(10)),
-            "indicator_matches": dict(indicator_matches.most_common(10))
-        }
-    
-    def _generate_recommendations(self, chains: List[BehaviorChain], threats: List[Dict[str, Any]]) -> List[str]:
+    def _generate_recommendations(self, statistics: _ChainStatistics, threats: List[Dict[str, Any]]) -> List[str]:
         """
         生成安全建议
         
         Args:
-            chains: 行为链列表
+            statistics: 行为链统计
             threats: 威胁列表
             
         Returns:
@@ -789,7 +1103,7 @@ class BehaviorAnalysis:
         """
         recommendations = []
         
-        if not chains:
+        if not statistics.total:
             return ["暂无行为数据，建议检查监控配置"]
         
         # 基于威胁数量的建议
@@ -802,10 +1116,7 @@ class BehaviorAnalysis:
             recommendations.append("高风险威胁数量较多，建议启动应急响应流程")
         
         # 基于模式匹配的建议
-        pattern_counts = Counter()
-        for chain in chains:
-            for pattern_id in chain.matched_patterns:
-                pattern_counts[pattern_id] += 1
+        pattern_counts = statistics.pattern_matches
         
         if "process_injection" in pattern_counts:
             recommendations.append("检测到进程注入攻击，建议加强进程监控")
@@ -817,7 +1128,7 @@ class BehaviorAnalysis:
             recommendations.append("检测到权限提升攻击，建议审查用户权限配置")
         
         # 基于链特征的建议
-        avg_risk = sum(chain.risk_score for chain in chains) / len(chains)
+        avg_risk = statistics.average_risk
         
         if avg_risk > 0.6:
             recommendations.append("整体风险水平较高，建议增强安全监控")
@@ -841,6 +1152,8 @@ class BehaviorAnalysis:
         """
         try:
             self.threat_patterns.append(pattern)
+            self._max_pattern_length = max(self._max_pattern_length, pattern.sequence_length)
+            self._pattern_match_cache.clear()
             logger.info(f"添加威胁模式: {pattern.pattern_id}")
             return True
         except Exception as e:
@@ -859,6 +1172,7 @@ class BehaviorAnalysis:
         """
         try:
             self.threat_indicators.append(indicator)
+            self._index_indicator(indicator)
             logger.info(f"添加威胁指标: {indicator.indicator_id}")
             return True
         except Exception as e:
@@ -12,16 +12,101 @@ Falco AI Security System - 行为三元组抽象器
 """
 
 import re
-import json
-import hashlib
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
-from pathlib import Path
+from pathlib import PurePosixPath
+from types import MappingProxyType
 import logging
 
+from app.utils.hash_utils import stable_hash64
+from app.utils.json_utils import dumps_bytes
+
 logger = logging.getLogger(__name__)
 
+# 实体构建缓存与实体缓存的容量
+_ENTITY_FACTORY_CACHE_SIZE = 4096
+_ENTITY_CACHE_MAXSIZE = 10000
+
+# 以下正则都作用于不可信的Falco输出，均不含嵌套或有歧义的量词，回溯开销随输入线性增长
+# 一次扫描提取全部 key=value 字段
+_RE_FIELDS = re.compile(r"(?P<key>proc|file|user|connection|ppid|pid|old_uid|new_uid|uid)=(?P<val>[^\s]+)")
+# 数值字段只取值开头的数字部分
+_NUMERIC_FIELDS = frozenset({"pid", "ppid", "uid", "old_uid", "new_uid"})
+_RE_LEADING_DIGITS = re.compile(r"\d+")
+# command 的值可以包含空格，单独提取
+_RE_COMMAND = re.compile(r"command=([^\s]+(?:\s+[^\s]+)*)")
+# 标准连接字符串 ip:port->ip:port，地址部分不含 ':' 和 '>'，保证与按 "->"、":" 拆分的结果一致
+_RE_CONN_PARTS = re.compile(r"([^:>]+):(\d+)->([^:>]+):(\d+)")
+
+# 优先级权重，基础置信度为 0.5 * 权重
+_BASE_CONFIDENCE = 0.5
+_PRIORITY_WEIGHTS = {
+    "EMERGENCY": 1.0,
+    "ALERT": 0.9,
+    "CRITICAL": 0.8,
+    "ERROR": 0.7,
+    "WARNING": 0.6,
+    "NOTICE": 0.5,
+    "INFO": 0.4,
+    "DEBUG": 0.3
+}
+# 同时收录大写与首字母大写两种写法（Falco输出为首字母大写，如 "Warning"）
+_PRIORITY_CONFIDENCE = MappingProxyType({
+    **{priority: _BASE_CONFIDENCE * weight for priority, weight in _PRIORITY_WEIGHTS.items()},
+    **{priority.title(): _BASE_CONFIDENCE * weight for priority, weight in _PRIORITY_WEIGHTS.items()}
+})
+_DEFAULT_PRIORITY_CONFIDENCE = _BASE_CONFIDENCE * 0.5
+
+
+def _add_field(fields: Dict[str, str], match: re.Match) -> None:
+    """
+    记录一个 key=value 匹配
+    
+    同名字段取第一个有效值；数值字段只保留开头的数字，不以数字开头的值忽略
+    """
+    key = match.group("key")
+    if key in fields:
+        return
+    
+    value = match.group("val")
+    if key in _NUMERIC_FIELDS:
+        digits = _RE_LEADING_DIGITS.match(value)
+        if not digits:
+            return
+        value = digits.group()
+    
+    fields[key] = value
+
+
+def _extract_fields(text: str) -> Dict[str, str]:
+    """单次扫描提取Falco输出中的 key=value 字段"""
+    fields = {}
+    for match in _RE_FIELDS.finditer(text):
+        _add_field(fields, match)
+    return fields
+
+
+def _extract_fields_batch(texts: List[str]) -> List[Dict[str, str]]:
+    """
+    批量提取字段：多条输出以换行拼接后只扫描一次，再按偏移量分配回各条输出
+    
+    字段值不含空白，匹配不会跨越分隔符
+    """
+    starts = []
+    offset = 0
+    for text in texts:
+        starts.append(offset)
+        offset += len(text) + 1
+    
+    fields_list = [{} for _ in texts]
+    for match in _RE_FIELDS.finditer("\n".join(texts)):
+        _add_field(fields_list[bisect_right(starts, match.start()) - 1], match)
+    return fields_list
+
 
 class EntityType(Enum):
     """实体类型枚举"""
@@ -49,7 +134,7 @@ class ActionType(Enum):
     UNKNOWN = "UNKNOWN"
 
 
-@dataclass
+@dataclass(slots=True)
 class Entity:
     """实体数据结构"""
     id: str
@@ -60,11 +145,12 @@ class Entity:
     def __post_init__(self):
         """生成实体唯一ID"""
         if not self.id:
-            content = f"{self.type.value}:{self.name}:{json.dumps(self.properties, sort_keys=True)}"
-            self.id = hashlib.md5(content.encode()).hexdigest()[:16]
+            # 属性按键排序后以单元分隔符拼接，避免 json.dumps(sort_keys=True) 的开销
+            props = "\x1f".join(f"{key}={value}" for key, value in sorted(self.properties.items()))
+            self.id = f"{stable_hash64(f'{self.type.value}:{self.name}:{props}'):016x}"
 
 
-@dataclass
+@dataclass(slots=True)
 class BehaviorTriplet:
     """行为三元组数据结构"""
     subject: Entity  # 主体
@@ -94,6 +180,61 @@ class BehaviorTriplet:
             "confidence": self.confidence,
             "context": self.context
         }
+    
+    def to_json(self) -> bytes:
+        """直接序列化为JSON字节串（orjson原生遍历dataclass和枚举，不构造中间字典），输出与to_dict一致"""
+        return dumps_bytes(self)
+
+
+@lru_cache(maxsize=_ENTITY_FACTORY_CACHE_SIZE)
+def _file_entity_template(file_path: str) -> Entity:
+    """构建并缓存文件实体模板（含已计算的ID），模板不直接对外返回"""
+    # Falco 上报的都是容器/主机内的 POSIX 路径，按纯路径解析，不涉及文件系统
+    path = PurePosixPath(file_path)
+    return Entity(
+        id="",
+        type=EntityType.FILE,
+        name=file_path,
+        properties={
+            "path": file_path,
+            "directory": str(path.parent),
+            "extension": path.suffix
+        }
+    )
+
+
+@lru_cache(maxsize=_ENTITY_FACTORY_CACHE_SIZE)
+def _process_entity_template(proc_name: str, pid: str, user: str) -> Entity:
+    """构建并缓存进程实体模板（含已计算的ID），模板不直接对外返回"""
+    return Entity(
+        id="",
+        type=EntityType.PROCESS,
+        name=proc_name,
+        properties={
+            "pid": pid,
+            "user": user
+        }
+    )
+
+
+def _copy_entity(template: Entity) -> Entity:
+    """复制实体模板：复用已计算的ID和路径拆分结果，properties 每次新建，下游修改不会影响缓存"""
+    return Entity(
+        id=template.id,
+        type=template.type,
+        name=template.name,
+        properties=dict(template.properties)
+    )
+
+
+def _make_file_entity(file_path: str) -> Entity:
+    """构建文件实体"""
+    return _copy_entity(_file_entity_template(file_path))
+
+
+def _make_process_entity(proc_name: str, pid: str, user: str) -> Entity:
+    """构建进程实体"""
+    return _copy_entity(_process_entity_template(proc_name, pid, user))
 
 
 class BehaviorParser:
@@ -101,11 +242,19 @@ class BehaviorParser:
     
     def __init__(self):
         self.rule_patterns = self._load_parsing_rules()
-        self.entity_cache = {}  # 实体缓存
+        self.entity_cache: OrderedDict = OrderedDict()  # 实体缓存（LRU）
+        
+        # 分类解析器：(规则名关键字, 输出关键字, 解析方法)，按顺序依次检查
+        self._category_parsers = [
+            ("file", ("read", "write"), self._parse_file_operations),
+            ("network", ("connection",), self._parse_network_operations),
+            ("process", ("exec",), self._parse_process_operations),
+            ("privilege", ("sudo",), self._parse_privilege_operations)
+        ]
         
     def _load_parsing_rules(self) -> Dict[str, Dict]:
-        """加载解析规则"""
-        return {
+        """加载解析规则，patterns 在加载时预编译"""
+        rules = {
             # 文件操作规则
             "file_operations": {
                 "patterns": [
@@ -160,78 +309,91 @@ class BehaviorParser:
                 }
             }
         }
+        
+        for rule in rules.values():
+            rule["patterns"] = [re.compile(pattern) for pattern in rule["patterns"]]
+        
+        return rules
     
     def parse_falco_event(self, event_data: Dict[str, Any]) -> List[BehaviorTriplet]:
         """解析Falco事件，提取行为三元组"""
         try:
-            triplets = []
-            
-            # 提取基本信息
-            rule_name = event_data.get("rule", "")
-            output_text = event_data.get("output", "")
-            timestamp = event_data.get("time", "")
-            priority = event_data.get("priority", "INFO")
-            
-            # 根据规则类型选择解析策略
-            if "file" in rule_name.lower() or "read" in output_text.lower() or "write" in output_text.lower():
-                triplets.extend(self._parse_file_operations(event_data, output_text, timestamp))
-            
-            if "network" in rule_name.lower() or "connection" in output_text.lower():
-                triplets.extend(self._parse_network_operations(event_data, output_text, timestamp))
-            
-            if "process" in rule_name.lower() or "exec" in output_text.lower():
-                triplets.extend(self._parse_process_operations(event_data, output_text, timestamp))
-            
-            if "privilege" in rule_name.lower() or "sudo" in output_text.lower():
-                triplets.extend(self._parse_privilege_operations(event_data, output_text, timestamp))
-            
-            # 如果没有匹配到特定规则，使用通用解析
-            if not triplets:
-                triplets.extend(self._parse_generic_event(event_data, output_text, timestamp))
-            
-            # 设置置信度
-            for triplet in triplets:
-                triplet.confidence = self._calculate_confidence(triplet, priority)
-            
-            return triplets
+            fields = _extract_fields(event_data.get("output", ""))
+            return self._parse_event(event_data, fields)
             
         except Exception as e:
             logger.error(f"解析Falco事件失败: {e}")
             return []
     
-    def _parse_file_operations(self, event_data: Dict, output_text: str, timestamp: str) -> List[BehaviorTriplet]:
+    def parse_batch(self, events: List[Dict[str, Any]]) -> List[List[BehaviorTriplet]]:
+        """
+        批量解析Falco事件，字段提取对整批输出只做一次正则扫描
+        
+        Args:
+            events: Falco事件列表
+            
+        Returns:
+            List[List[BehaviorTriplet]]: 与 events 一一对应的三元组列表，解析失败的事件对应空列表
+        """
+        try:
+            fields_list = _extract_fields_batch([event_data.get("output", "") for event_data in events])
+        except Exception:
+            # 存在非法事件（非字典或输出非字符串）时逐条解析，由 parse_falco_event 记录错误
+            return [self.parse_falco_event(event_data) for event_data in events]
+        
+        results = []
+        for event_data, fields in zip(events, fields_list):
+            try:
+                results.append(self._parse_event(event_data, fields))
+            except Exception as e:
+                logger.error(f"解析Falco事件失败: {e}")
+                results.append([])
+        return results
+    
+    def _parse_event(self, event_data: Dict[str, Any], fields: Dict[str, str]) -> List[BehaviorTriplet]:
+        """根据已提取的字段解析单个事件"""
+        triplets = []
+        
+        # 提取基本信息
+        rule_name = event_data.get("rule", "")
+        output_text = event_data.get("output", "")
+        timestamp = event_data.get("time", "")
+        priority = event_data.get("priority", "INFO")
+        
+        # 根据规则类型选择解析策略：规则名或输出中包含关键字时调用对应解析器
+        rule_lower = rule_name.lower()
+        output_lower = output_text.lower()
+        for rule_keyword, output_keywords, parse in self._category_parsers:
+            if rule_keyword in rule_lower or any(keyword in output_lower for keyword in output_keywords):
+                triplets.extend(parse(event_data, output_text, timestamp, fields))
+        
+        # 如果没有匹配到特定规则，使用通用解析
+        if not triplets:
+            triplets.extend(self._parse_generic_event(event_data, output_text, timestamp, fields))
+        
+        # 设置置信度，并缓存实体供 get_entity_by_id 查询
+        for triplet in triplets:
+            triplet.confidence = self._calculate_confidence(triplet, priority)
+            self.cache_entity(triplet.subject)
+            self.cache_entity(triplet.object)
+        
+        return triplets
+    
+    def _parse_file_operations(self, event_data: Dict, output_text: str, timestamp: str,
+                               fields: Dict[str, str]) -> List[BehaviorTriplet]:
         """解析文件操作事件"""
         triplets = []
         
         # 提取进程信息
-        proc_match = re.search(r"proc=([^\s]+)", output_text)
-        file_match = re.search(r"file=([^\s]+)", output_text)
-        user_match = re.search(r"user=([^\s]+)", output_text)
+        proc_name = fields.get("proc")
+        file_path = fields.get("file")
         
-        if proc_match and file_match:
+        if proc_name and file_path:
             # 创建主体实体（进程）
-            subject = Entity(
-                id="",
-                type=EntityType.PROCESS,
-                name=proc_match.group(1),
-                properties={
-                    "user": user_match.group(1) if user_match else "unknown",
-                    "pid": self._extract_pid(output_text)
-                }
-            )
+            subject = _make_process_entity(proc_name, fields.get("pid", "unknown"), fields.get("user", "unknown"))
             
             # 创建客体实体（文件）
-            file_path = file_match.group(1)
-            object_entity = Entity(
-                id="",
-                type=EntityType.FILE,
-                name=file_path,
-                properties={
-                    "path": file_path,
-                    "directory": str(Path(file_path).parent),
-                    "extension": Path(file_path).suffix
-                }
-            )
+            object_entity = _make_file_entity(file_path)
             
             # 确定动作类型
             action = self._determine_file_action(output_text, event_data)
@@ -255,28 +417,21 @@ class BehaviorParser:
         
         return triplets
     
-    def _parse_network_operations(self, event_data: Dict, output_text: str, timestamp: str) -> List[BehaviorTriplet]:
+    def _parse_network_operations(self, event_data: Dict, output_text: str, timestamp: str,
+                                  fields: Dict[str, str]) -> List[BehaviorTriplet]:
         """解析网络操作事件"""
         triplets = []
         
         # 提取网络连接信息
-        proc_match = re.search(r"proc=([^\s]+)", output_text)
-        connection_match = re.search(r"connection=([^\s]+)", output_text)
+        proc_name = fields.get("proc")
+        connection = fields.get("connection")
         
-        if proc_match and connection_match:
+        if proc_name and connection:
             # 创建主体实体（进程）
-            subject = Entity(
-                id="",
-                type=EntityType.PROCESS,
-                name=proc_match.group(1),
-                properties={
-                    "pid": self._extract_pid(output_text),
-                    "user": self._extract_user(output_text)
-                }
-            )
+            subject = _make_process_entity(proc_name, fields.get("pid", "unknown"), fields.get("user", "unknown"))
             
             # 解析连接信息
-            connection_info = self._parse_connection_string(connection_match.group(1))
+            connection_info = self._parse_connection_string(connection)
             
             # 创建客体实体（网络端点）
             object_entity = Entity(
@@ -310,23 +465,25 @@ class BehaviorParser:
         
         return triplets
     
-    def _parse_process_operations(self, event_data: Dict, output_text: str, timestamp: str) -> List[BehaviorTriplet]:
+    def _parse_process_operations(self, event_data: Dict, output_text: str, timestamp: str,
+                                  fields: Dict[str, str]) -> List[BehaviorTriplet]:
         """解析进程操作事件"""
         triplets = []
         
         # 提取进程信息
-        proc_match = re.search(r"proc=([^\s]+)", output_text)
-        command_match = re.search(r"command=([^\s]+(?:\s+[^\s]+)*)", output_text)
+        proc_name = fields.get("proc")
         
-        if proc_match:
+        if proc_name:
+            command_match = _RE_COMMAND.search(output_text)
+            
             # 创建主体实体（父进程或用户）
-            user = self._extract_user(output_text)
+            user = fields.get("user", "unknown")
             subject = Entity(
                 id="",
                 type=EntityType.USER if user != "unknown" else EntityType.SYSTEM,
                 name=user if user != "unknown" else "system",
                 properties={
-                    "uid": self._extract_uid(output_text)
+                    "uid": fields.get("uid", "unknown")
                 }
             )
             
@@ -334,11 +491,11 @@ class BehaviorParser:
             object_entity = Entity(
                 id="",
                 type=EntityType.PROCESS,
-                name=proc_match.group(1),
+                name=proc_name,
                 properties={
                     "command": command_match.group(1) if command_match else "",
-                    "pid": self._extract_pid(output_text),
-                    "ppid": self._extract_ppid(output_text)
+                    "pid": fields.get("pid", "unknown"),
+                    "ppid": fields.get("ppid", "unknown")
                 }
             )
             
@@ -366,25 +523,24 @@ class BehaviorParser:
         
         return triplets
     
-    def _parse_privilege_operations(self, event_data: Dict, output_text: str, timestamp: str) -> List[BehaviorTriplet]:
+    def _parse_privilege_operations(self, event_data: Dict, output_text: str, timestamp: str,
+                                    fields: Dict[str, str]) -> List[BehaviorTriplet]:
         """解析权限操作事件"""
         triplets = []
         
         # 提取权限变更信息
-        proc_match = re.search(r"proc=([^\s]+)", output_text)
-        old_uid_match = re.search(r"old_uid=(\d+)", output_text)
-        new_uid_match = re.search(r"new_uid=(\d+)", output_text)
+        proc_name = fields.get("proc")
         
-        if proc_match:
+        if proc_name:
             # 创建主体实体（进程）
             subject = Entity(
                 id="",
                 type=EntityType.PROCESS,
-                name=proc_match.group(1),
+                name=proc_name,
                 properties={
-                    "pid": self._extract_pid(output_text),
-                    "old_uid": old_uid_match.group(1) if old_uid_match else "unknown",
-                    "new_uid": new_uid_match.group(1) if new_uid_match else "unknown"
+                    "pid": fields.get("pid", "unknown"),
+                    "old_uid": fields.get("old_uid", "unknown"),
+                    "new_uid": fields.get("new_uid", "unknown")
                 }
             )
             
@@ -394,7 +550,7 @@ class BehaviorParser:
                 type=EntityType.SYSTEM,
                 name="privilege_escalation",
                 properties={
-                    "target_uid": new_uid_match.group(1) if new_uid_match else "0",
+                    "target_uid": fields.get("new_uid", "0"),
                     "escalation_type": "uid_change"
                 }
             )
@@ -419,24 +575,17 @@ class BehaviorParser:
         
         return triplets
     
-    def _parse_generic_event(self, event_data: Dict, output_text: str, timestamp: str) -> List[BehaviorTriplet]:
+    def _parse_generic_event(self, event_data: Dict, output_text: str, timestamp: str,
+                             fields: Dict[str, str]) -> List[BehaviorTriplet]:
         """通用事件解析"""
         triplets = []
         
         # 尝试提取基本的主体-动作-客体信息
-        proc_match = re.search(r"proc=([^\s]+)", output_text)
+        proc_name = fields.get("proc")
         
-        if proc_match:
+        if proc_name:
             # 创建主体实体
-            subject = Entity(
-                id="",
-                type=EntityType.PROCESS,
-                name=proc_match.group(1),
-                properties={
-                    "pid": self._extract_pid(output_text),
-                    "user": self._extract_user(output_text)
-                }
-            )
+            subject = _make_process_entity(proc_name, fields.get("pid", "unknown"), fields.get("user", "unknown"))
             
             # 创建通用客体实体
             object_entity = Entity(
@@ -487,6 +636,19 @@ class BehaviorParser:
     def _parse_connection_string(self, connection: str) -> Dict[str, Any]:
         """解析连接字符串"""
         # 示例: 192.168.1.100:80->10.0.0.1:443
+        match = _RE_CONN_PARTS.fullmatch(connection)
+        if match:
+            source_ip, source_port, dest_ip, dest_port = match.groups()
+            return {
+                "endpoint": connection,
+                "source_ip": source_ip,
+                "source_port": source_port,
+                "dest_ip": dest_ip,
+                "dest_port": dest_port,
+                "direction": "outbound"
+            }
+        
+        # 非标准格式（端口缺失、非数字端口、IPv6等）按分隔符逐段拆分
         parts = connection.split("->")
         
         if len(parts) == 2:
@@ -507,43 +669,12 @@ class BehaviorParser:
                 "direction": "unknown"
             }
     
-    def _extract_pid(self, text: str) -> str:
-        """提取进程ID"""
-        match = re.search(r"pid=(\d+)", text)
-        return match.group(1) if match else "unknown"
-    
-    def _extract_ppid(self, text: str) -> str:
-        """提取父进程ID"""
-        match = re.search(r"ppid=(\d+)", text)
-        return match.group(1) if match else "unknown"
-    
-    def _extract_user(self, text: str) -> str:
-        """提取用户名"""
-        match = re.search(r"user=([^\s]+)", text)
-        return match.group(1) if match else "unknown"
-    
-    def _extract_uid(self, text: str) -> str:
-        """提取用户ID"""
-        match = re.search(r"uid=(\d+)", text)
-        return match.group(1) if match else "unknown"
-    
     def _calculate_confidence(self, triplet: BehaviorTriplet, priority: str) -> float:
         """计算三元组的置信度"""
-        base_confidence = 0.5
-        
-        # 根据优先级调整置信度
-        priority_weights = {
-            "EMERGENCY": 1.0,
-            "ALERT": 0.9,
-            "CRITICAL": 0.8,
-            "ERROR": 0.7,
-            "WARNING": 0.6,
-            "NOTICE": 0.5,
-            "INFO": 0.4,
-            "DEBUG": 0.3
-        }
-        
-        confidence = base_confidence * priority_weights.get(priority.upper(), 0.5)
+        # 根据优先级确定基础置信度，Falco原样输出的优先级可直接命中，无需先转大写
+        confidence = _PRIORITY_CONFIDENCE.get(priority)
+        if confidence is None:
+            confidence = _PRIORITY_CONFIDENCE.get(priority.upper(), _DEFAULT_PRIORITY_CONFIDENCE)
         
         # 根据实体类型调整置信度
         if triplet.subject.type != EntityType.UNKNOWN and triplet.object.type != EntityType.UNKNOWN:
@@ -564,8 +695,11 @@ class BehaviorParser:
         return self.entity_cache.get(entity_id)
     
     def cache_entity(self, entity: Entity) -> None:
-        """缓存实体"""
+        """缓存实体，超出容量时淘汰最久未使用的实体"""
         self.entity_cache[entity.id] = entity
+        self.entity_cache.move_to_end(entity.id)
+        if len(self.entity_cache) > _ENTITY_CACHE_MAXSIZE:
+            self.entity_cache.popitem(last=False)
     
     def clear_cache(self) -> None:
         """清空实体缓存"""
@@ -14,6 +14,7 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Callable, Any
 from dataclasses import dataclass
+from functools import cached_property
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 import aiofiles
@@ -21,6 +22,7 @@ import aiofiles
 # from grpc import aio as aio_grpc
 
 from app.config import settings
+from app.utils.hash_utils import stable_hash64
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +39,11 @@ class FalcoEvent:
     tags: List[str]
     raw_data: Dict[str, Any]
     
+    @cached_property
+    def message_hash(self) -> int:
+        """消息哈希（跨进程稳定），首次访问时计算并缓存，后续阶段复用以免重复哈希长消息"""
+        return stable_hash64(self.message)
+    
     @classmethod
     def from_json(cls, json_data: Dict[str, Any]) -> 'FalcoEvent':
         """从JSON数据创建FalcoEvent实例"""
@@ -291,6 +291,7 @@ class LogPipeline:
         self.config = config or {}
         self.is_running = False
         self.event_queue = Queue(maxsize=self.config.get("queue_size", 1000))
+        self.parse_batch_size = self.config.get("parse_batch_size", 100)  # 每次从队列取出并批量解析的最大事件数
         self.processed_events = deque(maxlen=self.config.get("history_size", 10000))
         
         # 初始化组件
@@ -402,26 +403,47 @@ class LogPipeline:
         
         while self.is_running:
             try:
-                # 从队列获取事件
+                # 从队列获取事件，再取出已排队的事件凑成一批
                 try:
-                    event = self.event_queue.get(timeout=1.0)
+                    batch = [self.event_queue.get(timeout=1.0)]
                 except Empty:
                     continue
                 
-                # 处理事件
-                await self._process_single_event(event)
+                while len(batch) < self.parse_batch_size:
+                    try:
+                        batch.append(self.event_queue.get_nowait())
+                    except Empty:
+                        break
+                
+                # 批量解析后逐个处理事件
+                for event in self._parse_events(batch):
+                    await self._process_single_event(event)
                 
             except Exception as e:
                 logger.error(f"处理事件循环异常: {e}")
                 await asyncio.sleep(1.0)
     
+    def _parse_events(self, events: List[PipelineEvent]) -> List[PipelineEvent]:
+        """批量解析事件（阶段1），返回解析成功的事件；转换失败的事件标记为失败"""
+        parsed_events = []
+        event_dicts = []
+        for event in events:
+            try:
+                event_dicts.append(event.falco_event.to_dict())
+                parsed_events.append(event)
+            except Exception as e:
+                logger.error(f"处理事件失败: {e}")
+                event.context.update_stage(ProcessingStage.FAILED, str(e))
+                self.stats["events_failed"] += 1
+        
+        for event, triplets in zip(parsed_events, self.behavior_parser.parse_batch(event_dicts)):
+            event.triplets = triplets
+        return parsed_events
+    
     async def _process_single_event(self, event: PipelineEvent):
-        """处理单个事件"""
+        """处理单个已解析的事件"""
         try:
-            # 阶段1: 解析事件
-            event.triplets = self.behavior_parser.parse_falco_event(
-                event.falco_event.to_dict()
-            )
+            # 阶段1: 解析已由 _parse_events 批量完成
             event.context.update_stage(ProcessingStage.PARSED)
             
             # 阶段2: 过滤事件
@@ -298,7 +298,77 @@ class Neo4jService:
             logger.error(f"存储行为三元组失败: {e}")
         
         return False
-    
+
+    async def store_behavior_triples_batch(self, triples: List[BehaviorTriple]) -> int:
+        """批量存储行为三元组（单次UNWIND写入），返回成功写入的数量"""
+        if not triples:
+            return 0
+        try:
+            with self.driver.session(database=self.database) as session:
+                query = """
+                UNWIND $triples AS t
+
+                // 创建或合并主体节点
+                MERGE (s:Entity {id: t.subject})
+                SET s.type = split(t.subject, ':')[0],
+                    s.name = t.subject,
+                    s.last_seen = datetime(t.timestamp)
+
+                // 创建或合并客体节点
+                MERGE (o:Entity {id: t.object})
+                SET o.type = split(t.object, ':')[0],
+                    o.name = t.object,
+                    o.last_seen = datetime(t.timestamp)
+
+                // 创建事件节点
+                CREATE (e:Event {
+                    id: t.event_id,
+                    rule: t.rule,
+                    priority: t.priority,
+                    message: t.message,
+                    timestamp: datetime(t.timestamp),
+                    hostname: t.hostname,
+                    tags: t.tags,
+                    properties: t.properties
+                })
+
+                // 创建关系
+                CREATE (s)-[r:PERFORMS {action: t.predicate, timestamp: datetime(t.timestamp)}]->(o)
+                CREATE (s)-[:TRIGGERED]->(e)
+                CREATE (e)-[:INVOLVES]->(o)
+
+                RETURN count(e) as stored
+                """
+
+                result = session.run(query, {
+                    'triples': [
+                        {
+                            'subject': triple.subject,
+                            'object': triple.object,
+                            'predicate': triple.predicate,
+                            'timestamp': triple.timestamp.isoformat(),
+                            'event_id': triple.event_id,
+                            'rule': triple.properties.get('rule', ''),
+                            'priority': triple.properties.get('priority', ''),
+                            'message': triple.properties.get('message', ''),
+                            'hostname': triple.properties.get('hostname', ''),
+                            'tags': triple.properties.get('tags', []),
+                            'properties': json.dumps(triple.properties)
+                        }
+                        for triple in triples
+                    ]
+                })
+
+                record = result.single()
+                stored = record['stored'] if record else 0
+                logger.debug(f"已批量存储 {stored} 个行为三元组")
+                return stored
+
+        except Exception as e:
+            logger.error(f"批量存储行为三元组失败: {e}")
+
+        return 0
+
     async def query_related_behaviors(self, entity: str, depth: int = 2) -> List[Dict[str, Any]]:
         """查询相关行为模式"""
         try:
@@ -330,6 +400,44 @@ class Neo4jService:
             logger.error(f"查询相关行为失败: {e}")
             return []
     
+    async def query_related_behaviors_batch(self, entities: List[str], depth: int = 2) -> List[Dict[str, Any]]:
+        """批量查询多个实体的相关行为模式（单次查询，每个实体最多返回100条路径）"""
+        if not entities:
+            return []
+        try:
+            with self.driver.session(database=self.database) as session:
+                query = f"""
+                UNWIND $entities AS entity
+                CALL {{
+                    WITH entity
+                    MATCH path = (start:Entity {{id: entity}})-[*1..{depth}]-(related:Entity)
+                    WITH path, relationships(path) as rels, nodes(path) as nodes
+                    RETURN 
+                        [n in nodes | {{id: n.id, type: n.type, name: n.name}}] as nodes,
+                        [r in rels | {{type: type(r), action: r.action, timestamp: r.timestamp}}] as relationships,
+                        length(path) as path_length
+                    ORDER BY path_length, relationships[0].timestamp DESC
+                    LIMIT 100
+                }}
+                RETURN nodes, relationships, path_length
+                """
+                
+                result = session.run(query, {'entities': entities})
+                behaviors = []
+                
+                for record in result:
+                    behaviors.append({
+                        'nodes': record['nodes'],
+                        'relationships': record['relationships'],
+                        'path_length': record['path_length']
+                    })
+                
+                return behaviors
+                
+        except Exception as e:
+            logger.error(f"批量查询相关行为失败: {e}")
+            return []
+    
     async def detect_anomalies(self, time_window: int = 3600) -> List[Dict[str, Any]]:
         """检测异常行为模式"""
         try:
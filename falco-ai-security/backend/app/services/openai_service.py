@@ -9,7 +9,7 @@ import logging
 import json
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Protocol, Sequence, Tuple
 from dataclasses import dataclass
 import openai
 from openai import AsyncOpenAI
@@ -19,6 +19,21 @@ from app.services.falco_monitor import FalcoEvent
 
 logger = logging.getLogger(__name__)
 
+# 批量威胁分析：单条结论（描述、建议、指标）的输出token预算，以及单次请求的输出token上限，
+# 事件数超过上限可容纳的数量时拆分为多个并发请求
+_BATCH_TOKENS_PER_EVENT = 400
+_MAX_BATCH_COMPLETION_TOKENS = 4096
+_MAX_EVENTS_PER_REQUEST = max(1, _MAX_BATCH_COMPLETION_TOKENS // _BATCH_TOKENS_PER_EVENT)
+
+# 批量分析的系统提示，明确要求只输出JSON
+_BATCH_SYSTEM_PROMPT = "你是一个专业的网络安全分析师，专门分析安全事件。只输出JSON数组，不要输出任何其他文字或代码块标记。"
+
+class PatternEvent(Protocol):
+    """模式分析所需的事件字段，FalcoEvent 和 ai_agent 的 EventRef 均满足"""
+    timestamp: datetime
+    rule: str
+    message: str
+
 @dataclass
 class ThreatAnalysis:
     """威胁分析结果"""
@@ -110,6 +125,28 @@ class OpenAIService:
 }
 """
         
+        # 批量威胁检测提示模板（一次请求分析多个事件）
+        self.batch_threat_detection_prompt = """
+你是一个专业的网络安全分析师，专门分析Falco安全事件。请逐条分析以下 {count} 个安全事件并提供威胁评估：
+
+{events}
+
+对每个事件提供：威胁等级 (low/medium/high/critical)、威胁类型 (malware/intrusion/privilege_escalation/data_exfiltration/lateral_movement/reconnaissance/other)、置信度 (0.0-1.0)、详细描述、安全建议、威胁指标。
+
+只返回一个JSON数组，不要包含任何其他文字。数组长度与事件数量一致，index 为整数事件编号：
+[
+  {{
+    "index": 事件编号,
+    "threat_level": "威胁等级",
+    "threat_type": "威胁类型",
+    "confidence": 置信度数值,
+    "description": "详细描述",
+    "recommendations": ["建议1", "建议2"],
+    "indicators": ["指标1", "指标2"]
+  }}
+]
+"""
+
         # 模式分析提示模板
         self.pattern_analysis_prompt = """
 你是一个专业的网络安全分析师，请分析以下安全事件序列，识别潜在的攻击模式：
@@ -202,20 +239,7 @@ class OpenAIService:
                 # 解析JSON响应
                 try:
                     result = json.loads(content)
-                    
-                    # 生成事件ID
-                    event_id = f"{event.hostname}_{event.timestamp.timestamp()}_{hash(event.message)}"
-                    
-                    return ThreatAnalysis(
-                        event_id=event_id,
-                        threat_level=result.get('threat_level', 'low'),
-                        threat_type=result.get('threat_type', 'other'),
-                        confidence=float(result.get('confidence', 0.5)),
-                        description=result.get('description', ''),
-                        recommendations=result.get('recommendations', []),
-                        indicators=result.get('indicators', []),
-                        timestamp=datetime.now()
-                    )
+                    return self._build_threat_analysis(event, result)
                     
                 except json.JSONDecodeError as e:
                     logger.error(f"解析AI响应失败: {e}")
@@ -228,7 +252,110 @@ class OpenAIService:
             logger.error(f"威胁分析失败: {e}")
         
         return None
-    
+
+    async def analyze_threats_batch(self, events: List[FalcoEvent]) -> List[Optional[ThreatAnalysis]]:
+        """批量分析多个事件的威胁，结果与输入事件一一对应；事件较多时按输出token预算拆分为多个请求"""
+        if not events:
+            return []
+
+        if not self.is_connected:
+            logger.error("OpenAI服务未连接")
+            return [None] * len(events)
+
+        chunks = [events[i:i + _MAX_EVENTS_PER_REQUEST] for i in range(0, len(events), _MAX_EVENTS_PER_REQUEST)]
+        chunk_results = await asyncio.gather(*(self._analyze_threat_chunk(chunk) for chunk in chunks))
+        return [analysis for analyses in chunk_results for analysis in analyses]
+
+    async def _analyze_threat_chunk(self, events: List[FalcoEvent]) -> List[Optional[ThreatAnalysis]]:
+        """单次API调用分析一批事件，结果与输入事件一一对应"""
+        try:
+            # 准备事件列表描述
+            event_descriptions = []
+            for i, event in enumerate(events):
+                event_descriptions.append(
+                    f"事件 {i}:\n"
+                    f"- 规则: {event.rule}\n"
+                    f"- 优先级: {event.priority}\n"
+                    f"- 消息: {event.message}\n"
+                    f"- 主机: {event.hostname}\n"
+                    f"- 时间: {event.timestamp.isoformat()}\n"
+                    f"- 标签: {', '.join(event.tags)}\n"
+                    f"- 详细信息: {json.dumps(event.output_fields)}"
+                )
+
+            prompt = self.batch_threat_detection_prompt.format(
+                count=len(events),
+                events='\n\n'.join(event_descriptions)
+            )
+
+            # 调用OpenAI API，输出token按事件数放大，避免结果数组被截断
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": _BATCH_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max(self.max_tokens, len(events) * _BATCH_TOKENS_PER_EVENT),
+                temperature=self.temperature
+            )
+
+            if response.choices:
+                content = response.choices[0].message.content
+
+                try:
+                    results = json.loads(content)
+                    if not isinstance(results, list):
+                        raise ValueError("响应不是JSON数组")
+                except (json.JSONDecodeError, ValueError) as e:
+                    logger.error(f"解析批量AI响应失败: {e}")
+                    logger.debug(f"原始响应: {content}")
+                    return [self._create_fallback_analysis(event, content) for event in events]
+
+                # 按index对齐结果，index无法转换为整数时按数组位置对齐
+                by_index = {}
+                for position, result in enumerate(results):
+                    if not isinstance(result, dict):
+                        continue
+                    try:
+                        index = int(result.get('index', position))
+                    except (TypeError, ValueError):
+                        index = position
+                    by_index.setdefault(index, result)
+
+                # 缺失或无法解析的条目使用备用分析，不影响同批其他事件
+                analyses = []
+                for i, event in enumerate(events):
+                    result = by_index.get(i)
+                    if result is not None:
+                        try:
+                            analyses.append(self._build_threat_analysis(event, result))
+                            continue
+                        except (TypeError, ValueError) as e:
+                            logger.warning(f"批量AI响应中事件 {i} 的结果无效: {e}")
+                    analyses.append(self._create_fallback_analysis(event, content))
+
+                return analyses
+
+        except Exception as e:
+            logger.error(f"批量威胁分析失败: {e}")
+
+        return [None] * len(events)
+
+    def _build_threat_analysis(self, event: FalcoEvent, result: Dict[str, Any]) -> ThreatAnalysis:
+        """由AI返回的单条结果构建威胁分析，置信度无法转换为数值时抛出异常"""
+        event_id = f"{event.hostname}_{event.timestamp.timestamp()}_{event.message_hash}"
+
+        return ThreatAnalysis(
+            event_id=event_id,
+            threat_level=result.get('threat_level', 'low'),
+            threat_type=result.get('threat_type', 'other'),
+            confidence=float(result.get('confidence', 0.5)),
+            description=result.get('description', ''),
+            recommendations=result.get('recommendations', []),
+            indicators=result.get('indicators', []),
+            timestamp=datetime.now()
+        )
+
     def _create_fallback_analysis(self, event: FalcoEvent, ai_response: str) -> ThreatAnalysis:
         """创建备用分析结果"""
         # 基于规则和优先级的简单威胁评估
@@ -252,7 +379,7 @@ class OpenAIService:
         elif any(keyword in rule_lower for keyword in ['file', 'write', 'read']):
             threat_type = 'data_exfiltration'
         
-        event_id = f"{event.hostname}_{event.timestamp.timestamp()}_{hash(event.message)}"
+        event_id = f"{event.hostname}_{event.timestamp.timestamp()}_{event.message_hash}"
         
         return ThreatAnalysis(
             event_id=event_id,
@@ -265,7 +392,7 @@ class OpenAIService:
             timestamp=datetime.now()
         )
     
-    async def analyze_event_pattern(self, events: List[FalcoEvent]) -> Optional[Dict[str, Any]]:
+    async def analyze_event_pattern(self, events: Sequence[PatternEvent]) -> Optional[Dict[str, Any]]:
         """分析事件模式"""
         try:
             if not self.is_connected:
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - Risk Kernel
+风险评分表与批量评分内核
+
+批量分析时先把优先级、威胁等级映射为小整数下标，再按列（SoA）组织成numpy数组，
+一次向量化运算得到整批事件的风险评分，结果与逐条计算的 _calculate_risk_score 一致。
+"""
+
+import re
+from typing import Optional
+
+import numpy as np
+
+# Falco优先级基础分
+PRIORITY_SCORES = {
+    'Emergency': 1.0,
+    'Alert': 0.9,
+    'Critical': 0.8,
+    'Error': 0.6,
+    'Warning': 0.4,
+    'Notice': 0.2,
+    'Informational': 0.1,
+    'Debug': 0.05
+}
+DEFAULT_PRIORITY_SCORE = 0.1
+
+# AI威胁等级分
+THREAT_SCORES = {
+    'critical': 1.0,
+    'high': 0.8,
+    'medium': 0.5,
+    'low': 0.2
+}
+DEFAULT_THREAT_SCORE = 0.2
+
+# 规则名称关键字加分
+SHELL_RULE_PATTERN = re.compile(r'shell|exec|privilege', re.IGNORECASE)
+NETWORK_RULE_PATTERN = re.compile(r'network|connect|outbound', re.IGNORECASE)
+
+# 下标查找表：未知优先级/威胁等级取默认分，没有威胁分析结果时该项为0
+PRIORITY_INDEX = {priority: i for i, priority in enumerate(PRIORITY_SCORES)}
+UNKNOWN_PRIORITY_INDEX = len(PRIORITY_SCORES)
+PRIORITY_LUT = np.array([*PRIORITY_SCORES.values(), DEFAULT_PRIORITY_SCORE], dtype=np.float64)
+
+THREAT_INDEX = {level: i for i, level in enumerate(THREAT_SCORES)}
+UNKNOWN_THREAT_INDEX = len(THREAT_SCORES)
+NO_THREAT_INDEX = len(THREAT_SCORES) + 1
+THREAT_LUT = np.array([*THREAT_SCORES.values(), DEFAULT_THREAT_SCORE, 0.0], dtype=np.float64)
+
+
+def priority_index(priority: str) -> int:
+    """优先级映射为查找表下标"""
+    return PRIORITY_INDEX.get(priority, UNKNOWN_PRIORITY_INDEX)
+
+
+def threat_index(threat_level: Optional[str]) -> int:
+    """威胁等级映射为查找表下标，未知等级（包括None）取默认分；没有威胁分析结果时由调用方使用 NO_THREAT_INDEX"""
+    return THREAT_INDEX.get(threat_level, UNKNOWN_THREAT_INDEX)
+
+
+def rule_bonus(rule: str) -> float:
+    """规则名称关键字加分"""
+    bonus = 0.0
+    if SHELL_RULE_PATTERN.search(rule):
+        bonus += 0.1
+    if NETWORK_RULE_PATTERN.search(rule):
+        bonus += 0.05
+    return bonus
+
+
+def score_batch(prio_idx: np.ndarray, thr_idx: np.ndarray, conf: np.ndarray,
+                nsim: np.ndarray, avgsim: np.ndarray, flags: np.ndarray) -> np.ndarray:
+    """批量计算风险评分，各参数为等长数组，返回裁剪到 [0, 1] 以内的评分"""
+    score = PRIORITY_LUT[prio_idx] * 0.3
+    score += THREAT_LUT[thr_idx] * conf * 0.4
+    score += np.minimum(nsim / 10.0, 1.0) * avgsim * 0.2  # 最多10个相似事件
+    score += flags
+    return np.minimum(score, 1.0)
@@ -6,15 +6,31 @@
 """
 
 import asyncio
-import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Set, Any, Optional
+from typing import Dict, List, Set, Any, Optional, Callable, Awaitable, Tuple
 from dataclasses import dataclass, asdict
 from fastapi import WebSocket, WebSocketDisconnect
 
+import orjson
+import ormsgpack
+
+from app.utils.json_utils import dumps_bytes
+
 logger = logging.getLogger(__name__)
 
+# 面向机器消费者的MessagePack子协议，浏览器仪表盘继续使用JSON
+MSGPACK_SUBPROTOCOL = 'falco.msgpack.v1'
+
+# 连接的推送编码
+ENCODING_JSON_TEXT = 'json-text'
+ENCODING_JSON_BINARY = 'json-binary'
+ENCODING_MSGPACK = 'msgpack'
+
+def _packb(obj: Any) -> bytes:
+    """序列化为MessagePack字节串"""
+    return ormsgpack.packb(obj, option=ormsgpack.OPT_SERIALIZE_NUMPY)
+
 @dataclass
 class WebSocketMessage:
     """WebSocket消息"""
@@ -23,6 +39,119 @@ class WebSocketMessage:
     timestamp: str
     client_id: Optional[str] = None
 
+class EventRing:
+    """环形事件缓冲区
+    
+    容量为2的幂，下标用位掩码取模；写满时覆盖最旧的事件，
+    实时推送场景下优先保留最新事件。事件循环单线程执行，读写无需加锁
+    """
+    
+    def __init__(self, capacity_bits: int = 10):
+        self.capacity = 1 << capacity_bits
+        self._mask = self.capacity - 1
+        self._buffer: List[Optional[Tuple[bytes, Dict[str, Any]]]] = [None] * self.capacity
+        self._head = 0  # 下一个读取位置
+        self._tail = 0  # 下一个写入位置
+        self.dropped = 0
+    
+    def __len__(self) -> int:
+        return self._tail - self._head
+    
+    def push(self, item: Tuple[bytes, Dict[str, Any]]):
+        """写入一个事件"""
+        if self._tail - self._head == self.capacity:
+            self._head += 1
+            self.dropped += 1
+        self._buffer[self._tail & self._mask] = item
+        self._tail += 1
+    
+    def pop(self) -> Tuple[bytes, Dict[str, Any]]:
+        """读取最旧的事件，调用前需确认缓冲区非空"""
+        index = self._head & self._mask
+        item = self._buffer[index]
+        self._buffer[index] = None
+        self._head += 1
+        return item
+    
+    def peek(self) -> Tuple[bytes, Dict[str, Any]]:
+        """查看最旧的事件但不移除"""
+        return self._buffer[self._head & self._mask]
+
+class BatchingBroadcaster:
+    """批量广播器
+    
+    将短时间窗口内到达的事件合并为一个 batch 帧发送，
+    突发事件流下减少序列化与发送次数
+    """
+    
+    def __init__(self, send_frame: Callable[[bytes, Dict[str, Any]], Awaitable[None]],
+                 max_elements: int = 50, max_bytes: int = 64 * 1024, wait_time: float = 0.05):
+        self.send_frame = send_frame
+        self.max_elements = max_elements
+        self.max_bytes = max_bytes
+        self.wait_time = wait_time
+        self.ring = EventRing()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    def submit(self, message: Dict[str, Any]):
+        """提交一条待广播的消息"""
+        # 每条消息只序列化一次，批量帧直接拼接已编码的消息
+        self.ring.push((dumps_bytes(message), message))
+        self._ready.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._worker())
+    
+    async def stop(self):
+        """停止批量发送任务"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.ring.dropped:
+            logger.warning(f"批量广播缓冲区溢出，丢弃事件数: {self.ring.dropped}")
+    
+    async def _worker(self):
+        """批量发送循环"""
+        ring = self.ring
+        while True:
+            if not ring:
+                self._ready.clear()
+                await self._ready.wait()
+            
+            # 首个事件到达后等待一个窗口，让突发事件合并到同一帧
+            if len(ring) < self.max_elements:
+                await asyncio.sleep(self.wait_time)
+            
+            # 按条数和字节上限取出一批，至少取出一条
+            batch = [ring.pop()]
+            size = len(batch[0][0])
+            while ring and len(batch) < self.max_elements and size + len(ring.peek()[0]) <= self.max_bytes:
+                item = ring.pop()
+                batch.append(item)
+                size += len(item[0])
+            
+            try:
+                await self.send_frame(*self._build_frame(batch))
+            except Exception as e:
+                logger.error(f"批量广播失败: {e}")
+    
+    @staticmethod
+    def _build_frame(batch: List[Tuple[bytes, Dict[str, Any]]]) -> Tuple[bytes, Dict[str, Any]]:
+        """构建批量帧及对应的消息，单条消息直接发送原始帧"""
+        if len(batch) == 1:
+            return batch[0]
+        now = datetime.now()
+        message = {
+            'event': 'batch',
+            'data': {'events': [item[1] for item in batch], 'count': len(batch)},
+            'timestamp': now
+        }
+        frame = b''.join((
+            b'{"event":"batch","data":{"events":[', b','.join(item[0] for item in batch),
+            b'],"count":', str(len(batch)).encode(), b'},"timestamp":', dumps_bytes(now), b'}'
+        ))
+        return frame, message
+
 class SimpleWebSocketService:
     """简化的WebSocket服务"""
     
@@ -38,19 +167,31 @@ class SimpleWebSocketService:
         # 后台任务
         self.background_tasks: List[asyncio.Task] = []
         
+        # 高频事件（安全事件、系统指标）走批量广播
+        self.batcher = BatchingBroadcaster(self.broadcast_prepared)
+        
         logger.info("简化WebSocket服务初始化完成")
     
-    async def connect(self, websocket: WebSocket, client_id: str = None):
-        """接受WebSocket连接"""
+    async def connect(self, websocket: WebSocket, client_id: str = None, binary: bool = False,
+                      subprotocol: Optional[str] = None):
+        """接受WebSocket连接
+        
+        binary为True时该客户端接收二进制JSON帧；协商到MessagePack子协议时推送MessagePack帧
+        """
         try:
-            await websocket.accept()
+            await websocket.accept(subprotocol=subprotocol)
             self.active_connections.add(websocket)
             
             # 记录连接信息
+            now = datetime.now()
             self.connection_info[websocket] = {
                 'client_id': client_id or f"client_{len(self.active_connections)}",
-                'connected_at': datetime.now(),
-                'last_ping': datetime.now()
+                'connected_at': now,
+                'last_ping': now,
+                'encoding': (
+                    ENCODING_MSGPACK if subprotocol == MSGPACK_SUBPROTOCOL
+                    else ENCODING_JSON_BINARY if binary else ENCODING_JSON_TEXT
+                )
             }
             
             logger.info(f"WebSocket客户端连接: {client_id}, 当前连接数: {len(self.active_connections)}")
@@ -60,10 +201,10 @@ class SimpleWebSocketService:
                 'event': 'connect_success',
                 'data': {
                     'message': '连接成功',
-                    'server_time': datetime.now().isoformat(),
+                    'server_time': now,
                     'client_id': self.connection_info[websocket]['client_id']
                 },
-                'timestamp': datetime.now().isoformat()
+                'timestamp': now
             })
             
             # 发送最近的事件
@@ -74,7 +215,7 @@ class SimpleWebSocketService:
                         'events': self.recent_events[-10:],
                         'total': len(self.recent_events)
                     },
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': now
                 })
             
         except Exception as e:
@@ -96,7 +237,13 @@ class SimpleWebSocketService:
     async def send_to_client(self, websocket: WebSocket, message: Dict[str, Any]):
         """发送消息到指定客户端"""
         try:
-            await websocket.send_text(json.dumps(message, ensure_ascii=False))
+            encoding = self.connection_info.get(websocket, {}).get('encoding')
+            if encoding == ENCODING_MSGPACK:
+                await websocket.send_bytes(_packb(message))
+            elif encoding == ENCODING_JSON_BINARY:
+                await websocket.send_bytes(dumps_bytes(message))
+            else:
+                await websocket.send_text(dumps_bytes(message).decode())
         except Exception as e:
             logger.error(f"发送消息到客户端失败: {e}")
             await self.disconnect(websocket)
@@ -107,43 +254,87 @@ class SimpleWebSocketService:
             logger.debug("没有活跃的WebSocket连接")
             return
         
-        # 添加到最近事件列表
-        self.recent_events.append(message)
-        if len(self.recent_events) > self.max_recent_events:
-            self.recent_events.pop(0)
+        self._record_event(message)
         
-        # 广播到所有客户端
-        disconnected_clients = []
-        for websocket in self.active_connections.copy():
-            try:
-                await websocket.send_text(json.dumps(message, ensure_ascii=False))
-            except Exception as e:
-                logger.error(f"广播消息失败: {e}")
-                disconnected_clients.append(websocket)
+        # 只序列化一次，所有客户端复用同一个帧
+        await self.broadcast_prepared(dumps_bytes(message), message)
+    
+    async def broadcast_prepared(self, frame: bytes, message: Optional[Dict[str, Any]] = None):
+        """广播已序列化的JSON帧到所有连接的客户端
+        
+        message为帧对应的原始消息，存在MessagePack客户端时用于生成MessagePack帧
+        """
+        if not self.active_connections:
+            logger.debug("没有活跃的WebSocket连接")
+            return
+        
+        # 并发发送到所有客户端，单个客户端发送失败不影响其他客户端
+        clients = list(self.active_connections)
+        # 二进制客户端直接发送字节帧，文本客户端共享一次解码的结果，
+        # MessagePack客户端共享一次打包的结果
+        # frame是不可变bytes，所有发送共享同一对象，无需按客户端复制或池化缓冲区
+        text_frame = None
+        packed_frame = None
+        sends = []
+        for websocket in clients:
+            encoding = self.connection_info.get(websocket, {}).get('encoding')
+            if encoding == ENCODING_JSON_BINARY:
+                sends.append(websocket.send_bytes(frame))
+            elif encoding == ENCODING_MSGPACK:
+                if packed_frame is None:
+                    packed_frame = _packb(message if message is not None else orjson.loads(frame))
+                sends.append(websocket.send_bytes(packed_frame))
+            else:
+                if text_frame is None:
+                    text_frame = frame.decode()
+                sends.append(websocket.send_text(text_frame))
+        results = await asyncio.gather(*sends, return_exceptions=True)
         
         # 清理断开的连接
-        for websocket in disconnected_clients:
-            await self.disconnect(websocket)
+        for websocket, result in zip(clients, results):
+            if isinstance(result, Exception):
+                logger.error(f"广播消息失败: {result}")
+                await self.disconnect(websocket)
         
         logger.debug(f"消息已广播到 {len(self.active_connections)} 个客户端")
     
+    def _record_event(self, message: Dict[str, Any]):
+        """添加到最近事件列表"""
+        self.recent_events.append(message)
+        if len(self.recent_events) > self.max_recent_events:
+            self.recent_events.pop(0)
+    
     async def send_event(self, event_type: str, data: Dict[str, Any]):
         """发送事件"""
         message = {
             'event': event_type,
             'data': data,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now()
         }
         await self.broadcast(message)
     
+    def send_event_batched(self, event_type: str, data: Dict[str, Any]):
+        """通过批量广播器发送事件"""
+        if not self.active_connections:
+            logger.debug("没有活跃的WebSocket连接")
+            return
+        
+        message = {
+            'event': event_type,
+            'data': data,
+            'timestamp': datetime.now()
+        }
+        self._record_event(message)
+        self.batcher.submit(message)
+    
     async def send_security_event(self, event_data: Dict[str, Any]):
         """发送安全事件"""
-        await self.send_event('security_event', event_data)
-        await self.send_event('falco_event', event_data)
+        self.send_event_batched('security_event', event_data)
+        self.send_event_batched('falco_event', event_data)
     
     async def send_system_metrics(self, metrics: Dict[str, Any]):
         """发送系统指标"""
-        await self.send_event('system_metrics', metrics)
+        self.send_event_batched('system_metrics', metrics)
     
     async def send_security_alert(self, alert: Dict[str, Any]):
         """发送安全警报"""
@@ -173,21 +364,22 @@ class SimpleWebSocketService:
     async def handle_client_message(self, websocket: WebSocket, message: str):
         """处理客户端消息"""
         try:
-            data = json.loads(message)
+            data = orjson.loads(message)
             event_type = data.get('event', 'unknown')
             
             if event_type == 'ping':
                 # 处理心跳
+                now = datetime.now()
                 if websocket in self.connection_info:
-                    self.connection_info[websocket]['last_ping'] = datetime.now()
+                    self.connection_info[websocket]['last_ping'] = now
                 
                 await self.send_to_client(websocket, {
                     'event': 'pong',
                     'data': {
-                        'timestamp': datetime.now().isoformat(),
+                        'timestamp': now,
                         'client_timestamp': data.get('data', {}).get('timestamp')
                     },
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': now
                 })
             
             elif event_type == 'request_data':
@@ -201,13 +393,13 @@ class SimpleWebSocketService:
                         'type': data_type,
                         'data': response_data
                     },
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': datetime.now()
                 })
             
             else:
                 logger.warning(f"未知的客户端事件类型: {event_type}")
                 
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error(f"无效的JSON消息: {message}")
         except Exception as e:
             logger.error(f"处理客户端消息失败: {e}")
@@ -217,7 +409,7 @@ class SimpleWebSocketService:
         if data_type == 'system_status':
             return {
                 'connected_clients': len(self.active_connections),
-                'server_time': datetime.now().isoformat(),
+                'server_time': datetime.now(),
                 'status': 'healthy',
                 'falco_status': 'disconnected'  # Falco服务未正常运行
             }
@@ -247,7 +439,7 @@ class SimpleWebSocketService:
             try:
                 if self.active_connections:
                     await self.send_event('server_heartbeat', {
-                        'timestamp': datetime.now().isoformat(),
+                        'timestamp': datetime.now(),
                         'connected_clients': len(self.active_connections)
                     })
                 await asyncio.sleep(30)  # 每30秒发送一次心跳
@@ -261,7 +453,7 @@ class SimpleWebSocketService:
             try:
                 if self.active_connections:
                     status = {
-                        'timestamp': datetime.now().isoformat(),
+                        'timestamp': datetime.now(),
                         'falco_status': 'disconnected',  # Falco服务状态
                         'backend_status': 'healthy',
                         'database_status': 'healthy',
@@ -279,6 +471,7 @@ class SimpleWebSocketService:
         for task in self.background_tasks:
             task.cancel()
         self.background_tasks.clear()
+        await self.batcher.stop()
         logger.info("WebSocket后台任务已停止")
 
 # 全局WebSocket服务实例
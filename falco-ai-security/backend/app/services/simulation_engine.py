@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - Simulation Engine
+事件模拟引擎
+
+两个WebSocket测试路由共用的模拟事件生成与推送逻辑。推送目标（broadcaster）需实现
+send_security_event / send_system_metrics / send_security_alert 三个协程方法，
+websocket_service 和 simple_websocket_service 均满足该约定。
+"""
+
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import compress
+from types import MappingProxyType
+from typing import Dict, Any, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 模拟的Falco事件模板（只读，fields保持普通dict以便orjson序列化）
+FALCO_EVENT_TEMPLATES: Tuple[Mapping[str, Any], ...] = (
+    MappingProxyType({
+        'rule': 'Terminal shell in container',
+        'priority': 'Notice',
+        'message': 'A shell was used as the entrypoint/exec point into a container with an attached terminal.',
+        'fields': {
+            'container.id': 'abc123',
+            'container.name': 'suspicious-container',
+            'proc.name': 'bash',
+            'user.name': 'root'
+        }
+    }),
+    MappingProxyType({
+        'rule': 'Write below binary dir',
+        'priority': 'Error',
+        'message': 'An attempt to write to any file below a set of binary directories',
+        'fields': {
+            'fd.name': '/bin/malicious',
+            'proc.name': 'cp',
+            'user.name': 'attacker'
+        }
+    }),
+    MappingProxyType({
+        'rule': 'Sensitive file opened for reading',
+        'priority': 'Warning',
+        'message': 'An attempt to read any sensitive file',
+        'fields': {
+            'fd.name': '/etc/shadow',
+            'proc.name': 'cat',
+            'user.name': 'suspicious-user'
+        }
+    })
+)
+
+_SECURITY_ALERT_TEMPLATE = MappingProxyType({
+    'title': '安全威胁检测',
+    'description': '系统检测到潜在的安全威胁'
+})
+
+_ALERT_SEVERITIES = ('low', 'medium', 'high', 'critical')
+
+# 两次推送之间的随机间隔范围（秒）
+_MIN_DELAY = 2.0
+_MAX_DELAY = 8.0
+
+# 单轮模拟的上限，防止调用方传入过大的时长或事件数
+MAX_SIMULATION_SECONDS = 3600
+MAX_SIMULATION_EVENTS = 1000
+
+# 随机数按固定大小分块生成，内存占用与模拟时长无关
+_RANDOM_BLOCK_SIZE = 256
+
+
+@dataclass(frozen=True)
+class EventMix:
+    """
+    每个周期推送的事件组合
+
+    exclusive 为 True 时每个周期按权重只推送其中一种事件；
+    为 False 时每种事件按各自的概率独立决定是否推送（一个周期可能推送多条或不推送）
+    """
+    weights: Tuple[Tuple[str, float], ...]
+    exclusive: bool
+
+
+# 每个周期从安全事件、系统指标、安全告警中等概率选一种推送
+ONE_RANDOM_EVENT_MIX = EventMix(
+    weights=(('security_event', 1.0), ('system_metrics', 1.0), ('security_alert', 1.0)),
+    exclusive=True
+)
+
+# 每个周期以30%概率推送安全事件、50%概率推送系统指标，不推送告警
+SECURITY_AND_METRICS_MIX = EventMix(
+    weights=(('security_event', 0.3), ('system_metrics', 0.5)),
+    exclusive=False
+)
+
+
+@dataclass(slots=True)
+class _RandomBlock:
+    """一块预先生成的随机数，每个下标对应一个模拟周期"""
+    event_types: List[Tuple[str, ...]]
+    template_indexes: List[int]
+    delays: List[float]
+    usages: List[List[float]]
+    alert_ids: List[int]
+    severity_indexes: List[int]
+
+
+def _draw_block(rng: np.random.Generator, event_mix: EventMix) -> _RandomBlock:
+    """生成一块模拟周期所需的随机数"""
+    size = _RANDOM_BLOCK_SIZE
+    names = [name for name, _ in event_mix.weights]
+    weights = np.array([weight for _, weight in event_mix.weights], dtype=np.float64)
+    if event_mix.exclusive:
+        choices = rng.choice(len(names), size, p=weights / weights.sum()).tolist()
+        event_types = [(names[choice],) for choice in choices]
+    else:
+        hits = (rng.random((size, len(names))) < weights).tolist()
+        event_types = [tuple(compress(names, row)) for row in hits]
+
+    return _RandomBlock(
+        event_types=event_types,
+        template_indexes=rng.integers(0, len(FALCO_EVENT_TEMPLATES), size).tolist(),
+        delays=rng.uniform(_MIN_DELAY, _MAX_DELAY, size).tolist(),
+        usages=rng.uniform((10, 20, 30), (90, 80, 70), (size, 3)).round(2).tolist(),
+        alert_ids=rng.integers(1000, 10000, size).tolist(),
+        severity_indexes=rng.integers(0, len(_ALERT_SEVERITIES), size).tolist()
+    )
+
+
+class SimulationEngine:
+    """事件模拟引擎"""
+
+    def __init__(self):
+        # 持有运行中任务的引用，避免任务在完成前被回收
+        self._tasks: Set[asyncio.Task] = set()
+
+    def build_falco_event(self, template_index: Optional[int] = None) -> Dict[str, Any]:
+        """基于模板构建一条模拟Falco事件"""
+        if template_index is None:
+            template_index = int(np.random.default_rng().integers(len(FALCO_EVENT_TEMPLATES)))
+        return {
+            **FALCO_EVENT_TEMPLATES[template_index],
+            'timestamp': datetime.now(),
+            'source': 'falco-simulation'
+        }
+
+    def start(self, broadcaster: Any, event_mix: EventMix, duration_seconds: Optional[float] = None,
+              max_events: Optional[int] = None) -> asyncio.Task:
+        """启动一轮模拟，按时长或事件数结束（至少指定其一）"""
+        if duration_seconds is None and max_events is None:
+            raise ValueError("duration_seconds 和 max_events 至少指定一个")
+        if duration_seconds is not None and not 0 < duration_seconds <= MAX_SIMULATION_SECONDS:
+            raise ValueError(f"duration_seconds 必须在 (0, {MAX_SIMULATION_SECONDS}] 范围内")
+        if max_events is not None and not 0 < max_events <= MAX_SIMULATION_EVENTS:
+            raise ValueError(f"max_events 必须在 [1, {MAX_SIMULATION_EVENTS}] 范围内")
+
+        task = asyncio.create_task(self._run(broadcaster, event_mix, duration_seconds, max_events))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, broadcaster: Any, event_mix: EventMix,
+                   duration_seconds: Optional[float], max_events: Optional[int]):
+        """模拟任务：每个周期按事件组合推送事件"""
+        rng = np.random.default_rng()
+        event_limit = max_events if max_events is not None else math.inf
+
+        # 截止时间只计算一次，使用事件循环的单调时钟
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration_seconds if duration_seconds is not None else math.inf
+
+        sequence = 0
+        tick = 0
+        block = None
+        while sequence < event_limit and loop.time() < deadline:
+            try:
+                i = tick % _RANDOM_BLOCK_SIZE
+                if i == 0:
+                    block = _draw_block(rng, event_mix)
+                tick += 1
+
+                for event_type in block.event_types[i]:
+                    if sequence >= event_limit:
+                        break
+                    sequence += 1
+                    await self._send_event(broadcaster, event_type, block, i, sequence)
+
+                # 等待随机时间，不超过剩余时长
+                await asyncio.sleep(min(block.delays[i], max(deadline - loop.time(), 0)))
+
+            except Exception as e:
+                logger.error(f"事件模拟任务错误: {e}")
+                break
+
+        logger.info("事件模拟任务完成")
+
+    async def _send_event(self, broadcaster: Any, event_type: str, block: _RandomBlock, i: int, sequence: int):
+        """按类型构建并推送一条模拟事件"""
+        if event_type == 'security_event':
+            event_data = self.build_falco_event(block.template_indexes[i])
+            event_data['simulation'] = True
+            event_data['sequence'] = sequence
+            await broadcaster.send_security_event(event_data)
+        elif event_type == 'system_metrics':
+            cpu_usage, memory_usage, disk_usage = block.usages[i]
+            await broadcaster.send_system_metrics({
+                'cpu_usage': cpu_usage,
+                'memory_usage': memory_usage,
+                'disk_usage': disk_usage,
+                'timestamp': datetime.now(),
+                'simulation': True,
+                'sequence': sequence
+            })
+        else:
+            await broadcaster.send_security_alert({
+                **_SECURITY_ALERT_TEMPLATE,
+                'alert_id': f'alert_{block.alert_ids[i]}',
+                'severity': _ALERT_SEVERITIES[block.severity_indexes[i]],
+                'timestamp': datetime.now(),
+                'simulation': True,
+                'sequence': sequence
+            })
+
+
+# 全局事件模拟引擎实例
+simulation_engine = SimulationEngine()
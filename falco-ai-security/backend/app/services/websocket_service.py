@@ -7,15 +7,15 @@ WebSocket服务，负责实时数据推送和客户端通信
 
 import logging
 import asyncio
-import json
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, List, Optional, Any, Set, Tuple
 from dataclasses import dataclass, asdict
 # import socketio
 from fastapi import FastAPI
 
 from app.config import settings
 from app.services.falco_monitor import FalcoEvent
+# from app.utils.json_utils import SocketIOJSON  # 重新启用Socket.IO时与 socketio 一起恢复
 
 logger = logging.getLogger(__name__)
 
@@ -36,7 +36,8 @@ class WebSocketService:
         # self.sio = socketio.AsyncServer(
         #     cors_allowed_origins="*",
         #     logger=True,
-        #     engineio_logger=True
+        #     engineio_logger=True,
+        #     json=SocketIOJSON  # orjson编解码，载荷可直接携带datetime
         # )
         self.sio = None  # 临时禁用socketio
         
@@ -79,7 +80,7 @@ class WebSocketService:
                 # 发送连接成功消息
                 await self.sio.emit('connect_success', {
                     'message': '连接成功',
-                    'server_time': datetime.now().isoformat(),
+                    'server_time': datetime.now(),
                     'client_id': sid
                 }, room=sid)
                 
@@ -174,7 +175,7 @@ class WebSocketService:
         async def heartbeat(sid, data):
             """心跳检测"""
             await self.sio.emit('heartbeat_response', {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': datetime.now(),
                 'client_timestamp': data.get('timestamp')
             }, room=sid)
         
@@ -191,7 +192,7 @@ class WebSocketService:
                 await self.sio.emit('data_response', {
                     'type': data_type,
                     'data': response_data,
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': datetime.now()
                 }, room=sid)
                 
             except Exception as e:
@@ -206,7 +207,7 @@ class WebSocketService:
         if data_type == 'system_status':
             return {
                 'connected_clients': len(self.connected_clients),
-                'server_time': datetime.now().isoformat(),
+                'server_time': datetime.now(),
                 'status': 'healthy'
             }
         elif data_type == 'recent_events':
@@ -223,15 +224,22 @@ class WebSocketService:
         # return socketio.ASGIApp(self.sio, app)
         return app  # 临时返回原始app
     
-    async def broadcast_event(self, event: str, data: Dict[str, Any], room: Optional[str] = None):
-        """广播事件到所有客户端或指定房间"""
+    async def broadcast_event(self, event: str, data: Dict[str, Any], room: Optional[str] = None,
+                              aliases: Tuple[str, ...] = ()):
+        """广播事件到所有客户端或指定房间
+        
+        aliases 声明同一数据同时属于的其他事件类型，客户端按别名分发，避免重复广播
+        """
         try:
             message = {
                 'event': event,
                 'data': data,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now()
             }
+            if aliases:
+                message['aliases'] = aliases
             
+            # Socket.IO每次emit只编码一次数据包，再分发给房间内的所有客户端
             if room:
                 await self.sio.emit(event, message, room=room)
                 logger.debug(f"向房间 {room} 广播事件: {event}")
@@ -253,13 +261,17 @@ class WebSocketService:
             'rule': falco_event.rule,
             'priority': falco_event.priority,
             'message': falco_event.message,
-            'timestamp': falco_event.timestamp.isoformat(),
+            'timestamp': falco_event.timestamp,
             'fields': falco_event.fields
         }
         
         await self.broadcast_event('falco_event', event_data)
         await self.broadcast_event('security_event', event_data)
     
+    async def send_security_event(self, event_data: Dict[str, Any]):
+        """发送安全事件（以falco_event推送，security_event作为别名）"""
+        await self.broadcast_event('falco_event', event_data, aliases=('security_event',))
+    
     async def send_system_metrics(self, metrics: Dict[str, Any]):
         """发送系统指标"""
         await self.broadcast_event('system_metrics', metrics)
@@ -302,7 +314,7 @@ class WebSocketService:
             try:
                 if self.connected_clients:
                     await self.broadcast_event('server_heartbeat', {
-                        'timestamp': datetime.now().isoformat(),
+                        'timestamp': datetime.now(),
                         'connected_clients': len(self.connected_clients)
                     })
                 await asyncio.sleep(30)  # 每30秒发送一次心跳
@@ -317,7 +329,7 @@ class WebSocketService:
                 if self.connected_clients:
                     # 模拟系统状态数据
                     status = {
-                        'timestamp': datetime.now().isoformat(),
+                        'timestamp': datetime.now(),
                         'falco_status': 'disconnected',  # Falco服务未启动
                         'backend_status': 'healthy',
                         'database_status': 'healthy',
@@ -0,0 +1,19 @@
+# Falco AI Security System - Utils Package
+# 通用工具函数模块包
+
+from .time_utils import iso_now, iso_from_epoch
+from .json_utils import dumps_bytes, dumps_text, loads, SocketIOJSON
+from .hash_utils import stable_hash64
+from .routing import ORJSONRequest, ORJSONRoute
+
+__all__ = [
+    "iso_now",
+    "iso_from_epoch",
+    "dumps_bytes",
+    "dumps_text",
+    "loads",
+    "SocketIOJSON",
+    "stable_hash64",
+    "ORJSONRequest",
+    "ORJSONRoute"
+]
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - Hash Utils
+稳定哈希工具函数
+
+内置 hash() 对字符串的结果在每个进程中随机化，重启或多副本之间不一致，
+需要跨进程保持一致的ID（告警ID、事件ID）统一使用这里的64位摘要。
+"""
+
+import hashlib
+
+
+def stable_hash64(text: str) -> int:
+    """计算字符串的64位稳定哈希（BLAKE2b，8字节摘要）"""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big')
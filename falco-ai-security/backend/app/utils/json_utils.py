@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - JSON Utils
+基于orjson的序列化工具函数
+
+orjson原生支持datetime和numpy类型，推送路径上的载荷可以直接携带datetime对象，
+不需要先调用 isoformat() 转成字符串。
+"""
+
+from typing import Any
+
+import orjson
+
+# 不使用 OPT_NAIVE_UTC: datetime.now() 返回的是本地时间，输出格式与 isoformat() 保持一致
+_DUMPS_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """序列化为UTF-8编码的JSON字节串"""
+    return orjson.dumps(obj, option=_DUMPS_OPTIONS)
+
+
+def dumps_text(obj: Any) -> str:
+    """序列化为JSON字符串（用于WebSocket文本帧）"""
+    return orjson.dumps(obj, option=_DUMPS_OPTIONS).decode()
+
+
+def loads(data: Any) -> Any:
+    """解析JSON字符串或字节串"""
+    return orjson.loads(data)
+
+
+class SocketIOJSON:
+    """供python-socketio的json参数使用的编解码器"""
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs) -> str:
+        return dumps_text(obj)
+
+    @staticmethod
+    def loads(data: Any, **kwargs) -> Any:
+        return orjson.loads(data)
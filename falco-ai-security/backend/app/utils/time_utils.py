@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Falco AI Security System - Time Utils
+时间相关工具函数
+
+接口响应中的 "timestamp" 字段只需要秒级精度，
+这里按秒缓存ISO格式字符串，同一秒内的请求共享同一个字符串，
+避免每次请求都执行 datetime.now().isoformat()。
+"""
+
+import time
+from datetime import datetime
+from functools import lru_cache
+
+
+@lru_cache(maxsize=1)
+def iso_from_epoch(epoch_s: int) -> str:
+    """将整秒时间戳转换为ISO格式字符串（按秒缓存）"""
+    return datetime.fromtimestamp(epoch_s).isoformat()
+
+
+def iso_now() -> str:
+    """获取当前时间的ISO格式字符串（秒级精度）"""
+    return iso_from_epoch(int(time.time()))
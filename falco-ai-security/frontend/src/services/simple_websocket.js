@@ -9,6 +9,9 @@ import toast from 'react-hot-toast';
 const WS_URL = 'ws://192.168.200.129:8001/api/ws'; // 使用宿主机IP连接后端WebSocket端点
 console.log('[SimpleWebSocket] Using URL:', WS_URL);
 
+// 服务端以二进制帧发送UTF-8 JSON，统一在这里解码
+const textDecoder = new TextDecoder();
+
 // 事件类型常量
 export const WS_EVENTS = {
   // 连接事件
@@ -80,11 +83,12 @@ class SimpleWebSocketService {
         this.status = CONNECTION_STATUS.CONNECTING;
         this.isManualDisconnect = false;
         
-        // 构建WebSocket URL
-        const url = `${WS_URL}?client_id=${this.clientId}`;
+        // 构建WebSocket URL（binary=1 表示接收二进制帧）
+        const url = `${WS_URL}?client_id=${this.clientId}&binary=1`;
         
         // 创建WebSocket连接
         this.socket = new WebSocket(url);
+        this.socket.binaryType = 'arraybuffer';
         
         // 设置事件监听器
         this.setupEventListeners(resolve, reject);
@@ -141,7 +145,8 @@ class SimpleWebSocketService {
     
     this.socket.onmessage = (event) => {
       try {
-        const message = JSON.parse(event.data);
+        const raw = typeof event.data === 'string' ? event.data : textDecoder.decode(event.data);
+        const message = JSON.parse(raw);
         this.handleMessage(message);
       } catch (error) {
         console.error('[SimpleWebSocket] Message parse error:', error);
@@ -175,7 +180,13 @@ class SimpleWebSocketService {
   // 处理接收到的消息
   handleMessage(message) {
     const { event, data, timestamp } = message;
-    
+
+    // 批量帧：服务端将短时间内的多个事件合并发送，逐条分发
+    if (event === 'batch') {
+      (data.events || []).forEach((item) => this.handleMessage(item));
+      return;
+    }
+
     console.log('[SimpleWebSocket] Received message:', { event, data });
     
     // 处理特殊事件
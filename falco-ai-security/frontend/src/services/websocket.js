@@ -251,6 +251,11 @@ class WebSocketService {
     this.socket.on(WS_EVENTS.SYSTEM_METRICS, (data) => {
       this.notifyListeners(WS_EVENTS.SYSTEM_METRICS, data);
     });
+    
+    // Falco事件可通过 aliases 同时投递给其他事件类型（如 security_event）的监听器
+    this.socket.on(WS_EVENTS.FALCO_EVENT, (message) => {
+      (message?.aliases || []).forEach((alias) => this.notifyListeners(alias, message));
+    });
   }
   
   // 尝试重连